@@ -53,6 +53,14 @@ def init_app():
     logger.info("启动定期更新任务")
     async_tasks.schedule_periodic_updates()
     
+    # 启动浏览量定期落库任务
+    logger.info("启动浏览量定期落库任务")
+    async_tasks.schedule_page_views_flush()
+    
+    # 启动搜索索引定期保存任务
+    logger.info("启动搜索索引定期保存任务")
+    async_tasks.schedule_search_index_save()
+    
     return worker
 
 if __name__ == '__main__':
@@ -5,6 +5,7 @@ import pymysql
 import time
 import logging
 from dotenv import load_dotenv
+from utils.house_fields import parse_price, parse_area, parse_rooms
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -237,18 +238,210 @@ def import_from_sql_file():
     finally:
         conn.close()
 
+# house_info 派生列：(列名, 列定义)
+HOUSE_DERIVED_COLUMNS = [
+    ('price_num', 'FLOAT NULL'),
+    ('area_sqm', 'FLOAT NULL'),
+    ('bedrooms', 'INT NULL'),
+    ('livingrooms', 'INT NULL'),
+    ('region_id', 'INT NULL'),
+    ('block_id', 'INT NULL'),
+    ('community_id', 'INT NULL'),
+]
+
+# house_info 派生索引：(索引名, 列)
+HOUSE_DERIVED_INDEXES = [
+    ('idx_house_price_num', 'price_num'),
+    ('idx_house_region_price', 'region, price_num'),
+    ('idx_house_region_block_price', 'region, block, price_num'),
+    ('idx_house_region_block_area', 'region, block, area_sqm'),
+    ('idx_house_layout', 'bedrooms, livingrooms'),
+    ('idx_house_region_block_layout', 'region, block, bedrooms, livingrooms'),
+    ('idx_house_region_id', 'region_id'),
+    ('idx_house_block_id', 'block_id'),
+    ('idx_house_community_id', 'community_id'),
+]
+
+# house_info 引用位置字典的外键：(约束名, 列)
+HOUSE_LOCATION_FOREIGN_KEYS = [
+    ('fk_house_region', 'region_id'),
+    ('fk_house_block', 'block_id'),
+    ('fk_house_community', 'community_id'),
+]
+
+# 每批回填的ID范围
+BACKFILL_BATCH_SIZE = 5000
+# 每条 UPDATE ... CASE id WHEN ... 语句回填的房源数
+BACKFILL_UPDATE_SIZE = 500
+
+def ensure_house_columns(cursor):
+    """确保位置字典表、单价时间汇总表、浏览量落库记录表、house_info 上的派生列、索引和外键存在"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS house_location (
+            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            level SMALLINT NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            parent_id INT NOT NULL DEFAULT 0,
+            UNIQUE KEY uq_location_parent_name (parent_id, name)
+        ) DEFAULT CHARSET=utf8mb4
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS house_price_rollup (
+            location_id INT NOT NULL,
+            granularity SMALLINT NOT NULL,
+            period_start INT NOT NULL,
+            house_count INT NOT NULL DEFAULT 0,
+            unit_price_sum DOUBLE NOT NULL DEFAULT 0,
+            unit_price_sq_sum DOUBLE NOT NULL DEFAULT 0,
+            PRIMARY KEY (location_id, granularity, period_start)
+        ) DEFAULT CHARSET=utf8mb4
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS house_page_views_flush (
+            flush_id VARCHAR(32) NOT NULL PRIMARY KEY,
+            flushed_at INT NOT NULL,
+            KEY ix_house_page_views_flush_flushed_at (flushed_at)
+        ) DEFAULT CHARSET=utf8mb4
+    """)
+    
+    cursor.execute("SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'house_info'")
+    columns = {row['COLUMN_NAME'] for row in cursor.fetchall()}
+    for name, definition in HOUSE_DERIVED_COLUMNS:
+        if name not in columns:
+            cursor.execute(f"ALTER TABLE house_info ADD COLUMN {name} {definition}")
+            logger.info(f"已添加列 house_info.{name}")
+    
+    cursor.execute("SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'house_info'")
+    indexes = {row['INDEX_NAME'] for row in cursor.fetchall()}
+    for name, columns_sql in HOUSE_DERIVED_INDEXES:
+        if name not in indexes:
+            cursor.execute(f"CREATE INDEX {name} ON house_info ({columns_sql})")
+            logger.info(f"已创建索引 {name}")
+    
+    cursor.execute("SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'house_info' "
+                   "AND CONSTRAINT_TYPE = 'FOREIGN KEY'")
+    foreign_keys = {row['CONSTRAINT_NAME'] for row in cursor.fetchall()}
+    for name, column in HOUSE_LOCATION_FOREIGN_KEYS:
+        if name not in foreign_keys:
+            cursor.execute(f"ALTER TABLE house_info ADD CONSTRAINT {name} "
+                           f"FOREIGN KEY ({column}) REFERENCES house_location (id)")
+            logger.info(f"已创建外键 {name}")
+
+def backfill_house_columns():
+    """回填 house_info 的派生列（价格、面积数值、户型和位置ID等）"""
+    logger.info("开始回填房源派生列")
+    
+    conn = connect_db()
+    if not conn:
+        return False
+    
+    try:
+        with conn.cursor() as cursor:
+            ensure_house_columns(cursor)
+            conn.commit()
+            
+            cursor.execute("SELECT MIN(id) AS min_id, MAX(id) AS max_id FROM house_info")
+            row = cursor.fetchone()
+            if row['min_id'] is None:
+                logger.warning("house_info 中没有数据，无需回填")
+                return True
+            
+            # 按ID范围分批更新，避免长事务和大范围锁
+            updated = 0
+            for start in range(row['min_id'], row['max_id'] + 1, BACKFILL_BATCH_SIZE):
+                updated += backfill_house_parsed_columns(cursor, start, start + BACKFILL_BATCH_SIZE)
+                conn.commit()
+            
+            logger.info(f"房源派生列回填完成: 更新 {updated} 行")
+            
+            backfill_house_locations(conn, cursor, row['min_id'], row['max_id'])
+            return True
+    except Exception as e:
+        logger.error(f"回填房源派生列时出错: {str(e)}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+def backfill_house_parsed_columns(cursor, start, end):
+    """
+    回填一批房源的价格、面积数值和卧室数、客厅数，返回回填的行数
+
+    用与应用相同的 parse_price/parse_area/parse_rooms 解析（写入房源时的 before_insert/before_update 钩子也用它们），
+    回填的值与新增/修改房源时写入的值完全一致；每条语句用 CASE id WHEN ... 更新多行
+    """
+    cursor.execute("SELECT id, price, area, rooms FROM house_info WHERE id >= %s AND id < %s", (start, end))
+    rows = [(row['id'], parse_price(row['price']), parse_area(row['area']), *parse_rooms(row['rooms']))
+            for row in cursor.fetchall()]
+    columns = ('price_num', 'area_sqm', 'bedrooms', 'livingrooms')
+    for i in range(0, len(rows), BACKFILL_UPDATE_SIZE):
+        batch = rows[i:i + BACKFILL_UPDATE_SIZE]
+        cases = ' '.join(['WHEN %s THEN %s'] * len(batch))
+        assignments = ', '.join(f"{column} = CASE id {cases} END" for column in columns)
+        placeholders = ', '.join(['%s'] * len(batch))
+        params = [value for position in range(1, len(columns) + 1)
+                  for row in batch for value in (row[0], row[position])]
+        cursor.execute(f"UPDATE house_info SET {assignments} WHERE id IN ({placeholders})",
+                       (*params, *(row[0] for row in batch)))
+    return len(rows)
+
+def backfill_house_locations(conn, cursor, min_id, max_id):
+    """由 house_info 的区域、板块、小区名称生成位置字典，并回填房源的位置ID"""
+    # 逐级补充位置字典，已有的位置由唯一键忽略
+    cursor.execute("""
+        INSERT IGNORE INTO house_location (level, name, parent_id)
+        SELECT DISTINCT 1, region, 0 FROM house_info WHERE region IS NOT NULL AND region != ''
+    """)
+    cursor.execute("""
+        INSERT IGNORE INTO house_location (level, name, parent_id)
+        SELECT DISTINCT 2, h.block, r.id FROM house_info h
+        JOIN house_location r ON r.parent_id = 0 AND r.name = h.region
+        WHERE h.block IS NOT NULL AND h.block != ''
+    """)
+    cursor.execute("""
+        INSERT IGNORE INTO house_location (level, name, parent_id)
+        SELECT DISTINCT 3, h.address, b.id FROM house_info h
+        JOIN house_location r ON r.parent_id = 0 AND r.name = h.region
+        JOIN house_location b ON b.parent_id = r.id AND b.name = h.block
+        WHERE h.address IS NOT NULL AND h.address != ''
+    """)
+    conn.commit()
+    
+    # 按ID范围分批回填位置ID
+    updated = 0
+    for start in range(min_id, max_id + 1, BACKFILL_BATCH_SIZE):
+        cursor.execute("""
+            UPDATE house_info h
+            LEFT JOIN house_location r ON r.parent_id = 0 AND r.name = h.region
+            LEFT JOIN house_location b ON b.parent_id = r.id AND b.name = h.block
+            LEFT JOIN house_location c ON c.parent_id = b.id AND c.name = h.address
+            SET h.region_id = r.id, h.block_id = b.id, h.community_id = c.id
+            WHERE h.id >= %s AND h.id < %s
+        """, (start, start + BACKFILL_BATCH_SIZE))
+        conn.commit()
+        updated += cursor.rowcount
+    
+    logger.info(f"房源位置ID回填完成: 更新 {updated} 行")
+
 def show_help():
     """显示帮助信息"""
     print("""
 数据导入工具使用说明:
 
 命令行参数:
-   --import      从SQL文件导入数据到数据库
+   --import      从SQL文件导入数据到数据库（导入后自动回填派生列）
+   --backfill    回填 house_info 的派生列（价格、面积数值、户型和位置ID等）并创建索引
    --check       检查数据库中的表
    --help        显示此帮助信息
 
 示例:
    python migrate_data.py --import   # 从SQL文件导入数据
+   python migrate_data.py --backfill # 回填派生列
    python migrate_data.py --check    # 检查数据库中的表
 """)
 
@@ -258,7 +451,10 @@ if __name__ == "__main__":
         if sys.argv[1] == "--check":
             check_tables()
         elif sys.argv[1] == "--import":
-            import_from_sql_file()
+            if import_from_sql_file():
+                backfill_house_columns()
+        elif sys.argv[1] == "--backfill":
+            backfill_house_columns()
         elif sys.argv[1] == "--help":
             show_help()
         else:
@@ -268,7 +464,8 @@ if __name__ == "__main__":
         # 默认执行导入操作
         if not check_tables():
             logger.info("数据库中没有表，自动执行导入操作")
-            import_from_sql_file()
+            if import_from_sql_file():
+                backfill_house_columns()
         else:
             logger.info("数据库中已有表，如需重新导入请使用 --import 参数")
         show_help() 
\ No newline at end of file
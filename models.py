@@ -1,4 +1,41 @@
+from sqlalchemy import event, select, func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from settings import db
+from utils.house_fields import parse_price, parse_area, parse_rooms
+
+
+# 位置层级
+LOCATION_REGION = 1      # 区域
+LOCATION_BLOCK = 2       # 板块
+LOCATION_COMMUNITY = 3   # 小区
+
+
+# 价格时间汇总的粒度
+ROLLUP_MONTH = 1         # 按月
+ROLLUP_WEEK = 2          # 按周（周一开始）
+
+
+# house_location表的模型类
+# 区域 -> 板块 -> 小区 三级位置字典，房源通过整数ID引用
+class Location(db.Model):
+    # 指定表名
+    __tablename__ = 'house_location'
+    # 主键
+    id = db.Column(db.Integer, primary_key=True)
+    # 层级：1 区域，2 板块，3 小区
+    level = db.Column(db.SmallInteger, nullable=False)
+    # 名称
+    name = db.Column(db.String(100), nullable=False)
+    # 上级位置ID，区域为0
+    parent_id = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('parent_id', 'name', name='uq_location_parent_name'),
+    )
+
+    # 重写__repr__方法，方便查看对象的输出内容
+    def __repr__(self):
+        return 'Location: %s, %s' % (self.name, self.id)
 
 
 # house_info表的模型类
@@ -45,11 +82,121 @@ class House(db.Model):
     phone_num = db.Column(db.String(100))
     # 房源编号
     house_num = db.Column(db.String(100))
+    # 价格数值（由price解析，用于范围筛选和统计）
+    price_num = db.Column(db.Float)
+    # 面积数值，单位平方米（由area解析）
+    area_sqm = db.Column(db.Float)
+    # 卧室数（由rooms解析，如"2室1厅"为2）
+    bedrooms = db.Column(db.Integer)
+    # 客厅数（由rooms解析，如"2室1厅"为1）
+    livingrooms = db.Column(db.Integer)
+    # 区域ID（house_location）
+    region_id = db.Column(db.Integer, db.ForeignKey('house_location.id'))
+    # 板块ID（house_location）
+    block_id = db.Column(db.Integer, db.ForeignKey('house_location.id'))
+    # 小区ID（house_location）
+    community_id = db.Column(db.Integer, db.ForeignKey('house_location.id'))
+
+    __table_args__ = (
+        db.Index('idx_house_price_num', 'price_num'),
+        db.Index('idx_house_region_price', 'region', 'price_num'),
+        db.Index('idx_house_region_block_price', 'region', 'block', 'price_num'),
+        db.Index('idx_house_region_block_area', 'region', 'block', 'area_sqm'),
+        db.Index('idx_house_layout', 'bedrooms', 'livingrooms'),
+        db.Index('idx_house_region_block_layout', 'region', 'block', 'bedrooms', 'livingrooms'),
+        db.Index('idx_house_region_id', 'region_id'),
+        db.Index('idx_house_block_id', 'block_id'),
+        db.Index('idx_house_community_id', 'community_id'),
+    )
 
     # 重写__repr__方法，方便查看对象的输出内容
     def __repr__(self):
         return 'House: %s, %s' % (self.address, self.id)
 
+
+# 写入房源时同步解析数值列
+@event.listens_for(House, 'before_insert')
+@event.listens_for(House, 'before_update')
+def sync_house_numeric_fields(mapper, connection, house):
+    house.price_num = parse_price(house.price)
+    house.area_sqm = parse_area(house.area)
+    house.bedrooms, house.livingrooms = parse_rooms(house.rooms)
+
+
+def _location_id(connection, level, name, parent_id):
+    """
+    在 house_location 中查找位置，不存在时创建，返回位置ID
+
+    多个进程同时创建同一个位置时唯一键冲突，ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+    让冲突的插入返回已有的位置ID（对方尚未提交时等它提交），不会让整个房源写入失败
+    """
+    if not name:
+        return None
+    table = Location.__table__
+    location_id = connection.execute(
+        select(table.c.id).where(table.c.parent_id == parent_id, table.c.name == name)
+    ).scalar()
+    if location_id is None:
+        statement = mysql_insert(table).values(level=level, name=name, parent_id=parent_id)
+        location_id = connection.execute(
+            statement.on_duplicate_key_update(id=func.last_insert_id(table.c.id))
+        ).lastrowid
+    return location_id
+
+
+# 写入房源时同步位置ID
+@event.listens_for(House, 'before_insert')
+@event.listens_for(House, 'before_update')
+def sync_house_location_ids(mapper, connection, house):
+    state = db.inspect(house)
+    if house.region_id is not None and not any(
+            state.attrs[name].history.has_changes() for name in ('region', 'block', 'address')):
+        return
+    region_id = _location_id(connection, LOCATION_REGION, house.region, 0)
+    block_id = _location_id(connection, LOCATION_BLOCK, house.block, region_id) if region_id else None
+    house.region_id = region_id
+    house.block_id = block_id
+    house.community_id = _location_id(connection, LOCATION_COMMUNITY, house.address, block_id) if block_id else None
+
+
+# house_price_rollup表的模型类
+# 各位置按发布时间分月/分周汇总的单价（元/平方米/月）：房源数、单价之和、单价平方和
+class PriceRollup(db.Model):
+    # 指定表名
+    __tablename__ = 'house_price_rollup'
+    # 位置ID（house_location.id，区域或板块）
+    location_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # 粒度：1 按月，2 按周
+    granularity = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    # 时间段起点（Unix时间戳）
+    period_start = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # 房源数
+    house_count = db.Column(db.Integer, nullable=False, default=0)
+    # 单价之和
+    unit_price_sum = db.Column(db.Float, nullable=False, default=0)
+    # 单价平方和
+    unit_price_sq_sum = db.Column(db.Float, nullable=False, default=0)
+
+    # 重写__repr__方法，方便查看对象的输出内容
+    def __repr__(self):
+        return 'PriceRollup: %s, %s, %s' % (self.location_id, self.granularity, self.period_start)
+
+
+# house_page_views_flush表的模型类
+# 已落库的浏览量增量批次：与浏览量的UPDATE在同一个事务中写入，同一批增量重试时不会重复累加
+class PageViewsFlush(db.Model):
+    # 指定表名
+    __tablename__ = 'house_page_views_flush'
+    # 这批增量的ID（Redis中 page_views_flushing_id 的值）
+    flush_id = db.Column(db.String(32), primary_key=True)
+    # 落库时间（Unix时间戳），过期的记录定期删除
+    flushed_at = db.Column(db.Integer, nullable=False, index=True)
+
+    # 重写__repr__方法，方便查看对象的输出内容
+    def __repr__(self):
+        return 'PageViewsFlush: %s' % self.flush_id
+
+
 # house_recommend表的模型类
 # 用来存储用户的浏览记录
 class Recommend(db.Model):
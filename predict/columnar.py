@@ -0,0 +1,63 @@
+from itertools import chain
+import numpy as np
+from sqlalchemy import or_
+from models import House, db
+from utils.house_fields import AREA_UNITS
+
+# 删除ASCII数字用的转换表，删除后为空的字符串只包含ASCII数字
+_ASCII_DIGITS = {ord(digit): None for digit in '0123456789'}
+
+
+def to_float_array(values, units=()):
+    """
+    把字符串列向量化地解析为浮点数组，无法解析的位置为 NaN
+
+    参数:
+    values: 字符串序列（可以包含 None）
+    units: 需要去掉的单位写法，例如 AREA_UNITS
+    """
+    text = np.array([value if value is not None else '' for value in values], dtype=str)
+    for unit in units:
+        text = np.char.replace(text, unit, '')
+    text = np.char.strip(text)
+    # 去掉一个小数点后全是ASCII数字的才是合法数值，与 house_fields 中的逐个解析规则相同；
+    # 不用 isdigit，'²' 这类Unicode数字能通过 isdigit 但无法转换为浮点数
+    digits = np.char.replace(text, '.', '', count=1)
+    valid = (np.char.str_len(digits) > 0) & (np.char.str_len(np.char.translate(digits, _ASCII_DIGITS)) == 0) \
+        & ~np.char.startswith(text, '.') & ~np.char.endswith(text, '.')
+    result = np.full(text.shape, np.nan)
+    result[valid] = text[valid].astype(np.float64)
+    return result
+
+
+def _fetch_columns(query, columns):
+    """只查询指定的列，结果直接读入 (行数, 列数) 的浮点数组，不构造ORM对象"""
+    result = db.session.execute(query.with_entities(*columns).statement)
+    data = np.fromiter(chain.from_iterable(result.tuples()), dtype=np.float64)
+    return data.reshape(-1, len(columns))
+
+
+def fetch_area_price(query):
+    """
+    按列读取查询结果中房源的面积（平方米）和价格
+
+    数值列已解析的房源直接读数值列；尚未回填数值列的旧数据读取原始字符串后向量化解析。
+    返回 (面积数组, 价格数组)，无法解析的房源已剔除。
+    """
+    data = _fetch_columns(
+        query.filter(House.area_sqm.isnot(None), House.price_num.isnot(None)),
+        (House.area_sqm, House.price_num))
+    areas, prices = data[:, 0], data[:, 1]
+
+    raw = query.filter(or_(House.area_sqm.is_(None), House.price_num.is_(None))).with_entities(
+        House.area, House.price).all()
+    if raw:
+        raw_areas = to_float_array([area for area, _ in raw], AREA_UNITS)
+        raw_prices = to_float_array([price for _, price in raw])
+        areas = np.concatenate((areas, raw_areas))
+        prices = np.concatenate((prices, raw_prices))
+
+    # 剔除无法解析的行
+    valid = np.isfinite(areas) & np.isfinite(prices)
+    return areas[valid], prices[valid]
+
@@ -0,0 +1,134 @@
+import os
+import atexit
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from settings import COMPUTE_POOL_WORKERS, COMPUTE_POOL_MAX_PENDING, COMPUTE_TIMEOUT
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('compute_service')
+
+# 每个进程最多保留的上次计算结果数
+LAST_RESULTS_SIZE = 256
+# fork server 预加载的计算进程入口模块
+COMPUTE_WORKER_MODULE = 'predict.compute_worker'
+# 项目根目录，fork server 需要从这里导入 predict 包
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _worker_context():
+    """
+    计算进程的启动方式
+
+    请求进程中有多个线程，不能直接fork（会复制其他线程持有的锁）。使用forkserver：
+    fork server 是单线程的干净进程，只预加载 predict.compute_worker，计算进程从它fork出来，
+    不重新导入启动进程的主模块和 settings（见 predict.compute_worker）。不支持forkserver的平台退回spawn。
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    # 部分Python版本的 fork server 不使用父进程的 sys.path，从其他目录启动时预加载会失败并退回导入主模块，
+    # 这里把项目根目录加入 PYTHONPATH（fork server 继承环境变量）
+    python_path = os.environ.get('PYTHONPATH', '').split(os.pathsep)
+    if PROJECT_ROOT not in python_path:
+        os.environ['PYTHONPATH'] = os.pathsep.join([PROJECT_ROOT] + [path for path in python_path if path])
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([COMPUTE_WORKER_MODULE])
+    return context
+
+
+class ComputeService:
+    """
+    统计计算服务
+
+    把模型求解、大段数据聚合等CPU密集的计算放到独立的进程池中执行，不与请求线程争抢GIL。
+    排队任务数有上限，单次计算有超时；进程池已满或超时时返回同一计算上次的结果，
+    没有上次的结果时返回 None，由调用方降级为空结果，请求线程不会替进程池计算。
+    """
+
+    def __init__(self, max_workers, max_pending, timeout):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._last_results = OrderedDict()
+        self._results_lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_worker_context())
+            return self._executor
+
+    def _reset_executor(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _remember(self, key, result):
+        with self._results_lock:
+            self._last_results[key] = result
+            self._last_results.move_to_end(key)
+            while len(self._last_results) > LAST_RESULTS_SIZE:
+                self._last_results.popitem(last=False)
+
+    def _last_result(self, key):
+        with self._results_lock:
+            return self._last_results.get(key)
+
+    def run(self, key, func, *args, timeout=None):
+        """
+        在进程池中执行 func(*args) 并等待结果
+
+        参数:
+        key: 标识这次计算的可哈希值，用于保存和回退到上次的结果
+        func: 模块级函数，参数和返回值需要可序列化；参数应是位置名称等小数据，大数组由计算进程自己读取
+        timeout: 等待结果的秒数，默认为 COMPUTE_TIMEOUT
+
+        返回:
+        计算结果。进程池已满、超时或计算进程出错时返回上次的结果，没有时返回 None
+        """
+        if not self._slots.acquire(blocking=False):
+            logger.warning(f"统计计算进程池已满，返回上次的结果: {func.__name__}")
+            return self._last_result(key)
+
+        try:
+            future = self._get_executor().submit(func, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._slots.release()
+            self._reset_executor()
+            logger.error(f"提交统计计算任务失败: {func.__name__} - {str(e)}")
+            return self._last_result(key)
+        # 任务结束（包括超时后才结束）时释放排队名额
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            result = future.result(timeout=timeout or self.timeout)
+        except FutureTimeoutError:
+            logger.warning(f"统计计算超时，返回上次的结果: {func.__name__}")
+            return self._last_result(key)
+        except BrokenProcessPool as e:
+            self._reset_executor()
+            logger.error(f"统计计算进程异常退出: {func.__name__} - {str(e)}")
+            return self._last_result(key)
+        except Exception as e:
+            logger.error(f"统计计算出错: {func.__name__} - {str(e)}")
+            return self._last_result(key)
+
+        if result is not None:
+            self._remember(key, result)
+        return result
+
+    def shutdown(self):
+        """关闭进程池，不等待未完成的计算"""
+        self._reset_executor()
+
+
+# 进程内共享的统计计算服务
+compute_service = ComputeService(COMPUTE_POOL_WORKERS, COMPUTE_POOL_MAX_PENDING, COMPUTE_TIMEOUT)
+atexit.register(compute_service.shutdown)
@@ -0,0 +1,74 @@
+"""
+在统计计算进程中执行的任务
+
+这里的函数只接收和返回可序列化的小数据（快照目录、位置名称、统计量），不使用数据库会话和Flask上下文；
+房源数据由计算进程自己内存映射列式快照读取，不经过进程间传递。
+计算进程从预加载了本模块的 fork server 中fork出来，不重新导入启动进程的主模块（见 predict.compute_worker）；
+本模块及其导入的模块都不能导入 settings，否则 fork server 和每个计算进程都会创建Flask应用、数据库引擎和Redis客户端。
+"""
+from predict.snapshot import HouseSnapshot
+from predict.downsample import grid_downsample
+from predict.trend_model import solve_trend, trend_stats_from_arrays
+
+# 计算进程内按目录缓存的列式快照
+_snapshots = {}
+
+
+def _snapshot(directory):
+    snapshot = _snapshots.get(directory)
+    if snapshot is None:
+        snapshot = _snapshots[directory] = HouseSnapshot(directory)
+    return snapshot
+
+
+def trend_payload(areas, prices, stats, max_points, predicted=None):
+    """
+    生成价格走势数据：实际数据点过多时聚合；
+    predicted 为已训练模型的预测曲线，没有时由充分统计量解出
+    """
+    sampled_areas, sampled_prices, counts = grid_downsample(areas, prices, max_points)
+    return {
+        'actual': {'x': sampled_areas.tolist(), 'y': sampled_prices.tolist(), 'count': counts.tolist()},
+        'predicted': predicted if predicted is not None else solve_trend(stats)
+    }
+
+
+def snapshot_trend(directory, region, block, stats, max_points, predicted=None):
+    """用列式快照中该位置的数据点生成价格走势数据，快照中没有该位置时返回None"""
+    snapshot = _snapshot(directory)
+    view = snapshot.location(region, block)
+    if view is None:
+        return None
+    areas, prices = snapshot.area_price(view)
+    return trend_payload(areas, prices, stats, max_points, predicted)
+
+
+def snapshot_analytics(directory, region, block, community_limit):
+    """用列式快照统计某个位置，快照中没有该位置时返回None"""
+    snapshot = _snapshot(directory)
+    view = snapshot.location(region, block)
+    if view is None:
+        return None
+    cube = snapshot.analytics(view, community_limit=community_limit)
+    cube['trend'] = trend_stats_from_arrays(*snapshot.area_price(view))
+    return cube
+
+
+def snapshot_stats(directory, locations, with_prices=True):
+    """
+    用列式快照批量计算多个位置的价格走势统计量（和各户型价格统计），供批量估算租金使用
+
+    只做估算需要的聚合，不统计户型分布、小区和价格分布草图。
+    返回 {(区域, 板块或None): {'trend', 'prices'}}，快照中没有的位置不在结果中
+    """
+    snapshot = _snapshot(directory)
+    stats = {}
+    for region, block in locations:
+        view = snapshot.location(region, block)
+        if view is None:
+            continue
+        stats[(region, block)] = {
+            'trend': trend_stats_from_arrays(*snapshot.area_price(view)),
+            'prices': snapshot.layout_price_stats(view) if with_prices else {},
+        }
+    return stats
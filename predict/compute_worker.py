@@ -0,0 +1,20 @@
+"""
+统计计算进程的入口模块
+
+ComputeService 以 forkserver 方式创建计算进程，并让 fork server 预加载本模块：
+fork server 只导入本模块和 predict.compute_tasks（NumPy、列式快照），计算进程从它fork出来，不用再导入这些模块。
+
+multiprocessing 默认会在每个子进程中以 __mp_main__ 的名字重新导入启动进程的主模块（python app.py 时为 app.py），
+进而导入 settings，创建Flask应用、数据库引擎和Redis客户端。提交给计算进程的只有 predict.compute_tasks 中的函数，
+用不到主模块，所以这里在 fork server 中关闭重新导入主模块这一步。本模块只应由 fork server 导入。
+"""
+from multiprocessing import spawn
+import predict.compute_tasks  # noqa: F401  预加载计算任务，计算进程fork后直接使用
+
+
+def _skip_main_module(*args):
+    """计算进程不重新导入启动进程的主模块"""
+
+
+spawn._fixup_main_from_path = _skip_main_module
+spawn._fixup_main_from_name = _skip_main_module
@@ -0,0 +1,40 @@
+import numpy as np
+
+# 散点数据默认最多返回的点数
+DEFAULT_MAX_POINTS = 2000
+# 请求参数 max_points 的上限
+MAX_POINTS_LIMIT = 10000
+
+
+def clamp_max_points(max_points):
+    """把请求中的 max_points 限制在 [1, MAX_POINTS_LIMIT] 之间，未传时使用默认值"""
+    if max_points is None:
+        return DEFAULT_MAX_POINTS
+    return min(max(max_points, 1), MAX_POINTS_LIMIT)
+
+
+def _bin_index(values, side):
+    low, high = values.min(), values.max()
+    if high <= low:
+        return np.zeros(len(values), dtype=np.int64)
+    return np.minimum(((values - low) / (high - low) * side).astype(np.int64), side - 1)
+
+
+def grid_downsample(xs, ys, max_points=DEFAULT_MAX_POINTS):
+    """
+    网格分箱降采样
+
+    点数不超过 max_points 时原样返回；否则把 x-y 平面均匀划分为不超过 max_points 个格子，
+    每个非空格子输出格内点的均值和点数，返回的点数与房源数量无关。
+
+    返回:
+    (x数组, y数组, 点数数组)
+    """
+    if len(xs) <= max_points:
+        return xs, ys, np.ones(len(xs), dtype=np.int64)
+    side = max(int(np.sqrt(max_points)), 1)
+    cells = _bin_index(xs, side) * side + _bin_index(ys, side)
+    _, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+    sum_x = np.bincount(inverse, weights=xs)
+    sum_y = np.bincount(inverse, weights=ys)
+    return np.round(sum_x / counts, 2), np.round(sum_y / counts, 2), counts
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from datetime import datetime
+import joblib
+import numpy as np
+from settings import MODEL_REGISTRY_DIR
+from predict.trend_model import AREA_SCALE, TREND_CURVE_POINTS, trend_curve
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('model_registry')
+
+# 模型格式版本，格式变化时旧模型会被忽略，需要重新训练
+REGISTRY_FORMAT_VERSION = 1
+# 模型名称，写入元数据
+TREND_MODEL_NAME = 'area_price_quadratic'
+
+# API进程检查是否有新版本模型的间隔（秒）
+RELOAD_CHECK_INTERVAL = 30
+
+# 保留的模型版本数
+KEEP_VERSIONS = 3
+
+# 指向当前模型版本的文件
+CURRENT_FILE = 'CURRENT'
+META_FILE = 'meta.json'
+MODELS_FILE = 'trend_models.joblib'
+
+
+def model_location(region, block=None):
+    """模型的位置键，与物化统计数据的位置名称相同"""
+    return f"block:{region}:{block}" if block else f"region:{region}"
+
+
+class ModelRegistry:
+    """
+    价格走势模型注册表
+
+    离线训练把所有位置的模型系数保存为一个版本目录（未压缩的 joblib 文件 + meta.json），
+    再原子地切换 CURRENT。API进程第一次使用时以内存映射方式加载，
+    之后定期检查 CURRENT，有新版本时重新加载，请求中只计算已训练好的模型。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.meta = {}
+        self.models = {}
+        self.index = {}
+        self._current = None
+        self._last_reload_check = 0
+
+    def publish(self, models, metadata=None):
+        """
+        保存新版本的模型并切换为当前版本
+
+        models: {位置键: fit_trend_model 的结果}，结果为None的位置不保存
+        metadata: 额外写入元数据的字段，例如训练耗时
+        """
+        locations = [location for location, model in models.items() if model is not None]
+        trained = [models[location] for location in locations]
+        arrays = {
+            'coef': np.array([model['coef'] for model in trained], dtype=np.float64).reshape(-1, 3),
+            'range': np.array([[model['min_x'], model['max_x']] for model in trained],
+                              dtype=np.float64).reshape(-1, 2),
+            'samples': np.array([model['n'] for model in trained], dtype=np.int64),
+        }
+
+        version = str(int(time.time() * 1000))
+        path = os.path.join(self.directory, version)
+        os.makedirs(path, exist_ok=True)
+        # 不压缩，加载时才能内存映射
+        joblib.dump(arrays, os.path.join(path, MODELS_FILE))
+        with open(os.path.join(path, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({
+                'format': REGISTRY_FORMAT_VERSION,
+                'version': version,
+                'model': TREND_MODEL_NAME,
+                'area_scale': AREA_SCALE,
+                'trained_at': datetime.now().isoformat(timespec='seconds'),
+                'locations': locations,
+                'samples': int(arrays['samples'].sum()),
+                **(metadata or {}),
+            }, f, ensure_ascii=False)
+
+        # 原子地切换当前版本
+        tmp_path = os.path.join(self.directory, f"{CURRENT_FILE}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.directory, CURRENT_FILE))
+        logger.info(f"已发布价格走势模型: {len(locations)} 个位置, 版本 {version}")
+
+        self._cleanup()
+        return version
+
+    def _cleanup(self):
+        """删除较旧的模型版本"""
+        versions = sorted((name for name in os.listdir(self.directory) if name.isdigit()), key=int)
+        for version in versions[:-KEEP_VERSIONS]:
+            shutil.rmtree(os.path.join(self.directory, version), ignore_errors=True)
+
+    def _read_current(self):
+        with open(os.path.join(self.directory, CURRENT_FILE)) as f:
+            return f.read().strip()
+
+    def load(self):
+        """内存映射加载当前版本的模型，不存在或格式不符时返回 False"""
+        try:
+            version = self._read_current()
+            path = os.path.join(self.directory, version)
+            with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('format') != REGISTRY_FORMAT_VERSION or meta.get('area_scale') != AREA_SCALE:
+                logger.info(f"模型格式不符，需要重新训练: {path}")
+                return False
+            models = joblib.load(os.path.join(path, MODELS_FILE), mmap_mode='r')
+        except (OSError, ValueError) as e:
+            logger.info(f"没有可用的价格走势模型: {str(e)}")
+            return False
+        with self.lock:
+            self.meta = meta
+            self.models = models
+            self.index = {location: i for i, location in enumerate(meta['locations'])}
+            self._current = version
+            self.loaded = True
+        logger.info(f"已加载价格走势模型: {len(self.index)} 个位置, 版本 {version}")
+        return True
+
+    def _maybe_reload(self):
+        """离线训练发布了新版本时重新加载"""
+        now = time.time()
+        # 没有可用模型时同样节流，避免每个请求都读取 CURRENT
+        if now - self._last_reload_check < RELOAD_CHECK_INTERVAL:
+            return
+        self._last_reload_check = now
+        try:
+            version = self._read_current()
+        except OSError:
+            return
+        if version != self._current:
+            self.load()
+
+    def coefficients(self, region, block=None):
+        """
+        某个位置已训练模型的 (系数数组, 最小面积, 最大面积)
+
+        位置按名称精确匹配；没有可用模型或该位置没有训练模型时返回None
+        """
+        self._maybe_reload()
+        with self.lock:
+            if not self.loaded or not region:
+                return None
+            i = self.index.get(model_location(region, block or None))
+            if i is None:
+                return None
+            min_x, max_x = self.models['range'][i]
+            return np.array(self.models['coef'][i]), float(min_x), float(max_x)
+
+    def predict(self, region, block=None, points=TREND_CURVE_POINTS):
+        """用已训练的模型生成某个位置的预测曲线，没有模型时返回None"""
+        model = self.coefficients(region, block)
+        if model is None:
+            return None
+        return trend_curve(*model, points)
+
+
+# 进程内共享的价格走势模型注册表
+model_registry = ModelRegistry(MODEL_REGISTRY_DIR)
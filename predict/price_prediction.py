@@ -1,102 +1,251 @@
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
 import pandas as pd
-from models import House, db
+from models import House, PriceRollup, ROLLUP_MONTH, db
 from sqlalchemy import func, desc, or_
 import logging
+from utils import redis_utils
+from utils.locations import resolve_location
+from settings import ANALYTICS_SNAPSHOT_DIR
+from predict.columnar import fetch_area_price
+from predict.snapshot import HouseSnapshot
+from predict.downsample import DEFAULT_MAX_POINTS
+from predict.trend_model import trend_stats_from_arrays
+from predict.price_sketch import sketch_bucket, merge_sketches, sketch_summary, sketch_quantiles, SKETCH_QUANTILES
+from predict.price_rollup import forecast_series, FORECAST_HISTORY_PERIODS, DEFAULT_FORECAST_PERIODS
+from predict.model_registry import model_registry
+from predict.compute_service import compute_service
+from predict.compute_tasks import trend_payload, snapshot_trend, snapshot_analytics, snapshot_stats
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('price_prediction')
 
-def predict_price_trend(region, block=None):
+# 进程内共享的房源列式快照（统计计算进程按 ANALYTICS_SNAPSHOT_DIR 各自打开）
+house_snapshot = HouseSnapshot(ANALYTICS_SNAPSHOT_DIR)
+
+def filter_by_location(query, region, block=None, exact=False):
+    """
+    按区域/街区筛选房源
+    
+    名称在位置字典中时按整数位置ID等值筛选（使用 region_id/block_id 索引）；
+    否则 exact 为 True 时按名称精确匹配，为 False 时模糊匹配
+    """
+    location_ids = resolve_location(region, block)
+    if location_ids is not None:
+        region_id, block_id = location_ids
+        if block_id is not None:
+            return query.filter(House.block_id == block_id)
+        return query.filter(House.region_id == region_id)
+    
+    if exact:
+        if region:
+            query = query.filter(House.region == region)
+        if block:
+            query = query.filter(House.block == block)
+        return query
+    query = query.filter(House.region.like(f'%{region}%'))
+    if block:
+        query = query.filter(House.block.like(f'%{block}%'))
+    return query
+
+def get_cached_analytics(region, block=None, community_limit=20):
+    """
+    读取区域/板块的统计数据，不访问MySQL：优先读Redis中物化的数据，其次用内存映射的列式快照计算；都没有时返回None
+
+    统计数据按精确的区域、板块名称存储，详情页传入的正是房源自身的区域和板块
+    """
+    if not region:
+        return None
+    cube = redis_utils.get_analytics_cube(region, block or None, community_limit=community_limit)
+    if cube is not None:
+        return cube
+    
+    if house_snapshot.location(region, block or None) is not None:
+        # 快照中有该位置时，在统计计算进程中聚合
+        cube = compute_service.run(('snapshot_analytics', region, block or None, community_limit),
+                                   snapshot_analytics, house_snapshot.directory, region, block or None,
+                                   community_limit)
+        if cube is not None:
+            return cube
+    
+    logger.info(f"缓存未命中: 区域统计数据 {region}-{block if block else ''}")
+    return None
+
+def get_cached_location_stats(locations, with_prices=True):
+    """
+    批量读取多个区域/板块的价格走势统计量（和各户型价格统计），不访问MySQL
+
+    先用一次Redis往返读取物化的数据，没有物化且在列式快照中的位置合并为一个计算任务交给统计计算进程。
+    返回 (统计数据, 未取到的位置集合)：统计数据为 {(区域, 板块或None): {'trend', 'prices'}}；
+    计算进程池已满或超时时相应位置在第二项中，由调用方决定如何提示
+    """
+    locations = {(region, block or None) for region, block in locations if region}
+    stats = redis_utils.get_analytics_stats(locations, with_prices=with_prices) or {}
+    missing = [location for location in locations
+               if location not in stats and house_snapshot.location(*location) is not None]
+    unavailable = set()
+    if missing:
+        missing.sort(key=lambda location: (location[0], location[1] or ''))
+        computed = compute_service.run(('snapshot_stats', tuple(missing), with_prices), snapshot_stats,
+                                       house_snapshot.directory, missing, with_prices)
+        if computed is None:
+            logger.warning(f"统计计算进程池繁忙，{len(missing)} 个位置的统计数据暂不可用")
+            unavailable.update(missing)
+        else:
+            stats.update(computed)
+    return stats, unavailable
+
+def get_location_points(query, region, block=None):
+    """
+    某个位置的 (面积数组, 价格数组)：优先从列式快照中切出该位置的连续一段，否则按列查询数据库
+
+    query: 快照中没有该位置时使用的查询
+    """
+    view = house_snapshot.location(region, block or None)
+    if view is not None:
+        return house_snapshot.area_price(view)
+    return fetch_area_price(query)
+
+def _distribution_data(layouts):
+    """户型 -> 房源数 转换为饼图数据，按房源数降序"""
+    return [{'name': room_type, 'value': count}
+            for room_type, count in sorted(layouts.items(), key=lambda item: -item[1])]
+
+def _ranking_data(communities):
+    """[(小区, 房源数), ...] 转换为柱状图数据"""
+    return {
+        'addresses': [address for address, _ in communities],
+        'counts': [count for _, count in communities]
+    }
+
+def _price_stats_list(prices, sketches=None):
+    """
+    {(卧室数, 客厅数): {'count', 'sum', 'min', 'max'}} 转换为 get_room_type_price_stats 的返回格式
+
+    sketches: 各户型的价格分布草图，有时每项再加上 p10_price/median_price/p90_price
+    """
+    result = []
+    for (bedrooms, livingrooms), stats in sorted(prices.items()):
+        item = {
+            'room_type': f'{bedrooms}室{livingrooms}厅',
+            'bedrooms': bedrooms,
+            'livingrooms': livingrooms,
+            'avg_price': round(stats['sum'] / stats['count'], 2),
+            'min_price': round(stats['min'], 2),
+            'max_price': round(stats['max'], 2),
+            'count': stats['count']
+        }
+        if sketches is not None:
+            values = sketch_quantiles(sketches.get((bedrooms, livingrooms), {}), [q for _, q in SKETCH_QUANTILES])
+            item.update({f'{name}_price': value for (name, _), value in zip(SKETCH_QUANTILES, values)})
+        result.append(item)
+    return result
+
+def _room_price_data(result):
+    """get_room_type_price_stats 的结果转换为折线图数据"""
+    return {
+        'room_types': [item['room_type'] for item in result],
+        'avg_prices': [item['avg_price'] for item in result],
+        'min_prices': [item['min_price'] for item in result],
+        'max_prices': [item['max_price'] for item in result],
+        'median_prices': [item.get('median_price') for item in result],
+        'p10_prices': [item.get('p10_price') for item in result],
+        'p90_prices': [item.get('p90_price') for item in result],
+        'counts': [item['count'] for item in result]
+    }
+
+def _price_distribution_data(sketches):
+    """
+    各户型的价格分布草图转换为价格分布数据
+
+    返回 {'overall': 整个位置的分布, 'room_types': [各户型的分布, ...]}，
+    分布格式同 sketch_summary，户型的分布另有 room_type/bedrooms/livingrooms
+    """
+    overall = {}
+    room_types = []
+    for (bedrooms, livingrooms), sketch in sorted(sketches.items()):
+        overall = merge_sketches(overall, sketch)
+        summary = sketch_summary(sketch)
+        summary.update({'room_type': f'{bedrooms}室{livingrooms}厅', 'bedrooms': bedrooms, 'livingrooms': livingrooms})
+        room_types.append(summary)
+    return {'overall': sketch_summary(overall), 'room_types': room_types}
+
+def _empty_price_distribution_data():
+    return {'overall': sketch_summary({}), 'room_types': []}
+
+def _empty_trend_data():
+    return {
+        'actual': {'x': [], 'y': [], 'count': []},
+        'predicted': {'x': [], 'y': []}
+    }
+
+def _trend_data(region, block, query, stats, max_points, predicted=None, points=None):
+    """
+    生成价格走势数据
+
+    快照中有该位置时在统计计算进程中读取快照生成，进程间只传递位置名称和统计量，
+    进程池已满或超时且没有上次结果时返回空结果；
+    否则用已读取的 points=(面积数组, 价格数组) 或按列查询数据库，在当前进程中生成
+    """
+    if house_snapshot.location(region, block or None) is not None:
+        result = compute_service.run(('price_trend', region, block or None, max_points),
+                                     snapshot_trend, house_snapshot.directory, region, block or None,
+                                     stats, max_points, predicted)
+        return result if result is not None else _empty_trend_data()
+    areas, prices = points if points is not None else fetch_area_price(query)
+    return trend_payload(areas, prices, stats, max_points, predicted)
+
+def predict_price_trend(region, block=None, max_points=DEFAULT_MAX_POINTS):
     """
     预测特定区域或小区的房价走势
     
     参数:
     region: 区域名称
     block: 街区名称，可选
+    max_points: 实际数据点最多返回的点数，超过时按网格分箱聚合
     
     返回:
-    预测结果字典，包含x轴（面积）和y轴（价格）数据
+    预测结果字典，包含x轴（面积）和y轴（价格）数据；实际数据点聚合后附带每个点代表的房源数 count
     """
     try:
         logger.info(f"开始预测区域 {region}-{block if block else ''} 的房价走势")
         
         # 查询指定区域/街区的房源数据，使用模糊匹配
-        query = House.query.filter(House.region.like(f'%{region}%'))
-        if block:
-            query = query.filter(House.block.like(f'%{block}%'))
-        
-        houses = query.all()
-        logger.info(f"查询到 {len(houses)} 条房源数据")
-        
-        # 提取面积和价格数据
-        areas = []
-        prices = []
-        for house in houses:
-            try:
-                # 提取面积数字部分
-                area_str = house.area.replace('平方米', '').strip()
-                area = float(area_str)
-                # 确保价格是数值类型
-                price = float(house.price)
-                areas.append(area)
-                prices.append(price)
-            except (ValueError, TypeError) as e:
-                logger.warning(f"处理房源数据时出错: {e}, 房源ID: {house.id}")
-                continue
-        
-        if len(areas) < 5:  # 数据太少，无法进行有效预测
-            logger.warning(f"数据点数量不足，无法进行预测: {len(areas)} < 5")
-            return {
-                'actual': {'x': areas, 'y': prices},
-                'predicted': {'x': [], 'y': []}
-            }
-        
-        # 将数据转换为numpy数组
-        X = np.array(areas).reshape(-1, 1)
-        y = np.array(prices)
-        
-        # 创建多项式特征
-        poly = PolynomialFeatures(degree=2)
-        X_poly = poly.fit_transform(X)
-        
-        # 拟合线性回归模型
-        model = LinearRegression()
-        model.fit(X_poly, y)
-        
-        # 生成预测数据点
-        X_pred = np.linspace(min(areas), max(areas), 50).reshape(-1, 1)
-        X_pred_poly = poly.transform(X_pred)
-        y_pred = model.predict(X_pred_poly)
-        
-        # 返回实际数据点和预测数据点
-        result = {
-            'actual': {'x': areas, 'y': prices},
-            'predicted': {'x': X_pred.flatten().tolist(), 'y': y_pred.tolist()}
-        }
+        query = filter_by_location(House.query, region, block)
+        
+        # 优先使用离线训练的模型；该位置没有模型时，走势曲线由物化的充分统计量解出（只解3x3方程，不扫描数据），
+        # 也没有物化的统计量时返回空曲线，不在请求中聚合数据库
+        predicted = model_registry.predict(region, block)
+        stats = None
+        if predicted is None:
+            cube = get_cached_analytics(region, block)
+            if cube is not None:
+                stats = cube['trend']
+            else:
+                logger.warning(f"区域 {region}-{block if block else ''} 没有训练好的价格走势模型和物化统计量，"
+                               f"需要运行 train_models.py 重新训练")
         
-        logger.info(f"房价走势预测完成，实际数据点: {len(areas)}，预测数据点: {len(X_pred)}")
+        # 没有模型时由充分统计量解出二次多项式（数据太少时返回空曲线），实际数据点过多时聚合
+        result = _trend_data(region, block, query, stats, max_points, predicted)
+        
+        logger.info(f"房价走势预测完成，实际数据点: {sum(result['actual']['count'])}"
+                    f"（返回 {len(result['actual']['x'])} 个），预测数据点: {len(result['predicted']['x'])}")
         return result
     
     except Exception as e:
         logger.error(f"房价走势预测失败: {str(e)}")
         # 返回空结果
-        return {
-            'actual': {'x': [], 'y': []},
-            'predicted': {'x': [], 'y': []}
-        }
+        return _empty_trend_data()
 
-def get_room_type_distribution(region, block=None):
+def get_room_type_distribution(region, block=None, exact=False):
     """
     获取特定区域或小区的户型分布
     
     参数:
     region: 区域名称
     block: 街区名称，可选
+    exact: 是否精确匹配区域/街区
     
     返回:
     户型分布数据，适用于饼图
@@ -104,10 +253,13 @@ def get_room_type_distribution(region, block=None):
     try:
         logger.info(f"开始获取区域 {region}-{block if block else ''} 的户型分布")
         
-        # 查询指定区域/街区的房源数据，使用模糊匹配
-        query = House.query.filter(House.region.like(f'%{region}%'))
-        if block:
-            query = query.filter(House.block.like(f'%{block}%'))
+        # 优先读取物化的统计数据
+        cube = get_cached_analytics(region, block)
+        if cube is not None:
+            return _distribution_data(cube['layouts'])
+        
+        # 查询指定区域/街区的房源数据
+        query = filter_by_location(House.query, region, block, exact)
         
         # 使用SQLAlchemy进行分组统计
         result = query.with_entities(
@@ -125,7 +277,7 @@ def get_room_type_distribution(region, block=None):
         logger.error(f"户型分布获取失败: {str(e)}")
         return []
 
-def get_top_communities(region, block=None, limit=20):
+def get_top_communities(region, block=None, limit=20, exact=False):
     """
     获取特定区域或街区中房源数量最多的小区
     
@@ -133,6 +285,7 @@ def get_top_communities(region, block=None, limit=20):
     region: 区域名称
     block: 街区名称，可选
     limit: 返回的小区数量，默认为20
+    exact: 是否精确匹配区域/街区
     
     返回:
     小区名称和对应的房源数量
@@ -140,14 +293,16 @@ def get_top_communities(region, block=None, limit=20):
     try:
         logger.info(f"开始获取区域 {region}-{block if block else ''} 的小区房源数量排名")
         
-        # 查询指定区域/街区的房源数据，使用模糊匹配
-        query = db.session.query(
+        # 优先读取物化的统计数据
+        cube = get_cached_analytics(region, block, community_limit=limit)
+        if cube is not None:
+            return _ranking_data(cube['communities'])
+        
+        # 查询指定区域/街区的房源数据
+        query = filter_by_location(db.session.query(
             House.address, 
             func.count(House.id).label('count')
-        ).filter(House.region.like(f'%{region}%'))
-        
-        if block:
-            query = query.filter(House.block.like(f'%{block}%'))
+        ), region, block, exact)
         
         # 按小区分组并按房源数量降序排序
         result = query.group_by(House.address).order_by(desc('count')).limit(limit).all()
@@ -169,57 +324,219 @@ def get_top_communities(region, block=None, limit=20):
             'counts': []
         }
 
+def get_room_type_price_stats(region, block=None, exact=False):
+    """
+    按户型（卧室数/客厅数）一次分组统计价格
+    
+    参数:
+    region: 区域名称
+    block: 街区名称，可选
+    exact: 是否精确匹配区域/街区
+    
+    返回:
+    按户型排序的列表，每项包含 room_type/bedrooms/livingrooms/avg_price/min_price/max_price/count
+    """
+    # 优先读取物化的统计数据
+    cube = get_cached_analytics(region, block)
+    if cube is not None:
+        return _price_stats_list(cube['prices'])
+    
+    query = filter_by_location(House.query, region, block, exact)
+    rows = query.filter(
+        House.bedrooms.isnot(None), House.livingrooms.isnot(None), House.price_num.isnot(None)
+    ).with_entities(
+        House.bedrooms, House.livingrooms,
+        func.avg(House.price_num), func.min(House.price_num), func.max(House.price_num), func.count(House.id)
+    ).group_by(House.bedrooms, House.livingrooms).order_by(House.bedrooms, House.livingrooms).all()
+    
+    return [{
+        'room_type': f'{bedrooms}室{livingrooms}厅',
+        'bedrooms': bedrooms,
+        'livingrooms': livingrooms,
+        'avg_price': round(avg_price, 2),
+        'min_price': round(min_price, 2),
+        'max_price': round(max_price, 2),
+        'count': count
+    } for bedrooms, livingrooms, avg_price, min_price, max_price, count in rows]
+
 def get_price_by_room_type(region, block=None):
     """
-    获取特定区域或小区不同户型的平均价格
+    获取特定区域或小区不同户型的平均、最低、最高价格
     
     参数:
     region: 区域名称
     block: 街区名称，可选
     
     返回:
-    户型和对应的平均价格
+    户型和对应的平均价格、最低价格、最高价格、房源数量
     """
     try:
         logger.info(f"开始获取区域 {region}-{block if block else ''} 的户型价格")
         
-        # 常见户型列表
-        common_room_types = ['1室0厅', '1室1厅', '2室1厅', '2室2厅', '3室1厅', '3室2厅', '4室1厅', '4室2厅']
-        
-        # 查询指定区域/街区的房源数据，使用模糊匹配
-        query = House.query.filter(House.region.like(f'%{region}%'))
-        if block:
-            query = query.filter(House.block.like(f'%{block}%'))
-        
-        # 获取每种户型的平均价格
-        result = []
-        for room_type in common_room_types:
-            try:
-                avg_price = query.filter(House.rooms == room_type).with_entities(
-                    func.avg(func.cast(House.price, db.Float))
-                ).scalar()
-                
-                if avg_price:
-                    result.append({
-                        'room_type': room_type,
-                        'avg_price': round(avg_price, 2)
-                    })
-            except Exception as e:
-                logger.warning(f"获取户型 {room_type} 的价格时出错: {str(e)}")
+        # 一条分组查询得到所有户型的统计值
+        result = get_room_type_price_stats(region, block)
         
+        logger.info(f"户型价格获取完成，共 {len(result)} 种户型")
         # 转换为折线图数据格式
-        room_types = [item['room_type'] for item in result]
-        avg_prices = [item['avg_price'] for item in result]
+        return _room_price_data(result)
+    
+    except Exception as e:
+        logger.error(f"户型价格获取失败: {str(e)}")
+        return _room_price_data([])
+
+def get_price_distribution(region, block=None):
+    """
+    获取特定区域或板块整体和各户型的价格分布：p10、中位数、p90和直方图
+    
+    参数:
+    region: 区域名称
+    block: 街区名称，可选
+    
+    返回:
+    {'overall': {...}, 'room_types': [{...}, ...]}，每项包含 count/p10/median/p90/histogram
+    """
+    try:
+        logger.info(f"开始获取区域 {region}-{block if block else ''} 的价格分布")
         
-        logger.info(f"户型价格获取完成，共 {len(room_types)} 种户型")
-        return {
-            'room_types': room_types,
-            'avg_prices': avg_prices
+        # 优先读取物化的价格分布草图，耗时与房源数量无关
+        cube = get_cached_analytics(region, block)
+        if cube is None:
+            cube, _, _ = _scan_location_analytics(filter_by_location(House.query, region, block))
+        
+        result = _price_distribution_data(cube['sketches'])
+        logger.info(f"价格分布获取完成，共 {len(result['room_types'])} 种户型")
+        return result
+    
+    except Exception as e:
+        logger.error(f"价格分布获取失败: {str(e)}")
+        return _empty_price_distribution_data()
+
+def get_price_forecast(region, block=None, granularity=ROLLUP_MONTH, periods=DEFAULT_FORECAST_PERIODS):
+    """
+    按发布时间汇总的单价序列预测之后若干个月/周的单价
+    
+    参数:
+    region: 区域名称
+    block: 街区名称，可选
+    granularity: ROLLUP_MONTH（按月）或 ROLLUP_WEEK（按周）
+    periods: 预测的时间段数
+    
+    返回:
+    格式同 forecast_series；位置不在位置字典中时返回空序列
+    """
+    try:
+        logger.info(f"开始预测区域 {region}-{block if block else ''} 的单价走势")
+        
+        location_ids = resolve_location(region, block)
+        location_id = None
+        if location_ids is not None:
+            location_id = location_ids[1] if block else location_ids[0]
+        
+        # 只读取汇总表中最近的若干个时间段，耗时与房源数量无关
+        rows = []
+        if location_id is not None:
+            rows = db.session.query(
+                PriceRollup.period_start, PriceRollup.house_count,
+                PriceRollup.unit_price_sum, PriceRollup.unit_price_sq_sum
+            ).filter(
+                PriceRollup.location_id == location_id, PriceRollup.granularity == granularity
+            ).order_by(PriceRollup.period_start.desc()).limit(FORECAST_HISTORY_PERIODS[granularity]).all()
+        
+        result = forecast_series(list(reversed(rows)), granularity, periods)
+        logger.info(f"单价走势预测完成，历史时间段: {len(rows)}")
+        return result
+    
+    except Exception as e:
+        logger.error(f"单价走势预测失败: {str(e)}")
+        return forecast_series([], granularity, periods)
+
+def _scan_location_analytics(query, community_limit=20):
+    """
+    一次扫描某个位置的房源，得到与物化统计数据相同结构的结果和实际数据点
+
+    返回 (统计数据, 面积数组, 价格数组)
+    """
+    rows = query.with_entities(
+        House.rooms, House.address, House.bedrooms, House.livingrooms, House.area_sqm, House.price_num).all()
+    layouts, communities, prices, sketches, points = {}, {}, {}, {}, []
+    for rooms, address, bedrooms, livingrooms, area, price in rows:
+        if rooms:
+            layouts[rooms] = layouts.get(rooms, 0) + 1
+        if address:
+            communities[address] = communities.get(address, 0) + 1
+        if price is None:
+            continue
+        if bedrooms is not None and livingrooms is not None:
+            stats = prices.get((bedrooms, livingrooms))
+            if stats is None:
+                prices[(bedrooms, livingrooms)] = {'count': 1, 'sum': price, 'min': price, 'max': price}
+            else:
+                stats['count'] += 1
+                stats['sum'] += price
+                stats['min'] = min(stats['min'], price)
+                stats['max'] = max(stats['max'], price)
+            bucket = sketch_bucket(price)
+            if bucket is not None:
+                sketch = sketches.setdefault((bedrooms, livingrooms), {})
+                sketch[bucket] = sketch.get(bucket, 0) + 1
+        if area is not None:
+            points.append((area, price))
+    
+    data = np.array(points, dtype=np.float64).reshape(-1, 2)
+    areas, area_prices = data[:, 0], data[:, 1]
+    cube = {
+        'layouts': layouts,
+        'communities': sorted(communities.items(), key=lambda item: -item[1])[:community_limit],
+        'prices': prices,
+        'trend': trend_stats_from_arrays(areas, area_prices),
+        'sketches': sketches,
+    }
+    return cube, areas, area_prices
+
+def get_location_analytics(region, block=None, max_points=DEFAULT_MAX_POINTS):
+    """
+    一次得到详情页图表的数据：价格走势、户型分布、小区房源数TOP20、户型价格、价格分布
+    
+    参数:
+    region: 区域名称
+    block: 街区名称，可选
+    max_points: 价格走势实际数据点最多返回的点数
+    
+    返回:
+    {'price_trend', 'room_distribution', 'community_ranking', 'room_price', 'price_distribution'}，
+    格式分别与 predict_price_trend、get_room_type_distribution、get_top_communities、get_price_by_room_type、
+    get_price_distribution 相同
+    """
+    try:
+        logger.info(f"开始获取区域 {region}-{block if block else ''} 的统计数据")
+        
+        query = filter_by_location(House.query, region, block)
+        
+        # 有物化的统计数据或快照时实际数据点由快照或按列查询得到，否则一次扫描该位置的房源得到全部统计
+        cube = get_cached_analytics(region, block)
+        points = None
+        if cube is None:
+            cube, areas, prices = _scan_location_analytics(query)
+            points = (areas, prices)
+        
+        result = {
+            'price_trend': _trend_data(region, block, query, cube['trend'], max_points,
+                                       model_registry.predict(region, block), points),
+            'room_distribution': _distribution_data(cube['layouts']),
+            'community_ranking': _ranking_data(cube['communities']),
+            'room_price': _room_price_data(_price_stats_list(cube['prices'], cube['sketches'])),
+            'price_distribution': _price_distribution_data(cube['sketches'])
         }
+        
+        logger.info(f"区域统计数据获取完成，实际数据点: {sum(result['price_trend']['actual']['count'])}")
+        return result
     
     except Exception as e:
-        logger.error(f"户型价格获取失败: {str(e)}")
+        logger.error(f"区域统计数据获取失败: {str(e)}")
         return {
-            'room_types': [],
-            'avg_prices': []
-        } 
\ No newline at end of file
+            'price_trend': _empty_trend_data(),
+            'room_distribution': [],
+            'community_ranking': {'addresses': [], 'counts': []},
+            'room_price': _room_price_data([]),
+            'price_distribution': _empty_price_distribution_data()
+        }
@@ -0,0 +1,165 @@
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from models import db, PriceRollup, ROLLUP_MONTH, ROLLUP_WEEK
+
+# 汇总的粒度
+ROLLUP_GRANULARITIES = (ROLLUP_MONTH, ROLLUP_WEEK)
+# 请求参数中的粒度名称
+ROLLUP_GRANULARITY_NAMES = {'month': ROLLUP_MONTH, 'week': ROLLUP_WEEK}
+
+# 拟合时使用的最近时间段数
+FORECAST_HISTORY_PERIODS = {ROLLUP_MONTH: 24, ROLLUP_WEEK: 52}
+# 有数据的时间段少于该数量时不做预测
+MIN_FORECAST_PERIODS = 3
+# 默认预测的时间段数，请求参数 periods 的上限
+DEFAULT_FORECAST_PERIODS = 3
+MAX_FORECAST_PERIODS = 12
+# 预测区间的宽度（约95%）
+FORECAST_INTERVAL_Z = 1.96
+
+# 每条 INSERT 语句最多写入的汇总行数
+ROLLUP_WRITE_BATCH_SIZE = 1000
+
+
+def period_start(timestamp, granularity):
+    """发布时间（Unix时间戳）所在时间段的起点，按本地时间划分月和周"""
+    moment = datetime.fromtimestamp(timestamp)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == ROLLUP_MONTH:
+        day = day.replace(day=1)
+    else:
+        day -= timedelta(days=day.weekday())
+    return int(day.timestamp())
+
+
+def _period_index(start, granularity):
+    """时间段的序号，相邻时间段相差1，用作拟合的自变量"""
+    day = datetime.fromtimestamp(start)
+    if granularity == ROLLUP_MONTH:
+        return day.year * 12 + day.month - 1
+    return (day.toordinal() - 1) // 7
+
+
+def _period_label(index, granularity):
+    """时间段序号转换为展示用的标签：按月为 YYYY-MM，按周为当周周一的日期"""
+    if granularity == ROLLUP_MONTH:
+        return f"{index // 12}-{index % 12 + 1:02d}"
+    return datetime.fromordinal(index * 7 + 1).strftime('%Y-%m-%d')
+
+
+def unit_price(price, area):
+    """单价（元/平方米/月），价格或面积无效时返回None"""
+    if price is None or area is None or area <= 0:
+        return None
+    return price / area
+
+
+def add_rollup(rollups, location_ids, publish_time, price_per_sqm, delta=1):
+    """
+    把一个房源计入（delta=-1 时移出）各位置、各粒度的汇总
+
+    rollups: {(位置ID, 粒度, 时间段起点): [房源数, 单价之和, 单价平方和]}，原地修改
+    location_ids: 房源所在的区域ID、板块ID，None会被忽略
+    """
+    if publish_time is None or price_per_sqm is None:
+        return
+    for granularity in ROLLUP_GRANULARITIES:
+        start = period_start(publish_time, granularity)
+        for location_id in location_ids:
+            if location_id is None:
+                continue
+            values = rollups.setdefault((location_id, granularity, start), [0, 0.0, 0.0])
+            values[0] += delta
+            values[1] += delta * price_per_sqm
+            values[2] += delta * price_per_sqm ** 2
+
+
+def _rollup_rows(rollups):
+    return [{
+        'location_id': location_id, 'granularity': granularity, 'period_start': start,
+        'house_count': count, 'unit_price_sum': total, 'unit_price_sq_sum': square_total,
+    } for (location_id, granularity, start), (count, total, square_total) in rollups.items()]
+
+
+def replace_rollups(rollups):
+    """在一个事务中用重新统计的结果整体替换汇总表"""
+    rows = _rollup_rows(rollups)
+    table = PriceRollup.__table__
+    db.session.execute(table.delete())
+    for offset in range(0, len(rows), ROLLUP_WRITE_BATCH_SIZE):
+        db.session.execute(table.insert(), rows[offset:offset + ROLLUP_WRITE_BATCH_SIZE])
+    db.session.commit()
+
+
+def apply_rollup_deltas(rollups):
+    """把房源变更产生的增量累加到汇总表，房源数减到0的时间段删除"""
+    # 修改价格时同一时间段先减后加，房源数不变但单价之和有变化
+    rows = [row for row in _rollup_rows(rollups)
+            if row['house_count'] or row['unit_price_sum'] or row['unit_price_sq_sum']]
+    if not rows:
+        return
+    table = PriceRollup.__table__
+    for offset in range(0, len(rows), ROLLUP_WRITE_BATCH_SIZE):
+        stmt = mysql_insert(table).values(rows[offset:offset + ROLLUP_WRITE_BATCH_SIZE])
+        db.session.execute(stmt.on_duplicate_key_update(
+            house_count=table.c.house_count + stmt.inserted.house_count,
+            unit_price_sum=table.c.unit_price_sum + stmt.inserted.unit_price_sum,
+            unit_price_sq_sum=table.c.unit_price_sq_sum + stmt.inserted.unit_price_sq_sum,
+        ))
+    db.session.execute(table.delete().where(table.c.house_count <= 0))
+    db.session.commit()
+
+
+def forecast_series(rows, granularity, periods=DEFAULT_FORECAST_PERIODS):
+    """
+    由汇总序列拟合单价随时间的线性趋势并预测之后的若干时间段
+
+    以各时间段的平均单价为因变量、房源数为权重做加权最小二乘，耗时只与时间段数量有关。
+
+    参数:
+    rows: 按时间排序的 [(时间段起点, 房源数, 单价之和, 单价平方和), ...]
+    granularity: ROLLUP_MONTH 或 ROLLUP_WEEK
+    periods: 预测的时间段数
+
+    返回:
+    {'history': {'x', 'avg', 'std', 'count'}, 'forecast': {'x', 'y', 'lower', 'upper'}}，
+    有数据的时间段不足时 forecast 为空
+    """
+    rows = [row for row in rows if row[1] > 0]
+    result = {
+        'history': {'x': [], 'avg': [], 'std': [], 'count': []},
+        'forecast': {'x': [], 'y': [], 'lower': [], 'upper': []}
+    }
+    if not rows:
+        return result
+
+    index = np.array([_period_index(start, granularity) for start, _, _, _ in rows], dtype=np.float64)
+    counts = np.array([count for _, count, _, _ in rows], dtype=np.float64)
+    sums = np.array([total for _, _, total, _ in rows], dtype=np.float64)
+    square_sums = np.array([square_total for _, _, _, square_total in rows], dtype=np.float64)
+    means = sums / counts
+    # 时间段内单价的标准差：E[x²] - E[x]²，浮点误差可能略小于0
+    stds = np.sqrt(np.maximum(square_sums / counts - means ** 2, 0))
+    result['history'] = {
+        'x': [_period_label(int(i), granularity) for i in index],
+        'avg': np.round(means, 2).tolist(),
+        'std': np.round(stds, 2).tolist(),
+        'count': counts.astype(np.int64).tolist(),
+    }
+    if len(rows) < MIN_FORECAST_PERIODS:
+        return result
+
+    # 加权最小二乘：权重为房源数，polyfit 的 w 作用于残差，故取平方根
+    slope, intercept = np.polyfit(index, means, 1, w=np.sqrt(counts))
+    residuals = means - (slope * index + intercept)
+    sigma = np.sqrt(np.sum(counts * residuals ** 2) / np.sum(counts))
+    future = index[-1] + np.arange(1, periods + 1)
+    predicted = slope * future + intercept
+    result['forecast'] = {
+        'x': [_period_label(int(i), granularity) for i in future],
+        'y': np.round(predicted, 2).tolist(),
+        'lower': np.round(predicted - FORECAST_INTERVAL_Z * sigma, 2).tolist(),
+        'upper': np.round(predicted + FORECAST_INTERVAL_Z * sigma, 2).tolist(),
+    }
+    return result
@@ -0,0 +1,95 @@
+import math
+import numpy as np
+from sqlalchemy import func
+
+# 价格分布草图：按对数分桶计数，桶 i 覆盖 (γ^(i-1), γ^i]，分位数的相对误差不超过 SKETCH_RELATIVE_ACCURACY。
+# 草图就是 {桶号: 房源数}，两个草图按桶相加即可合并（板块汇总为区域），
+# 删除房源时对应的桶减一，不像 t-digest/KLL 那样只能追加。
+SKETCH_RELATIVE_ACCURACY = 0.02
+SKETCH_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+SKETCH_LOG_GAMMA = math.log(SKETCH_GAMMA)
+
+# 价格分布展示的分位数和直方图的柱数
+SKETCH_QUANTILES = (('p10', 0.1), ('median', 0.5), ('p90', 0.9))
+SKETCH_HISTOGRAM_BINS = 20
+
+
+def sketch_bucket(price):
+    """单个价格所在的桶号，价格无效（为空或不大于0）时返回None"""
+    if price is None or price <= 0:
+        return None
+    return math.ceil(math.log(price) / SKETCH_LOG_GAMMA)
+
+
+def sketch_bucket_column(price_column):
+    """在数据库中计算桶号的表达式，与 sketch_bucket 的公式相同；调用方需筛选价格大于0的房源"""
+    return func.ceil(func.ln(price_column) / SKETCH_LOG_GAMMA)
+
+
+def sketch_buckets(prices):
+    """价格数组（均大于0）对应的桶号数组"""
+    return np.ceil(np.log(prices) / SKETCH_LOG_GAMMA).astype(np.int64)
+
+
+def sketch_from_prices(prices):
+    """由价格数组生成草图，忽略无效价格"""
+    prices = np.asarray(prices, dtype=np.float64)
+    prices = prices[np.isfinite(prices) & (prices > 0)]
+    buckets, counts = np.unique(sketch_buckets(prices), return_counts=True)
+    return {int(bucket): int(count) for bucket, count in zip(buckets, counts)}
+
+
+def merge_sketches(sketch, other):
+    """合并两个草图（例如把各户型合并为整个位置，或把板块汇总为区域）"""
+    merged = dict(sketch) if sketch else {}
+    for bucket, count in (other or {}).items():
+        merged[bucket] = merged.get(bucket, 0) + count
+    return merged
+
+
+def _bucket_values(buckets):
+    """桶的代表值：桶内相对误差最小的点"""
+    return 2 * np.power(SKETCH_GAMMA, buckets) / (SKETCH_GAMMA + 1)
+
+
+def sketch_quantiles(sketch, quantiles):
+    """由草图估计一组分位数，草图为空时返回None列表"""
+    items = sorted((bucket, count) for bucket, count in sketch.items() if count > 0)
+    if not items:
+        return [None] * len(quantiles)
+    buckets = np.array([bucket for bucket, _ in items], dtype=np.float64)
+    cumulative = np.cumsum([count for _, count in items])
+    ranks = np.array(quantiles) * (cumulative[-1] - 1)
+    # 第一个累计数超过秩的桶即为分位数所在的桶
+    indexes = np.searchsorted(cumulative, ranks, side='right')
+    return [round(float(value), 2) for value in _bucket_values(buckets[indexes])]
+
+
+def sketch_histogram(sketch, bins=SKETCH_HISTOGRAM_BINS):
+    """
+    把草图聚合为等宽直方图
+
+    返回 {'x': 各柱中点价格, 'y': 各柱房源数}
+    """
+    items = [(bucket, count) for bucket, count in sketch.items() if count > 0]
+    if not items:
+        return {'x': [], 'y': []}
+    values = _bucket_values(np.array([bucket for bucket, _ in items], dtype=np.float64))
+    counts = np.array([count for _, count in items], dtype=np.float64)
+    hist, edges = np.histogram(values, bins=min(bins, len(items)), weights=counts)
+    centers = (edges[:-1] + edges[1:]) / 2
+    return {'x': np.round(centers, 2).tolist(), 'y': hist.astype(np.int64).tolist()}
+
+
+def sketch_summary(sketch, bins=SKETCH_HISTOGRAM_BINS):
+    """
+    草图的分位数和直方图
+
+    返回 {'count', 'p10', 'median', 'p90', 'histogram': {'x', 'y'}}，草图为空时分位数为None
+    """
+    sketch = sketch or {}
+    summary = {'count': int(sum(count for count in sketch.values() if count > 0))}
+    values = sketch_quantiles(sketch, [q for _, q in SKETCH_QUANTILES])
+    summary.update({name: value for (name, _), value in zip(SKETCH_QUANTILES, values)})
+    summary['histogram'] = sketch_histogram(sketch, bins)
+    return summary
@@ -0,0 +1,137 @@
+import logging
+import numpy as np
+from utils.house_fields import AREA_UNITS, parse_rooms
+from predict.columnar import to_float_array
+from predict.trend_model import fit_trend, trend_predict
+from predict.model_registry import model_registry
+from predict.price_prediction import get_cached_location_stats
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('rent_estimation')
+
+# 一次请求最多估算的房源数
+MAX_ESTIMATE_ROWS = 10000
+# 报价偏离估算值超过该比例时标记为偏低/偏高
+PRICE_DEVIATION_THRESHOLD = 0.2
+
+# 评估结果
+ASSESSMENT_UNDERPRICED = 'underpriced'
+ASSESSMENT_OVERPRICED = 'overpriced'
+ASSESSMENT_FAIR = 'fair'
+
+
+def _location_levels(region, block):
+    """某个位置依次尝试的模型位置：先板块后区域"""
+    if block:
+        return (((region, block), 'block'), ((region, None), 'region'))
+    return (((region, None), 'region'),)
+
+
+def _location_model(stats, region, block):
+    """
+    某个位置可用的走势模型：先板块后区域，每一级优先使用已训练的模型，没有时由充分统计量解出
+
+    stats: get_cached_location_stats 批量取得的统计数据
+    返回 ((系数数组, 最小面积, 最大面积), 模型来源 'block'/'region')，没有可用模型时返回 (None, None)
+    """
+    for location, source in _location_levels(region, block):
+        model = model_registry.coefficients(*location)
+        if model is not None:
+            return model, source
+        trend = stats.get(location, {}).get('trend')
+        coef = fit_trend(trend)
+        if coef is not None:
+            return (coef, trend['min_x'], trend['max_x']), source
+    return None, None
+
+
+def _layout_avg_prices(stats, region, block):
+    """某个位置各户型的平均价格 {(卧室数, 客厅数): 平均价格}，没有统计数据时为空"""
+    prices = stats.get((region, block), {}).get('prices') or {}
+    return {layout: layout_stats['sum'] / layout_stats['count'] for layout, layout_stats in prices.items()}
+
+
+def estimate_rents(rows, threshold=PRICE_DEVIATION_THRESHOLD):
+    """
+    批量估算房源租金
+
+    按 (区域, 板块) 分组，每个位置取一次模型，用一次NumPy向量运算算出该组所有房源的估算价格。
+
+    参数:
+    rows: [{'region', 'block', 'area', 'rooms', 'price'(可选)}, ...]，面积和价格可以是数值或字符串
+    threshold: 报价偏离估算值超过该比例时标记为偏低/偏高
+
+    返回:
+    {'results': [{'estimate', 'model', 'layout_avg_price', 'deviation', 'assessment'}, ...]（与输入顺序相同）,
+     'summary': {'total', 'estimated', 'underpriced', 'overpriced', 'unavailable'}}；
+    无法估算的房源 estimate 为None，没有报价的房源 deviation/assessment 为None；
+    unavailable 为统计计算进程池繁忙、统计数据暂时取不到而没有估算的房源数，稍后重试即可
+    """
+    count = len(rows)
+    areas = to_float_array([row.get('area') for row in rows], AREA_UNITS)
+    prices = to_float_array([row.get('price') for row in rows])
+    estimates = np.full(count, np.nan)
+    models = [None] * count
+    layout_prices = [None] * count
+
+    groups = {}
+    for i, row in enumerate(rows):
+        groups.setdefault((row.get('region') or '', row.get('block') or None), []).append(i)
+
+    # 在逐组计算之前一次取齐所有位置需要的统计数据：没有已训练模型的位置取走势统计量，
+    # 有户型的分组再取该位置的户型价格统计
+    with_rooms = {location for location, indexes in groups.items() if any(rows[i].get('rooms') for i in indexes)}
+    locations = set(with_rooms)
+    for region, block in groups:
+        if region:
+            locations.update(location for location, _ in _location_levels(region, block)
+                             if model_registry.coefficients(*location) is None)
+    stats, unavailable = get_cached_location_stats(locations, with_prices=bool(with_rooms))
+    unavailable_rows = np.zeros(count, dtype=bool)
+
+    for (region, block), indexes in groups.items():
+        if not region:
+            continue
+        model, source = _location_model(stats, region, block)
+        if model is None:
+            if any(location in unavailable for location, _ in _location_levels(region, block)):
+                unavailable_rows[indexes] = True
+            continue
+        indexes = np.array(indexes)
+        estimates[indexes] = trend_predict(model[0], areas[indexes], model[1], model[2])
+        for i in indexes:
+            models[i] = source
+
+        # 有户型时附带该位置同户型的平均价格作为参考
+        if (region, block) in with_rooms:
+            averages = _layout_avg_prices(stats, region, block)
+            for i in indexes:
+                average = averages.get(parse_rooms(rows[i].get('rooms')))
+                layout_prices[i] = round(average, 2) if average is not None else None
+
+    # 面积无效或曲线给出非正价格时视为无法估算
+    estimates[~(estimates > 0)] = np.nan
+    with np.errstate(invalid='ignore', divide='ignore'):
+        deviations = (prices - estimates) / estimates
+    assessments = np.where(deviations < -threshold, ASSESSMENT_UNDERPRICED,
+                           np.where(deviations > threshold, ASSESSMENT_OVERPRICED, ASSESSMENT_FAIR))
+    valid_estimates = np.isfinite(estimates)
+    valid_deviations = np.isfinite(deviations)
+
+    results = [{
+        'estimate': round(float(estimates[i]), 2) if valid_estimates[i] else None,
+        'model': models[i] if valid_estimates[i] else None,
+        'layout_avg_price': layout_prices[i],
+        'deviation': round(float(deviations[i]), 4) if valid_deviations[i] else None,
+        'assessment': str(assessments[i]) if valid_deviations[i] else None,
+    } for i in range(count)]
+    summary = {
+        'total': count,
+        'estimated': int(valid_estimates.sum()),
+        'underpriced': int((valid_deviations & (assessments == ASSESSMENT_UNDERPRICED)).sum()),
+        'overpriced': int((valid_deviations & (assessments == ASSESSMENT_OVERPRICED)).sum()),
+        'unavailable': int(unavailable_rows.sum()),
+    }
+    logger.info(f"批量估算租金完成: {count} 个房源, {len(groups)} 个位置, 可估算 {summary['estimated']} 个")
+    return {'results': results, 'summary': summary}
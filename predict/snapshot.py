@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+import numpy as np
+from predict.price_sketch import sketch_buckets
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('snapshot')
+
+# 快照格式版本，格式变化时旧快照会被忽略并重建
+SNAPSHOT_FORMAT_VERSION = 1
+
+# 其他进程检查快照是否更新的间隔（秒）
+RELOAD_CHECK_INTERVAL = 30
+
+# 保留的快照版本数，正在使用旧版本的进程不受清理影响
+KEEP_SNAPSHOTS = 2
+
+# 指向当前快照版本的文件
+CURRENT_FILE = 'CURRENT'
+META_FILE = 'meta.json'
+
+# 快照的列，顺序与 build() 的输入行相同
+SNAPSHOT_FIELDS = ('id', 'region', 'block', 'address', 'rooms', 'price', 'area', 'page_views',
+                   'bedrooms', 'livingrooms')
+# 字典编码的字符串列，数组中保存编码，-1 表示空
+STRING_COLUMNS = ('region', 'block', 'address', 'rooms')
+# 数值列的类型，浮点列用 NaN、整数列用 -1 表示空
+NUMERIC_COLUMNS = {
+    'id': np.int64, 'price': np.float64, 'area': np.float64, 'page_views': np.int64,
+    'bedrooms': np.int16, 'livingrooms': np.int16,
+}
+
+# 户型组合键：卧室数 * LAYOUT_KEY_BASE + 客厅数
+LAYOUT_KEY_BASE = 1000
+
+
+def _location_ranges(region_codes, block_codes, dictionaries):
+    """按区域、板块排好序的编码数组中，每个区域和每个区域/板块对应的 [起始, 结束) 行号"""
+    region_ranges, block_ranges = {}, []
+    if len(region_codes) == 0:
+        return region_ranges, block_ranges
+    # 区域或板块变化的位置即为分段边界
+    change = np.flatnonzero((np.diff(region_codes) != 0) | (np.diff(block_codes) != 0)) + 1
+    starts = np.concatenate(([0], change)).tolist()
+    ends = np.concatenate((change, [len(region_codes)])).tolist()
+    for start, end in zip(starts, ends):
+        region_code, block_code = int(region_codes[start]), int(block_codes[start])
+        if region_code < 0:
+            continue
+        region = dictionaries['region'][region_code]
+        region_ranges.setdefault(region, [start, end])[1] = end
+        if block_code >= 0:
+            block_ranges.append([region, dictionaries['block'][block_code], start, end])
+    return region_ranges, block_ranges
+
+
+class HouseSnapshot:
+    """
+    房源列式快照
+
+    每列保存为一个 .npy 文件，字符串列做字典编码，行按区域、板块排序，
+    同一位置的房源是连续的一段。各进程以内存映射方式打开，统计时只对该段做NumPy运算，
+    多个进程共享同一份页缓存，不访问MySQL。
+
+    本模块不导入 settings，统计计算进程可以直接按目录打开快照；
+    API进程共享的实例 house_snapshot 定义在 predict.price_prediction。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.columns = {}
+        self.dictionaries = {}
+        self.region_ranges = {}
+        self.block_ranges = {}
+        self._current = None
+        self._last_reload_check = 0
+
+    def build(self, rows):
+        """
+        生成新版本的快照并切换为当前版本
+
+        rows: 可迭代的行，字段顺序同 SNAPSHOT_FIELDS
+        """
+        codes = {name: {} for name in STRING_COLUMNS}
+        data = {name: [] for name in SNAPSHOT_FIELDS}
+        for row in rows:
+            for name, value in zip(SNAPSHOT_FIELDS, row):
+                if name in codes:
+                    value = -1 if value is None else codes[name].setdefault(value, len(codes[name]))
+                elif value is None:
+                    value = np.nan if NUMERIC_COLUMNS[name] is np.float64 else -1
+                data[name].append(value)
+        arrays = {name: np.array(values, dtype=np.int32 if name in codes else NUMERIC_COLUMNS[name])
+                  for name, values in data.items()}
+
+        # 按区域、板块排序，同一位置的房源在数组中连续
+        order = np.lexsort((arrays['block'], arrays['region']))
+        arrays = {name: column[order] for name, column in arrays.items()}
+        dictionaries = {name: list(mapping) for name, mapping in codes.items()}
+        region_ranges, block_ranges = _location_ranges(arrays['region'], arrays['block'], dictionaries)
+
+        version = str(int(time.time() * 1000))
+        path = os.path.join(self.directory, version)
+        os.makedirs(path, exist_ok=True)
+        for name, column in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), column)
+        with open(os.path.join(path, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': SNAPSHOT_FORMAT_VERSION,
+                'rows': len(order),
+                'dictionaries': dictionaries,
+                'region_ranges': region_ranges,
+                'block_ranges': block_ranges,
+            }, f, ensure_ascii=False)
+
+        # 原子地切换当前版本
+        tmp_path = os.path.join(self.directory, f"{CURRENT_FILE}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.directory, CURRENT_FILE))
+        logger.info(f"已生成房源列式快照: {len(order)} 个房源, 版本 {version}")
+
+        self._cleanup()
+        return self.load()
+
+    def _cleanup(self):
+        """删除较旧的快照版本（已经映射旧文件的进程在Linux上仍可继续读取）"""
+        versions = sorted((name for name in os.listdir(self.directory) if name.isdigit()), key=int)
+        for version in versions[:-KEEP_SNAPSHOTS]:
+            shutil.rmtree(os.path.join(self.directory, version), ignore_errors=True)
+
+    def _read_current(self):
+        with open(os.path.join(self.directory, CURRENT_FILE)) as f:
+            return f.read().strip()
+
+    def load(self):
+        """内存映射当前版本的快照，不存在或格式不符时返回 False"""
+        try:
+            version = self._read_current()
+            path = os.path.join(self.directory, version)
+            with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != SNAPSHOT_FORMAT_VERSION:
+                logger.info(f"快照版本不符，等待重建: {path}")
+                return False
+            columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+                       for name in SNAPSHOT_FIELDS}
+        except (OSError, ValueError) as e:
+            logger.info(f"没有可用的房源列式快照: {str(e)}")
+            return False
+        with self.lock:
+            self.columns = columns
+            self.dictionaries = meta['dictionaries']
+            self.region_ranges = {region: tuple(r) for region, r in meta['region_ranges'].items()}
+            self.block_ranges = {(region, block): (start, end)
+                                 for region, block, start, end in meta['block_ranges']}
+            self._current = version
+            self.loaded = True
+        logger.info(f"已加载房源列式快照: {meta['rows']} 个房源, 版本 {version}")
+        return True
+
+    def _maybe_reload(self):
+        """其他进程生成了新版本时重新映射"""
+        now = time.time()
+        # 还没有快照时同样节流，避免每个请求都读取 CURRENT
+        if now - self._last_reload_check < RELOAD_CHECK_INTERVAL:
+            return
+        self._last_reload_check = now
+        try:
+            version = self._read_current()
+        except OSError:
+            return
+        if version != self._current:
+            self.load()
+
+    def location(self, region, block=None):
+        """
+        某个区域/板块的列视图（内存映射数组的切片，不复制数据）
+
+        区域、板块按名称精确匹配；快照不可用或没有该位置时返回 None
+        """
+        self._maybe_reload()
+        with self.lock:
+            if not self.loaded or not region:
+                return None
+            rows = self.block_ranges.get((region, block)) if block else self.region_ranges.get(region)
+            if rows is None:
+                return None
+            start, end = rows
+            return {name: column[start:end] for name, column in self.columns.items()}
+
+    def _top_values(self, codes, name, limit=None):
+        """统计字典编码列中各值的出现次数，按次数降序返回 [(值, 次数), ...]"""
+        codes = codes[codes >= 0]
+        values, counts = np.unique(codes, return_counts=True)
+        order = np.argsort(-counts, kind='stable')
+        if limit is not None:
+            order = order[:limit]
+        dictionary = self.dictionaries[name]
+        return [(dictionary[values[i]], int(counts[i])) for i in order]
+
+    @staticmethod
+    def area_price(view):
+        """面积和价格都有效的房源的 (面积数组, 价格数组)"""
+        valid = np.isfinite(view['area']) & np.isfinite(view['price'])
+        return view['area'][valid], view['price'][valid]
+
+    @staticmethod
+    def layout_price_stats(view):
+        """按户型统计价格，返回 {(卧室数, 客厅数): {'count', 'sum', 'min', 'max'}}"""
+        valid = (view['bedrooms'] >= 0) & (view['livingrooms'] >= 0) & np.isfinite(view['price'])
+        if not valid.any():
+            return {}
+        keys = view['bedrooms'][valid].astype(np.int64) * LAYOUT_KEY_BASE + view['livingrooms'][valid]
+        prices = view['price'][valid]
+        # 按户型、价格排序后每个户型是连续的一段，段首为最低价、段尾为最高价
+        order = np.lexsort((prices, keys))
+        keys, prices = keys[order], prices[order]
+        layouts, starts = np.unique(keys, return_index=True)
+        ends = np.append(starts[1:], len(keys))
+        sums = np.add.reduceat(prices, starts)
+        return {
+            (int(key // LAYOUT_KEY_BASE), int(key % LAYOUT_KEY_BASE)): {
+                'count': int(end - start), 'sum': float(total),
+                'min': float(prices[start]), 'max': float(prices[end - 1]),
+            }
+            for key, start, end, total in zip(layouts, starts, ends, sums)
+        }
+
+    @staticmethod
+    def layout_price_sketches(view):
+        """按户型生成价格分布草图，返回 {(卧室数, 客厅数): {桶号: 房源数}}"""
+        valid = (view['bedrooms'] >= 0) & (view['livingrooms'] >= 0) & (view['price'] > 0)
+        if not valid.any():
+            return {}
+        keys = view['bedrooms'][valid].astype(np.int64) * LAYOUT_KEY_BASE + view['livingrooms'][valid]
+        pairs, counts = np.unique(np.stack((keys, sketch_buckets(view['price'][valid])), axis=1),
+                                  axis=0, return_counts=True)
+        sketches = {}
+        for (key, bucket), count in zip(pairs.tolist(), counts.tolist()):
+            layout = (key // LAYOUT_KEY_BASE, key % LAYOUT_KEY_BASE)
+            sketches.setdefault(layout, {})[bucket] = count
+        return sketches
+
+    def analytics(self, view, community_limit=20):
+        """
+        由列视图得到与物化统计数据相同结构的结果（trend 由调用方按需计算）
+
+        返回 {'layouts': {户型: 房源数}, 'communities': [(小区, 房源数), ...],
+              'prices': {(卧室数, 客厅数): {'count', 'sum', 'min', 'max'}},
+              'sketches': {(卧室数, 客厅数): 价格分布草图}}
+        """
+        return {
+            'layouts': dict(self._top_values(view['rooms'], 'rooms')),
+            'communities': self._top_values(view['address'], 'address', community_limit),
+            'prices': self.layout_price_stats(view),
+            'sketches': self.layout_price_sketches(view),
+        }
+
@@ -0,0 +1,126 @@
+import numpy as np
+from sqlalchemy import func
+
+# 面积缩放系数：平方米数除以100后再求幂和，避免四次方和过大导致方程病态
+AREA_SCALE = 100.0
+
+# 二次多项式最小二乘的充分统计量：样本数，x的1~4次幂和，y、x·y、x²·y的和
+TREND_SUM_FIELDS = ('n', 'sx', 'sx2', 'sx3', 'sx4', 'sy', 'sxy', 'sx2y')
+# 预测曲线的面积范围（平方米）
+TREND_RANGE_FIELDS = ('min_x', 'max_x')
+
+# 样本少于该数量时不做预测
+MIN_TREND_POINTS = 5
+# 预测曲线上的点数
+TREND_CURVE_POINTS = 50
+
+
+def trend_terms(area, price):
+    """单个房源（面积、价格）对各个幂和的贡献"""
+    x = area / AREA_SCALE
+    return {
+        'n': 1, 'sx': x, 'sx2': x ** 2, 'sx3': x ** 3, 'sx4': x ** 4,
+        'sy': price, 'sxy': x * price, 'sx2y': x ** 2 * price,
+    }
+
+
+def trend_stats_columns(area_column, price_column):
+    """在数据库中直接求充分统计量的聚合表达式，顺序同 TREND_SUM_FIELDS + TREND_RANGE_FIELDS"""
+    x = area_column / AREA_SCALE
+    return [
+        func.count(area_column), func.sum(x), func.sum(x * x), func.sum(x * x * x), func.sum(x * x * x * x),
+        func.sum(price_column), func.sum(x * price_column), func.sum(x * x * price_column),
+        func.min(area_column), func.max(area_column),
+    ]
+
+
+def trend_stats_from_row(row):
+    """把 trend_stats_columns 的查询结果转换为充分统计量字典，没有样本时返回None"""
+    if not row or not row[0]:
+        return None
+    return {name: float(value) for name, value in zip(TREND_SUM_FIELDS + TREND_RANGE_FIELDS, row)}
+
+
+def trend_stats_from_arrays(areas, prices):
+    """由面积、价格数组直接求充分统计量，没有样本时返回None"""
+    if len(areas) == 0:
+        return None
+    x = areas / AREA_SCALE
+    return {
+        'n': float(len(x)), 'sx': float(x.sum()), 'sx2': float((x ** 2).sum()),
+        'sx3': float((x ** 3).sum()), 'sx4': float((x ** 4).sum()),
+        'sy': float(prices.sum()), 'sxy': float((x * prices).sum()), 'sx2y': float((x ** 2 * prices).sum()),
+        'min_x': float(areas.min()), 'max_x': float(areas.max()),
+    }
+
+
+def merge_trend_stats(stats, other):
+    """合并两组充分统计量（例如把板块汇总为区域）"""
+    if stats is None:
+        return dict(other) if other else None
+    if not other:
+        return stats
+    merged = {name: stats[name] + other[name] for name in TREND_SUM_FIELDS}
+    merged['min_x'] = min(stats['min_x'], other['min_x'])
+    merged['max_x'] = max(stats['max_x'], other['max_x'])
+    return merged
+
+
+def fit_trend(stats):
+    """
+    由充分统计量解正规方程，得到价格关于缩放后面积的二次多项式系数 [c0, c1, c2]
+
+    与 PolynomialFeatures(degree=2) + LinearRegression 的最小二乘解相同，
+    耗时与样本数量无关。样本不足时返回None。
+    """
+    if not stats or stats['n'] < MIN_TREND_POINTS:
+        return None
+    s = stats
+    a = np.array([
+        [s['n'], s['sx'], s['sx2']],
+        [s['sx'], s['sx2'], s['sx3']],
+        [s['sx2'], s['sx3'], s['sx4']],
+    ])
+    b = np.array([s['sy'], s['sxy'], s['sx2y']])
+    # 面积全部相同时矩阵奇异，lstsq 返回最小范数解
+    return np.linalg.lstsq(a, b, rcond=None)[0]
+
+
+def fit_trend_model(areas, prices):
+    """
+    由一个位置的面积、价格数组拟合走势模型（离线训练时在各进程中并行调用）
+
+    返回 {'coef': 系数数组, 'min_x', 'max_x', 'n'}，样本不足时返回None
+    """
+    stats = trend_stats_from_arrays(areas, prices)
+    coef = fit_trend(stats)
+    if coef is None:
+        return None
+    return {'coef': coef, 'min_x': stats['min_x'], 'max_x': stats['max_x'], 'n': stats['n']}
+
+
+def trend_curve(coef, min_x, max_x, points=TREND_CURVE_POINTS):
+    """在面积范围内均匀取点，计算二次多项式的预测曲线"""
+    xs = np.linspace(min_x, max_x, points)
+    return {'x': xs.tolist(), 'y': trend_predict(coef, xs).tolist()}
+
+
+def trend_predict(coef, areas, min_x=None, max_x=None):
+    """
+    批量计算面积数组对应的预测价格
+
+    给出训练样本的面积范围时先把面积截断到该范围内，避免二次曲线在范围外外推失真
+    """
+    areas = np.asarray(areas, dtype=np.float64)
+    if min_x is not None and max_x is not None:
+        areas = np.clip(areas, min_x, max_x)
+    scaled = areas / AREA_SCALE
+    return coef[0] + coef[1] * scaled + coef[2] * scaled ** 2
+
+
+def solve_trend(stats, points=TREND_CURVE_POINTS):
+    """由充分统计量解出二次多项式并生成预测曲线，样本不足时返回空曲线"""
+    coef = fit_trend(stats)
+    if coef is None:
+        return {'x': [], 'y': []}
+    return trend_curve(coef, stats['min_x'], stats['max_x'], points)
@@ -1,10 +1,18 @@
 from flask import Blueprint, request, jsonify, render_template, session, redirect, url_for
-from models import House, User, Recommend
+from models import House, User, Recommend, ROLLUP_MONTH
 from settings import db, BASE_URL
 import random
-from sqlalchemy import func, desc, or_
-from predict.price_prediction import predict_price_trend, get_room_type_distribution, get_top_communities, get_price_by_room_type
+from functools import partial
+from sqlalchemy import func, or_
+from predict.price_prediction import predict_price_trend, get_room_type_distribution, get_top_communities, get_price_by_room_type, get_room_type_price_stats, get_price_distribution, get_price_forecast, get_location_analytics, get_location_points, filter_by_location
+from predict.downsample import grid_downsample, clamp_max_points
+from predict.price_rollup import ROLLUP_GRANULARITY_NAMES, DEFAULT_FORECAST_PERIODS, MAX_FORECAST_PERIODS
+from predict.rent_estimation import estimate_rents, MAX_ESTIMATE_ROWS
 from utils import redis_utils, async_tasks
+from utils.locations import parse_location
+from utils.pagination import paginate_by_id, encode_cursor, decode_cursor, MAX_OFFSET_PAGES
+from utils.search_index import house_search_index, house_suggest_index, paginate_ids
+from utils.house_fields import parse_price, parse_rooms, parse_rooms_query, canonicalize_keyword
 import logging
 
 # 配置日志
@@ -14,6 +22,109 @@ logger = logging.getLogger('house_api')
 # 创建蓝图
 house_api = Blueprint('house_api', __name__)
 
+def layout_conditions(rooms_query):
+    """把 parse_rooms_query 的结果转换为卧室数/客厅数列上的筛选条件"""
+    conditions = []
+    if rooms_query['bedrooms'] is not None:
+        if rooms_query['at_least']:
+            conditions.append(House.bedrooms >= rooms_query['bedrooms'])
+        else:
+            conditions.append(House.bedrooms == rooms_query['bedrooms'])
+    if rooms_query['livingrooms'] is not None:
+        if rooms_query['at_least'] and rooms_query['bedrooms'] is None:
+            conditions.append(House.livingrooms >= rooms_query['livingrooms'])
+        else:
+            conditions.append(House.livingrooms == rooms_query['livingrooms'])
+    return conditions
+
+def count_houses(query, params):
+    """获取查询结果总数，优先使用Redis中缓存的近似值"""
+    total = redis_utils.get_query_count(params)
+    if total is None:
+        total = query.count()
+        redis_utils.cache_query_count(params, total)
+    return total
+
+def paginate_houses(query, page, cursor, per_page, count_params, total_houses=None):
+    """
+    房源列表分页：带游标时按ID键集分页，不统计总数；
+    否则按页码分页（最多 MAX_OFFSET_PAGES 页），总数来自缓存
+
+    返回 (当前页房源, 当前页码, 总页数, 下一页游标, 上一页游标)，游标翻页时页码和总页数为0
+    """
+    if cursor:
+        houses, next_cursor, prev_cursor = paginate_by_id(query, House.id, cursor, per_page)
+        return houses, 0, 0, next_cursor, prev_cursor
+    
+    if total_houses is None:
+        total_houses = count_houses(query, count_params)
+    total_pages = min((total_houses + per_page - 1) // per_page, MAX_OFFSET_PAGES)  # 计算总页数
+    page = max(1, min(page, total_pages or 1))
+    
+    houses = query.order_by(House.id).offset((page - 1) * per_page).limit(per_page).all()
+    # 页码翻页的同时给出游标，可以继续翻到 MAX_OFFSET_PAGES 之后的页
+    next_cursor = encode_cursor('next', houses[-1].id) if len(houses) == per_page else None
+    return houses, page, total_pages, next_cursor, None
+
+def hydrate_houses(house_ids):
+    """按给定ID顺序查询房源"""
+    if not house_ids:
+        return []
+    houses = {house.id: house for house in House.query.filter(House.id.in_(house_ids)).all()}
+    return [houses[house_id] for house_id in house_ids if house_id in houses]
+
+def paginate_matched_houses(fetch_page, total, page, cursor, per_page):
+    """
+    对已经算好的匹配房源ID分页，只查询当前页的房源
+
+    fetch_page: 按 search_index.paginate_ids 的参数取一页ID的函数，返回 (当前页ID列表, 是否还有更多)
+    total: 匹配的房源总数
+    返回值与 paginate_houses 相同
+    """
+    decoded = decode_cursor(cursor) if cursor else None
+    if decoded:
+        direction, cursor_id = decoded
+        if direction == 'prev':
+            page_ids, has_more = fetch_page(page, per_page, before_id=cursor_id) or ([], False)
+        else:
+            page_ids, has_more = fetch_page(page, per_page, after_id=cursor_id) or ([], False)
+        next_cursor = encode_cursor('next', page_ids[-1]) if page_ids and (has_more or direction == 'prev') else None
+        prev_cursor = encode_cursor('prev', page_ids[0]) if page_ids and (has_more or direction == 'next') else None
+        return hydrate_houses(page_ids), 0, 0, next_cursor, prev_cursor
+    
+    total_pages = min((total + per_page - 1) // per_page, MAX_OFFSET_PAGES)  # 计算总页数
+    page = max(1, min(page, total_pages or 1))
+    page_ids, has_more = fetch_page(page, per_page) or ([], False)
+    next_cursor = encode_cursor('next', page_ids[-1]) if has_more else None
+    return hydrate_houses(page_ids), page, total_pages, next_cursor, None
+
+def find_matched_house_ids(keyword, search_type):
+    """返回匹配搜索关键词的房源ID集合，keyword 为规范化后的关键词"""
+    if search_type == 'rooms':
+        # 户型搜索 - 解析为卧室数/客厅数后按整数列筛选（中文数字已在解析时转换）
+        rooms_query = parse_rooms_query(keyword)
+        if rooms_query is not None:
+            conditions = layout_conditions(rooms_query)
+        else:
+            # 无法解析的户型关键词退回模糊匹配
+            conditions = [House.rooms.like(f'%{keyword}%')]
+    else:
+        # 地区搜索：使用进程内倒排索引
+        matched_ids = house_search_index.search(keyword)
+        if matched_ids is not None:
+            return matched_ids
+        
+        # 索引尚未建立时退回模糊匹配
+        logger.info("房源搜索索引不可用，使用数据库模糊匹配")
+        conditions = [or_(
+            House.title.like(f'%{keyword}%'),
+            House.region.like(f'%{keyword}%'),
+            House.block.like(f'%{keyword}%'),
+            House.address.like(f'%{keyword}%'),
+            House.traffic.like(f'%{keyword}%')
+        )]
+    return {row[0] for row in db.session.query(House.id).filter(*conditions)}
+
 # 首页路由
 @house_api.route('/')
 def index():
@@ -45,15 +156,16 @@ def index():
         logger.info("Redis缓存命中: 热点房源")
     
     # 尝试从Redis获取高浏览量房源
-    hot_houses = redis_utils.get_high_view_houses()
+    hot_houses = redis_utils.get_high_view_houses(
+        load_houses=lambda house_ids: House.query.filter(House.id.in_(house_ids)).all())
     
     if hot_houses is None:
         # Redis中没有数据，从数据库获取
         logger.info("Redis缓存未命中: 高浏览量房源")
         hot_houses_db = House.query.order_by(db.func.random()).limit(4).all()
         
-        # 缓存到Redis
-        redis_utils.cache_high_view_houses(hot_houses_db)
+        # 异步建立浏览量排行榜
+        async_tasks.async_update_high_view_houses()
         
         # 转换为字典列表
         hot_houses = []
@@ -66,13 +178,21 @@ def index():
                 'rooms': house.rooms,
                 'region': house.region,
                 'block': house.block,
-                'address': house.address
+                'address': house.address,
+                'page_views': house.page_views
             })
     else:
         logger.info("Redis缓存命中: 高浏览量房源")
     
     # 获取房源总数
-    house_count = House.query.count()
+    house_count = redis_utils.get_house_count()
+    
+    if house_count is None:
+        logger.info("Redis缓存未命中: 房源数量")
+        house_count = House.query.count()
+        async_tasks.async_update_house_counts()
+    else:
+        logger.info("Redis缓存命中: 房源数量")
     
     return render_template('index.html', 
                           recommended_houses=recommended_houses, 
@@ -82,16 +202,24 @@ def index():
 # 房源详情页
 @house_api.route('/house/<int:house_id>')
 def house_detail(house_id):
-    # 从数据库获取房源详情
-    house = House.query.get_or_404(house_id)
-    
-    # 更新浏览量（先更新MySQL）
-    house.page_views += 1
-    db.session.commit()
+    # 先从Redis读取房源详情，未命中时再查询MySQL
+    house = redis_utils.get_house_detail(house_id)
+    
+    if house is None:
+        logger.info(f"Redis缓存未命中: 房源详情 {house_id}")
+        # 读库之前取版本号，读库期间房源被修改时写入的缓存会自动失效
+        version = redis_utils.get_house_detail_version(house_id)
+        house_db = House.query.get_or_404(house_id)
+        house = redis_utils.house_detail_dict(house_db)
+        
+        if version is not None:
+            redis_utils.cache_house_detail(house_db, version)
+            logger.info(f"更新Redis缓存: 房源详情 {house_id}")
+    else:
+        logger.info(f"Redis缓存命中: 房源详情 {house_id}")
     
-    # 更新Redis缓存
-    redis_utils.cache_house_detail(house)
-    logger.info(f"更新Redis缓存: 房源详情 {house_id}")
+    # 记录浏览量（写后缓冲，由后台任务批量落库）
+    async_tasks.record_house_page_view(house_id)
     
     # 记录用户浏览历史
     if 'user_id' in session:
@@ -105,12 +233,19 @@ def house_detail(house_id):
         async_tasks.async_update_user_recommend(user_id, house_id)
         logger.info(f"异步更新: 用户 {user_id} 推荐数据 {house_id}")
     
-    # 获取相似推荐房源
-    similar_houses = House.query.filter(
-        House.id != house_id,
-        House.region == house.region,
-        House.block == house.block
-    ).order_by(func.rand()).limit(4).all()
+    # 获取相似推荐房源：从同板块ID池随机抽样，只查询抽中的房源
+    similar_ids = redis_utils.get_similar_house_ids(house['region'], house['block'], house_id)
+    
+    if similar_ids is None:
+        logger.info(f"Redis缓存未命中: 相似房源ID池 {house['region']}-{house['block']}")
+        similar_houses = House.query.filter(
+            House.id != house_id,
+            House.region == house['region'],
+            House.block == house['block']
+        ).order_by(func.rand()).limit(4).all()
+    else:
+        logger.info(f"Redis缓存命中: 相似房源ID池 {house['region']}-{house['block']}")
+        similar_houses = House.query.filter(House.id.in_(similar_ids)).all() if similar_ids else []
     
     return render_template('detail_page.html', house=house, similar_houses=similar_houses)
 
@@ -125,6 +260,7 @@ def house_list():
     price_min = request.args.get('price_min', '')
     price_max = request.args.get('price_max', '')
     rooms = request.args.get('rooms', '')
+    cursor = request.args.get('cursor', '')
     
     # 构建查询
     query = House.query
@@ -132,20 +268,32 @@ def house_list():
     if region:
         query = query.filter(House.region == region)
     
-    if price_min and price_max:
-        query = query.filter(House.price >= price_min, House.price <= price_max)
+    # 价格按数值列做范围筛选（可以使用索引），只填一端时也生效
+    price_min_num = parse_price(price_min)
+    price_max_num = parse_price(price_max)
+    if price_min_num is not None:
+        query = query.filter(House.price_num >= price_min_num)
+    if price_max_num is not None:
+        query = query.filter(House.price_num <= price_max_num)
     
     if rooms:
-        query = query.filter(House.rooms == rooms)
+        rooms_query = parse_rooms_query(rooms)
+        if rooms_query is not None:
+            query = query.filter(*layout_conditions(rooms_query))
+        else:
+            query = query.filter(House.rooms == rooms)
     
-    # 获取房源总数
-    total_houses = query.count()
-    total_pages = (total_houses + per_page - 1) // per_page  # 计算总页数
+    # 获取房源总数：没有价格/户型条件时直接使用维护好的房源数量，否则使用缓存的总数
+    total_houses = None
+    if not cursor and price_min_num is None and price_max_num is None and not rooms:
+        total_houses = redis_utils.get_house_count(region or None)
     
-    # 获取当前页的房源
-    houses = query.order_by(House.id).offset((page - 1) * per_page).limit(per_page).all()
+    houses, page, total_pages, next_cursor, prev_cursor = paginate_houses(
+        query, page, cursor, per_page, ('list', region, price_min, price_max, rooms), total_houses)
     
-    return render_template('list.html', houses=houses, current_page=page, total_pages=total_pages)
+    return render_template('list.html', houses=houses, current_page=page, total_pages=total_pages,
+                           next_cursor=next_cursor, prev_cursor=prev_cursor,
+                           filters={'region': region, 'price_min': price_min, 'price_max': price_max, 'rooms': rooms})
 
 # 搜索结果页
 @house_api.route('/search')
@@ -153,70 +301,36 @@ def search_houses():
     keyword = request.args.get('keyword', '')
     search_type = request.args.get('search_type', 'region')
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', '')
     per_page = 10  # 每页显示的房源数量
     
     # 如果没有关键词，显示空结果页面
     if not keyword:
-        return render_template('search_list.html', houses=[], keyword='', current_page=1, total_pages=0)
-    
-    # 根据搜索类型和关键词搜索房源
-    if search_type == 'rooms':
-        # 户型搜索 - 处理中文数字和阿拉伯数字
-        search_keywords = [keyword]
-        
-        # 中文数字到阿拉伯数字的映射
-        cn_to_arabic = {
-            '一': '1', '二': '2', '三': '3', '四': '4', '五': '5',
-            '六': '6', '七': '7', '八': '8', '九': '9', '十': '10'
-        }
-        
-        # 阿拉伯数字到中文数字的映射
-        arabic_to_cn = {v: k for k, v in cn_to_arabic.items()}
-        
-        # 转换关键词中的数字（如果有）
-        converted_keyword = keyword
-        for cn, ar in cn_to_arabic.items():
-            converted_keyword = converted_keyword.replace(cn, ar)
-        
-        # 如果转换后的关键词不同于原关键词，添加到搜索关键词列表
-        if converted_keyword != keyword:
-            search_keywords.append(converted_keyword)
-        
-        # 转换阿拉伯数字到中文数字
-        converted_keyword = keyword
-        for ar, cn in arabic_to_cn.items():
-            converted_keyword = converted_keyword.replace(ar, cn)
-        
-        # 如果转换后的关键词不同于原关键词，添加到搜索关键词列表
-        if converted_keyword != keyword and converted_keyword not in search_keywords:
-            search_keywords.append(converted_keyword)
-        
-        # 构建查询条件
-        conditions = []
-        for kw in search_keywords:
-            conditions.append(House.rooms.like(f'%{kw}%'))
-        
-        query = House.query.filter(or_(*conditions))
+        return render_template('search_list.html', houses=[], keyword='', search_type=search_type,
+                               current_page=1, total_pages=0, next_cursor=None, prev_cursor=None)
+    
+    # 规范化关键词后查找缓存的搜索结果，同义的写法共用一份缓存
+    result_type = 'rooms' if search_type == 'rooms' else 'region'
+    canonical_keyword = canonicalize_keyword(keyword, result_type)
+    total = redis_utils.get_search_result_count(result_type, canonical_keyword)
+    
+    if total is not None:
+        logger.info("Redis缓存命中: 搜索结果")
+        # 直接在Redis中按ID分页，每页只取出10个ID
+        fetch_page = partial(redis_utils.get_search_result_ids, result_type, canonical_keyword)
     else:
-        # 地区搜索
-        query = House.query.filter(
-            or_(
-                House.title.like(f'%{keyword}%'),
-                House.region.like(f'%{keyword}%'),
-                House.block.like(f'%{keyword}%'),
-                House.address.like(f'%{keyword}%'),
-                House.traffic.like(f'%{keyword}%')
-            )
-        )
-    
-    # 获取搜索结果总数
-    total_houses = query.count()
-    total_pages = (total_houses + per_page - 1) // per_page  # 计算总页数
-    
-    # 获取当前页的搜索结果
-    houses = query.order_by(House.id).offset((page - 1) * per_page).limit(per_page).all()
-    
-    return render_template('search_list.html', houses=houses, keyword=keyword, current_page=page, total_pages=total_pages)
+        logger.info("Redis缓存未命中: 搜索结果")
+        matched_ids = find_matched_house_ids(canonical_keyword, result_type)
+        redis_utils.cache_search_result(result_type, canonical_keyword, sorted(matched_ids))
+        fetch_page, total = partial(paginate_ids, matched_ids), len(matched_ids)
+    
+    # 只查询当前页的房源
+    houses, page, total_pages, next_cursor, prev_cursor = paginate_matched_houses(
+        fetch_page, total, page, cursor, per_page)
+    
+    return render_template('search_list.html', houses=houses, keyword=keyword, search_type=search_type,
+                           current_page=page, total_pages=total_pages,
+                           next_cursor=next_cursor, prev_cursor=prev_cursor)
 
 # 搜索关键词提示API
 @house_api.route('/search/keyword/')
@@ -226,7 +340,13 @@ def search_keyword():
     if not keyword:
         return jsonify([])
     
-    # 根据关键词查找相关的地区、小区或房源标题
+    # 优先使用进程内的前缀索引，不访问MySQL
+    results = house_suggest_index.suggest(keyword)
+    if results is not None:
+        return jsonify(results)
+    
+    # 索引尚未建立时，根据关键词查找相关的地区、小区或房源标题
+    logger.info("关键词提示索引不可用，使用数据库模糊匹配")
     results = []
     
     # 查找匹配的地区
@@ -348,22 +468,31 @@ def check_collection(house_id):
 # 价格走势预测API
 @house_api.route('/api/price_trend/<string:location>')
 def price_trend_api(location):
-    parts = location.split('-')
-    region = parts[0] if len(parts) > 0 else ''
-    block = parts[1] if len(parts) > 1 else None
+    region, block = parse_location(location)
+    
+    max_points = clamp_max_points(request.args.get('max_points', type=int))
     
     logger.info(f"调用价格走势预测: {region}-{block if block else ''}")
     # 调用预测模型
-    trend_data = predict_price_trend(region, block)
+    trend_data = predict_price_trend(region, block, max_points)
     
     return jsonify(trend_data)
 
+# 区域统计数据API：详情页四个图表的数据一次返回
+@house_api.route('/api/location_analytics/<string:location>')
+def location_analytics_api(location):
+    region, block = parse_location(location)
+    max_points = clamp_max_points(request.args.get('max_points', type=int))
+    
+    logger.info(f"调用区域统计数据: {region}-{block if block else ''}")
+    analytics_data = get_location_analytics(region, block, max_points)
+    
+    return jsonify(analytics_data)
+
 # 户型占比API
 @house_api.route('/api/room_distribution/<string:location>')
 def room_distribution_api(location):
-    parts = location.split('-')
-    region = parts[0] if len(parts) > 0 else ''
-    block = parts[1] if len(parts) > 1 else None
+    region, block = parse_location(location)
     
     logger.info(f"调用户型分布统计: {region}-{block if block else ''}")
     # 获取户型分布数据
@@ -374,9 +503,7 @@ def room_distribution_api(location):
 # 小区房源数量TOP20 API
 @house_api.route('/api/community_ranking/<string:location>')
 def community_ranking_api(location):
-    parts = location.split('-')
-    region = parts[0] if len(parts) > 0 else ''
-    block = parts[1] if len(parts) > 1 else None
+    region, block = parse_location(location)
     
     logger.info(f"调用小区排名统计: {region}-{block if block else ''}")
     # 获取小区排名数据
@@ -387,9 +514,7 @@ def community_ranking_api(location):
 # 户型价格走势API
 @house_api.route('/api/room_price/<string:location>')
 def room_price_api(location):
-    parts = location.split('-')
-    region = parts[0] if len(parts) > 0 else ''
-    block = parts[1] if len(parts) > 1 else None
+    region, block = parse_location(location)
     
     logger.info(f"调用户型价格分析: {region}-{block if block else ''}")
     # 获取户型价格数据
@@ -397,114 +522,117 @@ def room_price_api(location):
     
     return jsonify(price_data)
 
+# 单价走势预测API：按发布时间分月/分周汇总后预测之后若干个时间段
+@house_api.route('/api/price_forecast/<string:location>')
+def price_forecast_api(location):
+    region, block = parse_location(location)
+    granularity = ROLLUP_GRANULARITY_NAMES.get(request.args.get('granularity', 'month'), ROLLUP_MONTH)
+    periods = min(max(request.args.get('periods', DEFAULT_FORECAST_PERIODS, type=int), 1), MAX_FORECAST_PERIODS)
+    
+    logger.info(f"调用单价走势预测: {region}-{block if block else ''}")
+    forecast_data = get_price_forecast(region, block, granularity, periods)
+    
+    return jsonify(forecast_data)
+
+def valid_estimate_row(row):
+    """估算请求中的一行：区域、板块为字符串或空，面积、户型、价格为字符串、数值或空"""
+    if not isinstance(row, dict):
+        return False
+    if not all(row.get(name) is None or isinstance(row.get(name), str) for name in ('region', 'block')):
+        return False
+    return all(row.get(name) is None or isinstance(row.get(name), (str, int, float))
+               and not isinstance(row.get(name), bool) for name in ('area', 'rooms', 'price'))
+
+# 批量租金估算API：请求体为 {"rows": [{"region", "block", "area", "rooms", "price"}, ...]}
+@house_api.route('/api/estimate_rent', methods=['POST'])
+def estimate_rent_api():
+    data = request.get_json(silent=True) or {}
+    rows = data.get('rows')
+    if not isinstance(rows, list) or not all(valid_estimate_row(row) for row in rows):
+        return jsonify({'status': 'error', 'message': '参数错误'})
+    if len(rows) > MAX_ESTIMATE_ROWS:
+        return jsonify({'status': 'error', 'message': f'一次最多估算 {MAX_ESTIMATE_ROWS} 个房源'})
+    
+    logger.info(f"调用批量租金估算: {len(rows)} 个房源")
+    result = estimate_rents(rows)
+    
+    return jsonify({'status': 'success', **result})
+
+# 价格分布API：整体和各户型的p10、中位数、p90和直方图
+@house_api.route('/api/price_distribution/<string:location>')
+def price_distribution_api(location):
+    region, block = parse_location(location)
+    
+    logger.info(f"调用价格分布统计: {region}-{block if block else ''}")
+    distribution_data = get_price_distribution(region, block)
+    
+    return jsonify(distribution_data)
+
 # 数据可视化API - 散点图数据
 @house_api.route('/get/scatterdata/<string:location>')
 def get_scatter_data(location):
-    parts = location.split('-')
-    region = parts[0] if len(parts) > 0 else ''
-    block = parts[1] if len(parts) > 1 else ''
+    region, block = parse_location(location)
     
-    query = House.query
+    query = filter_by_location(House.query, region, block, exact=True)
     
-    if region:
-        query = query.filter(House.region == region)
-    if block:
-        query = query.filter(House.block == block)
-    
-    houses = query.all()
-    
-    data = []
-    for house in houses:
-        # 提取面积数字部分
-        area_str = house.area.replace('平方米', '').strip()
-        try:
-            area = float(area_str)
-            price = int(house.price)
-            data.append([area, price])
-        except (ValueError, TypeError):
-            continue
+    # 优先从内存映射的列式快照读取面积和价格，否则按列查询，不构造ORM对象
+    areas, prices = get_location_points(query, region, block)
+    
+    # 点数超过 max_points 时按网格分箱聚合，每个点附带代表的房源数
+    max_points = clamp_max_points(request.args.get('max_points', type=int))
+    if len(areas) > max_points:
+        areas, prices, counts = grid_downsample(areas, prices, max_points)
+        data = [[area, price, count] for area, price, count in
+                zip(areas.tolist(), prices.astype(int).tolist(), counts.tolist())]
+    else:
+        data = [[area, price] for area, price in zip(areas.tolist(), prices.astype(int).tolist())]
     
     return jsonify({'data': data})
 
 # 数据可视化API - 饼图数据
 @house_api.route('/get/piedata/<string:location>')
 def get_pie_data(location):
-    parts = location.split('-')
-    region = parts[0] if len(parts) > 0 else ''
-    block = parts[1] if len(parts) > 1 else ''
+    region, block = parse_location(location)
     
-    query = House.query
-    
-    if region:
-        query = query.filter(House.region == region)
-    if block:
-        query = query.filter(House.block == block)
-    
-    houses = query.all()
-    
-    # 统计户型分布
-    room_counts = {}
-    for house in houses:
-        room_type = house.rooms
-        if room_type in room_counts:
-            room_counts[room_type] += 1
-        else:
-            room_counts[room_type] = 1
+    # 户型分布优先读取物化的统计数据
+    distribution = get_room_type_distribution(region, block, exact=True)
     
     # 转换为饼图数据格式
-    data = [{'value': count, 'name': room_type} for room_type, count in room_counts.items()]
+    data = [{'value': item['value'], 'name': item['name']} for item in distribution]
     
     return jsonify({'data': data})
 
 # 数据可视化API - 柱状图数据
 @house_api.route('/get/columndata/<string:location>')
 def get_column_data(location):
-    parts = location.split('-')
-    region = parts[0] if len(parts) > 0 else ''
-    block = parts[1] if len(parts) > 1 else ''
-    
-    # 获取该区域/商圈中房源数量最多的前20个小区
-    query = db.session.query(House.address, func.count(House.id).label('count'))
-    
-    if region:
-        query = query.filter(House.region == region)
-    if block:
-        query = query.filter(House.block == block)
+    region, block = parse_location(location)
     
-    results = query.group_by(House.address).order_by(desc('count')).limit(20).all()
-    
-    data = {
-        'addresses': [result[0] for result in results],
-        'counts': [result[1] for result in results]
-    }
+    # 获取该区域/商圈中房源数量最多的前20个小区，优先读取物化的统计数据
+    data = get_top_communities(region, block, limit=20, exact=True)
     
     return jsonify({'data': data})
 
 # 数据可视化API - 折线图数据
 @house_api.route('/get/brokenlinedata/<string:location>')
 def get_broken_line_data(location):
-    parts = location.split('-')
-    region = parts[0] if len(parts) > 0 else ''
-    block = parts[1] if len(parts) > 1 else ''
-    
-    query = House.query
-    
-    if region:
-        query = query.filter(House.region == region)
-    if block:
-        query = query.filter(House.block == block)
-    
-    # 获取不同户型的平均价格
+    region, block = parse_location(location)
+    
+    # 各户型的价格统计（物化数据或一条分组查询），再按固定的户型顺序输出
+    try:
+        stats = {(item['bedrooms'], item['livingrooms']): item
+                 for item in get_room_type_price_stats(region, block, exact=True)}
+    except Exception as e:
+        logger.error(f"获取户型价格统计失败: {str(e)}")
+        return jsonify({'status': 'error', 'message': '获取户型价格统计失败'})
     room_types = ['1室0厅', '1室1厅', '2室1厅', '2室2厅', '3室1厅', '3室2厅', '4室1厅', '4室2厅']
-    avg_prices = []
-    
-    for room_type in room_types:
-        avg_price = query.filter(House.rooms == room_type).with_entities(func.avg(func.cast(House.price, db.Float))).scalar()
-        avg_prices.append(round(avg_price, 2) if avg_price else 0)
+    items = [stats.get(parse_rooms(room_type)) for room_type in room_types]
     
     data = {
         'room_types': room_types,
-        'avg_prices': avg_prices
+        'avg_prices': [item['avg_price'] if item else 0 for item in items],
+        'min_prices': [item['min_price'] if item else 0 for item in items],
+        'max_prices': [item['max_price'] if item else 0 for item in items],
+        'counts': [item['count'] if item else 0 for item in items]
     }
     
     return jsonify({'data': data}) 
\ No newline at end of file
@@ -1,6 +1,8 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 import os
+import time
+import threading
 from dotenv import load_dotenv
 import redis
 from redis.sentinel import Sentinel
@@ -41,32 +43,132 @@ REDIS_SENTINELS = [
 REDIS_MASTER_NAME = os.getenv('REDIS_MASTER_NAME', 'mymaster')
 REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', 'redis123')
 
+# Redis连接池配置
+# 通过哨兵解析主从节点（应用与Redis在同一网络、能访问哨兵通告的地址时开启），否则直连本地映射端口
+REDIS_USE_SENTINEL = os.getenv('REDIS_USE_SENTINEL', 'false').lower() in ('1', 'true', 'yes')
+REDIS_MASTER_HOST = os.getenv('REDIS_MASTER_HOST', 'localhost')
+REDIS_MASTER_PORT = int(os.getenv('REDIS_MASTER_PORT', 6380))
+REDIS_SLAVE_HOST = os.getenv('REDIS_SLAVE_HOST', 'localhost')
+REDIS_SLAVE_PORT = int(os.getenv('REDIS_SLAVE_PORT', 6381))
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', 50))                   # 每个连接池的最大连接数
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', 10))                   # 读写超时（秒）
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv('REDIS_SOCKET_CONNECT_TIMEOUT', 2))    # 建立连接超时（秒）
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30))       # 连接空闲超过该秒数后使用前先检查
+
+# 浏览量写后缓冲配置
+PAGE_VIEWS_FLUSH_INTERVAL = int(os.getenv('PAGE_VIEWS_FLUSH_INTERVAL', 10))        # 增量落库间隔（秒）
+PAGE_VIEWS_FLUSH_BATCH_SIZE = int(os.getenv('PAGE_VIEWS_FLUSH_BATCH_SIZE', 500))   # 每条UPDATE语句最多更新的房源数
+
+# 房源搜索索引和关键词提示索引文件路径
+SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH', os.path.join(app.instance_path, 'search_index.pkl'))
+SUGGEST_INDEX_PATH = os.getenv('SUGGEST_INDEX_PATH', os.path.join(app.instance_path, 'suggest_index.pkl'))
+SEARCH_INDEX_SAVE_INTERVAL = int(os.getenv('SEARCH_INDEX_SAVE_INTERVAL', 300))     # 增量变更保存到磁盘的间隔（秒）
+
+# 统计计算进程池：进程数、最多排队的任务数、单次计算的超时时间（秒）
+COMPUTE_POOL_WORKERS = int(os.getenv('COMPUTE_POOL_WORKERS', 2))
+COMPUTE_POOL_MAX_PENDING = int(os.getenv('COMPUTE_POOL_MAX_PENDING', 8))
+COMPUTE_TIMEOUT = float(os.getenv('COMPUTE_TIMEOUT', 5))
+
+# 房源列式快照目录（供各进程内存映射做统计）
+ANALYTICS_SNAPSHOT_DIR = os.getenv('ANALYTICS_SNAPSHOT_DIR', os.path.join(app.instance_path, 'analytics_snapshot'))
+
+# 离线训练的价格走势模型目录（按版本保存，API进程内存映射加载）
+MODEL_REGISTRY_DIR = os.getenv('MODEL_REGISTRY_DIR', os.path.join(app.instance_path, 'model_registry'))
+# 离线训练的并行进程数，-1 表示使用全部CPU核
+MODEL_TRAINING_JOBS = int(os.getenv('MODEL_TRAINING_JOBS', -1))
+
 # 创建Redis哨兵连接
-sentinel = Sentinel(REDIS_SENTINELS, socket_timeout=10.0, password=REDIS_PASSWORD)
+sentinel = Sentinel(REDIS_SENTINELS, socket_timeout=REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT, password=REDIS_PASSWORD)
 
-# 获取Redis主节点连接（用于写操作）
-def get_redis_master():
+# 进程内共享的Redis客户端（每个客户端自带连接池），按 master/slave 缓存
+_redis_clients = {}
+_redis_clients_lock = threading.Lock()
+
+# 直连时各角色当前使用的节点地址，哨兵把从节点提升为主节点后由 reset_redis_clients 互换
+_redis_endpoints = {
+    'master': (REDIS_MASTER_HOST, REDIS_MASTER_PORT),
+    'slave': (REDIS_SLAVE_HOST, REDIS_SLAVE_PORT),
+}
+# 两次重建连接池的最小间隔（秒），避免故障期间每个失败的请求都去探测节点
+REDIS_RESET_MIN_INTERVAL = 5
+_last_redis_reset = 0
+
+def _create_redis_client(role):
+    options = {
+        'password': REDIS_PASSWORD,
+        'db': 0,
+        'decode_responses': True,
+        'max_connections': REDIS_MAX_CONNECTIONS,
+        'socket_timeout': REDIS_SOCKET_TIMEOUT,
+        'socket_connect_timeout': REDIS_SOCKET_CONNECT_TIMEOUT,
+        'health_check_interval': REDIS_HEALTH_CHECK_INTERVAL,
+        'retry_on_timeout': True,
+    }
+    if REDIS_USE_SENTINEL:
+        # 哨兵连接池在建立连接时向哨兵查询当前地址，主从切换后断开的连接会连到新的节点
+        if role == 'master':
+            return sentinel.master_for(REDIS_MASTER_NAME, **options)
+        return sentinel.slave_for(REDIS_MASTER_NAME, **options)
+    host, port = _redis_endpoints[role]
+    return redis.Redis(connection_pool=redis.ConnectionPool(host=host, port=port, **options))
+
+def _probe_redis_role(host, port):
+    """节点当前的角色 'master' 或 'slave'，连接失败时返回 None"""
+    client = redis.Redis(host=host, port=port, password=REDIS_PASSWORD, decode_responses=True,
+                         socket_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+                         socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT)
     try:
-        # 使用本地端口映射连接Redis主节点
-        return redis.Redis(host='localhost', port=6380, password=REDIS_PASSWORD, 
-                          socket_timeout=10.0, db=0, decode_responses=True)
-    except Exception as e:
-        print(f"直接连接Redis主节点失败: {e}")
-        # 如果直接连接失败，尝试通过哨兵连接
-        return sentinel.master_for(REDIS_MASTER_NAME, socket_timeout=10.0, 
-                                  password=REDIS_PASSWORD, db=0, decode_responses=True)
-
-# 获取Redis从节点连接（用于读操作）
+        return client.execute_command('ROLE')[0]
+    except redis.RedisError:
+        return None
+    finally:
+        client.close()
+
+def reset_redis_clients():
+    """
+    主节点返回 ReadOnlyError 或连接失败时重建共享的连接池
+
+    通过哨兵连接时新的连接池会向哨兵查询地址；
+    直连时重新探测配置的两个节点，哪个是主节点就把写操作指向哪个（主节点不可用时读写都指向新的主节点）。
+    旧连接池只断开空闲连接，其他线程正在使用的连接执行完当前命令后随旧连接池一起回收
+    """
+    global _last_redis_reset
+    with _redis_clients_lock:
+        now = time.time()
+        if now - _last_redis_reset < REDIS_RESET_MIN_INTERVAL:
+            return False
+        _last_redis_reset = now
+        if not REDIS_USE_SENTINEL:
+            configured = [(REDIS_MASTER_HOST, REDIS_MASTER_PORT), (REDIS_SLAVE_HOST, REDIS_SLAVE_PORT)]
+            roles = [_probe_redis_role(host, port) for host, port in configured]
+            masters = [endpoint for endpoint, role in zip(configured, roles) if role == 'master']
+            if masters:
+                slaves = [endpoint for endpoint, role in zip(configured, roles) if role == 'slave']
+                _redis_endpoints['master'] = masters[0]
+                _redis_endpoints['slave'] = slaves[0] if slaves else masters[0]
+        clients = list(_redis_clients.values())
+        _redis_clients.clear()
+    for client in clients:
+        client.connection_pool.disconnect(inuse_connections=False)
+    return True
+
+def _get_redis_client(role):
+    client = _redis_clients.get(role)
+    if client is None:
+        with _redis_clients_lock:
+            client = _redis_clients.get(role)
+            if client is None:
+                client = _redis_clients[role] = _create_redis_client(role)
+    return client
+
+# 获取Redis主节点连接（用于写操作），各请求和后台任务共享同一个连接池
+def get_redis_master():
+    return _get_redis_client('master')
+
+# 获取Redis从节点连接（用于读操作），各请求和后台任务共享同一个连接池
 def get_redis_slave():
-    try:
-        # 使用本地端口映射连接Redis从节点1
-        return redis.Redis(host='localhost', port=6381, password=REDIS_PASSWORD, 
-                          socket_timeout=10.0, db=0, decode_responses=True)
-    except Exception as e:
-        print(f"直接连接Redis从节点失败: {e}")
-        # 如果直接连接失败，尝试通过哨兵连接
-        return sentinel.slave_for(REDIS_MASTER_NAME, socket_timeout=10.0, 
-                                 password=REDIS_PASSWORD, db=0, decode_responses=True)
+    return _get_redis_client('slave')
 
 # 测试Redis连接
 try:
@@ -0,0 +1,116 @@
+function renderPriceDistributionChart(data, chartId) {
+    // 初始化ECharts实例
+    var chartDom = document.getElementById(chartId);
+    var myChart = echarts.init(chartDom);
+
+    // 判断是否为全屏模式
+    var isFullscreen = chartId === 'fullscreen-chart';
+
+    var overall = data.overall;
+
+    // p10、中位数、p90 标记线
+    var markLines = [];
+    [['p10', 'P10', '#3498db'], ['median', '中位数', '#e74c3c'], ['p90', 'P90', '#f39c12']].forEach(function(item) {
+        if (overall[item[0]] !== null && overall[item[0]] !== undefined) {
+            markLines.push({
+                xAxis: nearestCategory(overall.histogram.x, overall[item[0]]),
+                name: item[1],
+                lineStyle: { color: item[2], type: 'dashed' },
+                label: { formatter: item[1] + ': ' + overall[item[0]] + '元/月', color: item[2] }
+            });
+        }
+    });
+
+    // 直方图的类目轴上找离价格最近的柱
+    function nearestCategory(categories, value) {
+        var nearest = 0;
+        categories.forEach(function(category, index) {
+            if (Math.abs(category - value) < Math.abs(categories[nearest] - value)) {
+                nearest = index;
+            }
+        });
+        return nearest;
+    }
+
+    // 图表配置项
+    var option = {
+        title: {
+            text: '租金分布',
+            subtext: overall.count ? '共' + overall.count + '套，中位数' + overall.median + '元/月' : '',
+            left: 'center',
+            textStyle: {
+                fontSize: isFullscreen ? 20 : 14
+            }
+        },
+        tooltip: {
+            trigger: 'axis',
+            axisPointer: {
+                type: 'shadow'
+            },
+            formatter: function(params) {
+                return '约' + params[0].name + '元/月<br/>' + params[0].seriesName + ': ' + params[0].value + '套';
+            }
+        },
+        grid: {
+            left: isFullscreen ? '5%' : '3%',
+            right: isFullscreen ? '5%' : '4%',
+            bottom: isFullscreen ? '15%' : '20%',
+            top: isFullscreen ? '15%' : '25%',
+            containLabel: true
+        },
+        xAxis: {
+            type: 'category',
+            data: overall.histogram.x.map(function(value) {
+                return Math.round(value);
+            }),
+            name: '价格（元/月）',
+            axisLabel: {
+                fontSize: isFullscreen ? 14 : 10
+            }
+        },
+        yAxis: {
+            type: 'value',
+            name: '房源数量',
+            nameTextStyle: {
+                fontSize: isFullscreen ? 14 : 12
+            },
+            splitLine: {
+                lineStyle: {
+                    type: 'dashed'
+                }
+            }
+        },
+        series: [
+            {
+                name: '房源数量',
+                type: 'bar',
+                data: overall.histogram.y,
+                barCategoryGap: '5%',
+                itemStyle: {
+                    color: '#1abc9c'
+                },
+                markLine: markLines.length ? {
+                    symbol: 'none',
+                    data: markLines
+                } : undefined
+            }
+        ],
+        // 全屏模式下添加工具栏
+        toolbox: isFullscreen ? {
+            feature: {
+                restore: {},
+                saveAsImage: {}
+            },
+            right: 20,
+            top: 20
+        } : undefined
+    };
+
+    // 使用配置项显示图表
+    myChart.setOption(option);
+
+    // 窗口大小变化时，重新调整图表大小
+    window.addEventListener('resize', function() {
+        myChart.resize();
+    });
+}
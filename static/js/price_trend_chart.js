@@ -71,8 +71,11 @@ function renderPriceTrendChart(data, chartId) {
             {
                 name: '实际价格',
                 type: 'scatter',
-                data: data.actual.x.map((x, index) => [x, data.actual.y[index]]),
-                symbolSize: isFullscreen ? 10 : 8,
+                data: data.actual.x.map((x, index) => [x, data.actual.y[index], data.actual.count ? data.actual.count[index] : 1]),
+                // 聚合后的点按代表的房源数放大
+                symbolSize: function(value) {
+                    return (isFullscreen ? 10 : 8) + Math.min(Math.log(value[2] || 1) * 2, 12);
+                },
                 itemStyle: {
                     color: '#3498db'
                 },
@@ -6,6 +6,11 @@ function renderRoomPriceChart(data, chartId) {
     // 判断是否为全屏模式
     var isFullscreen = chartId === 'fullscreen-chart';
     
+    // 有价格分布草图时画中位数和P10~P90区间，否则画最低/最高价格
+    var hasQuantiles = data.median_prices && data.median_prices.some(function(value) {
+        return value !== null;
+    });
+    
     // 图表配置项
     var option = {
         title: {
@@ -18,9 +23,26 @@ function renderRoomPriceChart(data, chartId) {
         tooltip: {
             trigger: 'axis',
             formatter: function(params) {
-                return params[0].name + '<br/>' + params[0].seriesName + ': ' + params[0].value + '元/月';
+                var lines = [params[0].name];
+                params.forEach(function(param) {
+                    if (param.value === null || param.value === undefined) {
+                        return;
+                    }
+                    lines.push(param.seriesName + ': ' + param.value + '元/月');
+                });
+                if (data.counts) {
+                    lines.push('房源数量: ' + data.counts[params[0].dataIndex] + '套');
+                }
+                return lines.join('<br/>');
             }
         },
+        legend: hasQuantiles ? {
+            data: ['平均价格', '中位数', 'P10价格', 'P90价格'],
+            bottom: 0
+        } : data.min_prices ? {
+            data: ['平均价格', '最低价格', '最高价格'],
+            bottom: 0
+        } : undefined,
         grid: {
             left: isFullscreen ? '5%' : '3%',
             right: isFullscreen ? '5%' : '4%',
@@ -46,7 +68,7 @@ function renderRoomPriceChart(data, chartId) {
         },
         yAxis: {
             type: 'value',
-            name: '平均价格（元/月）',
+            name: '价格（元/月）',
             nameTextStyle: {
                 fontSize: isFullscreen ? 14 : 12
             },
@@ -114,7 +136,84 @@ function renderRoomPriceChart(data, chartId) {
                     }
                 } : undefined
             }
-        ],
+        ].concat(hasQuantiles ? [
+            {
+                name: '中位数',
+                type: 'line',
+                data: data.median_prices,
+                smooth: true,
+                symbol: 'diamond',
+                symbolSize: isFullscreen ? 8 : 6,
+                itemStyle: {
+                    color: '#8e44ad'
+                },
+                lineStyle: {
+                    width: isFullscreen ? 2 : 1,
+                    color: '#8e44ad'
+                }
+            },
+            {
+                name: 'P10价格',
+                type: 'line',
+                data: data.p10_prices,
+                smooth: true,
+                symbol: 'none',
+                itemStyle: {
+                    color: '#3498db'
+                },
+                lineStyle: {
+                    width: 1,
+                    type: 'dashed',
+                    color: '#3498db'
+                }
+            },
+            {
+                name: 'P90价格',
+                type: 'line',
+                data: data.p90_prices,
+                smooth: true,
+                symbol: 'none',
+                itemStyle: {
+                    color: '#f39c12'
+                },
+                lineStyle: {
+                    width: 1,
+                    type: 'dashed',
+                    color: '#f39c12'
+                }
+            }
+        ] : data.min_prices ? [
+            {
+                name: '最低价格',
+                type: 'line',
+                data: data.min_prices,
+                smooth: true,
+                symbol: 'none',
+                itemStyle: {
+                    color: '#3498db'
+                },
+                lineStyle: {
+                    width: 1,
+                    type: 'dashed',
+                    color: '#3498db'
+                }
+            },
+            {
+                name: '最高价格',
+                type: 'line',
+                data: data.max_prices,
+                smooth: true,
+                symbol: 'none',
+                itemStyle: {
+                    color: '#f39c12'
+                },
+                lineStyle: {
+                    width: 1,
+                    type: 'dashed',
+                    color: '#f39c12'
+                }
+            }
+        ] : []),
         // 全屏模式下添加工具栏
         toolbox: isFullscreen ? {
             feature: {
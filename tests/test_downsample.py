@@ -0,0 +1,39 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+from predict.downsample import DEFAULT_MAX_POINTS, MAX_POINTS_LIMIT, clamp_max_points, grid_downsample
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, DEFAULT_MAX_POINTS),
+    (0, 1),
+    (-5, 1),
+    (500, 500),
+    (MAX_POINTS_LIMIT + 1, MAX_POINTS_LIMIT),
+])
+def test_clamp_max_points(value, expected):
+    assert clamp_max_points(value) == expected
+
+
+def test_grid_downsample_passthrough():
+    xs, ys = np.array([10.0, 20.0, 30.0]), np.array([1000.0, 2000.0, 3000.0])
+    out_x, out_y, counts = grid_downsample(xs, ys, max_points=3)
+    assert out_x is xs and out_y is ys
+    assert counts.tolist() == [1, 1, 1]
+
+
+@pytest.mark.parametrize('max_points', [1, 10, 100, 2000])
+def test_grid_downsample_bounds(max_points):
+    rng = np.random.default_rng(max_points)
+    xs, ys = rng.uniform(10, 200, 20000), rng.uniform(500, 20000, 20000)
+    out_x, out_y, counts = grid_downsample(xs, ys, max_points)
+    assert len(out_x) == len(out_y) == len(counts) <= max_points
+    assert counts.sum() == len(xs)
+    assert out_x.min() >= xs.min() - 0.01 and out_x.max() <= xs.max() + 0.01
+    assert out_y.min() >= ys.min() - 0.01 and out_y.max() <= ys.max() + 0.01
+
+
+def test_grid_downsample_identical_points():
+    xs, ys = np.full(50, 30.0), np.full(50, 3000.0)
+    out_x, out_y, counts = grid_downsample(xs, ys, max_points=4)
+    assert out_x.tolist() == [30.0] and out_y.tolist() == [3000.0] and counts.tolist() == [50]
@@ -0,0 +1,76 @@
+import pytest
+from utils.house_fields import cn_numerals_to_arabic, parse_rooms, parse_rooms_query, canonicalize_keyword
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('一', '1'),
+    ('两', '2'),
+    ('九', '9'),
+    ('十', '10'),
+    ('十一', '11'),
+    ('十九', '19'),
+    ('二十', '20'),
+    ('两十', '20'),
+    ('二十一', '21'),
+    ('九十九', '99'),
+    ('十一室', '11室'),
+    ('两室一厅', '2室1厅'),
+    ('3室2厅', '3室2厅'),
+    ('', ''),
+])
+def test_cn_numerals_to_arabic(text, expected):
+    assert cn_numerals_to_arabic(text) == expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2室1厅', (2, 1)),
+    (' 3室2厅1卫 ', (3, 2)),
+    ('1室', (1, None)),
+    ('两室一厅', (2, 1)),
+    ('十室两厅', (10, 2)),
+    ('十一室一厅', (11, 1)),
+    ('12室3厅', (12, 3)),
+    ('开间', (None, None)),
+    ('厅2室', (None, None)),
+    ('', (None, None)),
+    (None, (None, None)),
+])
+def test_parse_rooms(value, expected):
+    assert parse_rooms(value) == expected
+
+
+@pytest.mark.parametrize('keyword, expected', [
+    ('2室', {'bedrooms': 2, 'livingrooms': None, 'at_least': False}),
+    ('两室', {'bedrooms': 2, 'livingrooms': None, 'at_least': False}),
+    ('两居', {'bedrooms': 2, 'livingrooms': None, 'at_least': False}),
+    ('2室1厅', {'bedrooms': 2, 'livingrooms': 1, 'at_least': False}),
+    ('二室 一厅', {'bedrooms': 2, 'livingrooms': 1, 'at_least': False}),
+    ('一厅', {'bedrooms': None, 'livingrooms': 1, 'at_least': False}),
+    ('3室以上', {'bedrooms': 3, 'livingrooms': None, 'at_least': True}),
+    ('3室及以上', {'bedrooms': 3, 'livingrooms': None, 'at_least': True}),
+    ('4室+', {'bedrooms': 4, 'livingrooms': None, 'at_least': True}),
+    ('十一室', {'bedrooms': 11, 'livingrooms': None, 'at_least': False}),
+])
+def test_parse_rooms_query(keyword, expected):
+    assert parse_rooms_query(keyword) == expected
+
+
+@pytest.mark.parametrize('keyword', ['', '以上', '朝阳', '2室1厅1卫', '室'])
+def test_parse_rooms_query_rejects_other_keywords(keyword):
+    assert parse_rooms_query(keyword) is None
+
+
+@pytest.mark.parametrize('keyword, search_type, expected', [
+    ('  朝阳   望京 ', 'region', '朝阳 望京'),
+    ('SOHO', 'region', 'soho'),
+    ('二室', 'region', '二室'),
+    ('二室', 'rooms', '2室'),
+    (' 两室一厅 ', 'rooms', '2室1厅'),
+    ('十一室', 'rooms', '11室'),
+])
+def test_canonicalize_keyword(keyword, search_type, expected):
+    assert canonicalize_keyword(keyword, search_type) == expected
+
+
+def test_equivalent_rooms_keywords_share_a_cache_key():
+    assert canonicalize_keyword('二室', 'rooms') == canonicalize_keyword('2室', 'rooms')
@@ -0,0 +1,30 @@
+import base64
+import pytest
+from utils.pagination import encode_cursor, decode_cursor
+
+
+@pytest.mark.parametrize('direction', ['next', 'prev'])
+@pytest.mark.parametrize('item_id', [0, 1, 42, 10 ** 12])
+def test_cursor_round_trip(direction, item_id):
+    cursor = encode_cursor(direction, item_id)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (direction, item_id)
+
+
+def _raw_cursor(text):
+    return base64.urlsafe_b64encode(text.encode('utf-8', 'surrogateescape')).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('cursor', [
+    '',
+    'not a cursor!',
+    '%%%%',
+    _raw_cursor('x:1'),          # 未知方向
+    _raw_cursor('n:abc'),        # ID不是整数
+    _raw_cursor('n:1:2'),        # 多余的字段
+    _raw_cursor('n'),            # 缺少ID
+    base64.urlsafe_b64encode(b'\xff\xfe:1').decode(),  # 不是UTF-8
+])
+def test_tampered_cursor_is_rejected(cursor):
+    assert decode_cursor(cursor) is None
+
@@ -0,0 +1,65 @@
+from datetime import datetime
+import pytest
+
+np = pytest.importorskip('numpy')
+price_rollup = pytest.importorskip('predict.price_rollup')
+from models import ROLLUP_MONTH, ROLLUP_WEEK
+
+
+def _timestamp(*args):
+    return int(datetime(*args).timestamp())
+
+
+def test_period_start_month():
+    assert price_rollup.period_start(_timestamp(2024, 3, 17, 15, 30), ROLLUP_MONTH) == _timestamp(2024, 3, 1)
+    assert price_rollup.period_start(_timestamp(2024, 3, 1), ROLLUP_MONTH) == _timestamp(2024, 3, 1)
+
+
+def test_period_start_week():
+    # 2024-03-17 是周日，所在周从 2024-03-11（周一）开始
+    assert price_rollup.period_start(_timestamp(2024, 3, 17, 23, 59), ROLLUP_WEEK) == _timestamp(2024, 3, 11)
+    assert price_rollup.period_start(_timestamp(2024, 3, 18, 0, 1), ROLLUP_WEEK) == _timestamp(2024, 3, 18)
+
+
+def test_unit_price():
+    assert price_rollup.unit_price(3000, 50) == 60
+    assert price_rollup.unit_price(None, 50) is None
+    assert price_rollup.unit_price(3000, 0) is None
+
+
+def _monthly_rows(averages, count=10):
+    return [(_timestamp(2023, month, 1), count, average * count, average ** 2 * count)
+            for month, average in enumerate(averages, start=1)]
+
+
+def test_forecast_series_linear():
+    result = price_rollup.forecast_series(_monthly_rows([50, 52, 54, 56, 58]), ROLLUP_MONTH, periods=2)
+    assert result['history']['x'] == ['2023-01', '2023-02', '2023-03', '2023-04', '2023-05']
+    assert result['history']['avg'] == [50, 52, 54, 56, 58]
+    assert result['history']['std'] == [0] * 5
+    assert result['forecast']['x'] == ['2023-06', '2023-07']
+    assert result['forecast']['y'] == pytest.approx([60, 62])
+    assert result['forecast']['lower'] == pytest.approx([60, 62])
+    assert result['forecast']['upper'] == pytest.approx([60, 62])
+
+
+def test_forecast_series_weekly_labels():
+    rows = [(_timestamp(2024, 3, day), 1, 40.0, 1600.0) for day in (4, 11, 18)]
+    result = price_rollup.forecast_series(rows, ROLLUP_WEEK, periods=1)
+    assert result['history']['x'] == ['2024-03-04', '2024-03-11', '2024-03-18']
+    assert result['forecast']['x'] == ['2024-03-25']
+
+
+def test_forecast_series_too_few_periods():
+    result = price_rollup.forecast_series(_monthly_rows([50, 52]), ROLLUP_MONTH)
+    assert result['history']['avg'] == [50, 52]
+    assert result['forecast'] == {'x': [], 'y': [], 'lower': [], 'upper': []}
+
+
+def test_forecast_series_empty():
+    empty = {
+        'history': {'x': [], 'avg': [], 'std': [], 'count': []},
+        'forecast': {'x': [], 'y': [], 'lower': [], 'upper': []}
+    }
+    assert price_rollup.forecast_series([], ROLLUP_MONTH) == empty
+    assert price_rollup.forecast_series([(_timestamp(2023, 1, 1), 0, 0, 0)], ROLLUP_MONTH) == empty
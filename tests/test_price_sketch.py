@@ -0,0 +1,65 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+price_sketch = pytest.importorskip('predict.price_sketch')
+
+
+def _prices(n, seed=0):
+    return np.random.default_rng(seed).lognormal(mean=8.3, sigma=0.5, size=n)
+
+
+def test_sketch_bucket_matches_array_version():
+    prices = _prices(200)
+    assert [price_sketch.sketch_bucket(price) for price in prices] == price_sketch.sketch_buckets(prices).tolist()
+    assert price_sketch.sketch_bucket(None) is None
+    assert price_sketch.sketch_bucket(0) is None
+
+
+def test_sketch_from_prices_ignores_invalid():
+    sketch = price_sketch.sketch_from_prices([3000, 3000, 0, -1, np.nan, 5000])
+    assert sum(sketch.values()) == 3
+    assert sketch[price_sketch.sketch_bucket(3000)] == 2
+
+
+def test_merge_sketches_equals_combined():
+    prices = _prices(1000)
+    merged = price_sketch.merge_sketches(price_sketch.sketch_from_prices(prices[:400]),
+                                         price_sketch.sketch_from_prices(prices[400:]))
+    assert merged == price_sketch.sketch_from_prices(prices)
+    assert price_sketch.merge_sketches(None, {1: 2}) == {1: 2}
+    assert price_sketch.merge_sketches({1: 2}, None) == {1: 2}
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_sketch_quantiles_relative_error(seed):
+    prices = _prices(5000, seed)
+    quantiles = [0.1, 0.5, 0.9]
+    estimates = price_sketch.sketch_quantiles(price_sketch.sketch_from_prices(prices), quantiles)
+    # 分位数按最近秩取值，与精确值比较时放宽一点舍入误差
+    for estimate, exact in zip(estimates, np.quantile(prices, quantiles, method='lower')):
+        assert abs(estimate - exact) / exact <= price_sketch.SKETCH_RELATIVE_ACCURACY + 1e-3
+
+
+def test_sketch_quantiles_after_removal():
+    prices = _prices(2000)
+    sketch = price_sketch.sketch_from_prices(prices)
+    for price in prices[:1000]:
+        sketch[price_sketch.sketch_bucket(price)] -= 1
+    assert price_sketch.sketch_quantiles(sketch, [0.5]) == \
+        price_sketch.sketch_quantiles(price_sketch.sketch_from_prices(prices[1000:]), [0.5])
+
+
+def test_sketch_summary():
+    prices = _prices(1000)
+    summary = price_sketch.sketch_summary(price_sketch.sketch_from_prices(prices), bins=10)
+    assert summary['count'] == 1000
+    assert summary['p10'] <= summary['median'] <= summary['p90']
+    assert len(summary['histogram']['x']) == len(summary['histogram']['y']) <= 10
+    assert sum(summary['histogram']['y']) == 1000
+
+
+def test_sketch_summary_empty():
+    for sketch in (None, {}, {5: 0}):
+        summary = price_sketch.sketch_summary(sketch)
+        assert summary == {'count': 0, 'p10': None, 'median': None, 'p90': None,
+                           'histogram': {'x': [], 'y': []}}
@@ -0,0 +1,161 @@
+import random
+import pytest
+
+# 索引模块从 settings 读取文件路径，需要应用的依赖（Flask、Redis等）
+search_index = pytest.importorskip('utils.search_index')
+HouseSearchIndex = search_index.HouseSearchIndex
+SEARCH_FIELDS = search_index.SEARCH_FIELDS
+
+ROWS = [
+    (1, '朝阳公园 精装两居', '朝阳', '朝阳公园', '朝阳公园南路1号', '近14号线'),
+    (2, '望京SOHO 一居室', '朝阳', '望京', '望京街10号', '近15号线望京站'),
+    (3, '中关村 三室一厅', '海淀', '中关村', '中关村大街27号', None),
+    (4, 'Loft 公寓', '海淀', '五道口', '成府路', '近13号线五道口站'),
+    (5, '公园旁 两室', '东城', '东直门', None, '近2号线'),
+]
+KEYWORDS = ['朝阳', '公园', '朝阳公园南', '望京站', '号线', '14号', 'soho', 'SOHO', 'loft 公寓',
+            '五', '1', '两居', '中关村大街27', '不存在的小区', '路1', 'a']
+
+
+def _like(rows, keyword):
+    """与 LIKE '%关键词%'（不区分大小写）逐字段匹配的结果相同"""
+    keyword = keyword.lower()
+    return {row[0] for row in rows if any(keyword in (value or '').lower() for value in row[1:])}
+
+
+def _row(house_id, fields):
+    return (house_id, *(fields.get(name) for name in SEARCH_FIELDS))
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = HouseSearchIndex(str(tmp_path / 'search_index.pkl'))
+    index.build(ROWS)
+    return index
+
+
+@pytest.mark.parametrize('keyword', KEYWORDS)
+def test_search_matches_like(index, keyword):
+    assert index.search(keyword) == _like(ROWS, keyword)
+
+
+def test_keyword_does_not_match_across_fields(index):
+    # 标题结尾和区域开头拼起来是 "两居朝阳"，但字段之间有分隔符
+    assert index.search('两居朝阳') == set()
+
+
+def test_search_before_build_returns_none(tmp_path):
+    assert HouseSearchIndex(str(tmp_path / 'missing.pkl')).search('朝阳') is None
+
+
+def test_apply_changes(index):
+    changes = [
+        {'action': 'insert', 'id': 6, 'old': None,
+         'new': {'title': '新上 朝阳一居', 'region': '朝阳', 'block': '团结湖', 'address': '团结湖路', 'traffic': None}},
+        {'action': 'update', 'id': 2, 'old': dict(zip(SEARCH_FIELDS, ROWS[1][1:])),
+         'new': {'title': '望京 两居室', 'region': '朝阳', 'block': '望京', 'address': '望京西路', 'traffic': None}},
+        {'action': 'delete', 'id': 3, 'old': dict(zip(SEARCH_FIELDS, ROWS[2][1:])), 'new': None},
+    ]
+    index.apply_changes(changes)
+    rows = [row for row in ROWS if row[0] not in (2, 3)]
+    rows += [_row(change['id'], change['new']) for change in changes if change['new'] is not None]
+    assert index.dirty
+    for keyword in KEYWORDS + ['团结湖', '两居室', '望京西路', '中关村']:
+        assert index.search(keyword) == _like(rows, keyword)
+
+
+def test_random_changes_match_rebuild(tmp_path):
+    rng = random.Random(7)
+    words = ['朝阳', '海淀', '望京', '公园', '地铁', '精装', 'SOHO', '两居', '号线']
+
+    def fields():
+        return {name: ''.join(rng.sample(words, 2)) if rng.random() > 0.1 else None for name in SEARCH_FIELDS}
+
+    docs = {house_id: fields() for house_id in range(50)}
+    index = HouseSearchIndex(str(tmp_path / 'search_index.pkl'))
+    index.build(_row(house_id, values) for house_id, values in docs.items())
+    for _ in range(200):
+        house_id = rng.randrange(60)
+        new = None if house_id in docs and rng.random() < 0.3 else fields()
+        index.apply_changes([{'action': 'update', 'id': house_id, 'old': docs.get(house_id), 'new': new}])
+        if new is None:
+            docs.pop(house_id, None)
+        else:
+            docs[house_id] = new
+
+    rows = [_row(house_id, values) for house_id, values in docs.items()]
+    for keyword in words + ['阳海', '地铁朝', 'o']:
+        assert index.search(keyword) == _like(rows, keyword)
+
+
+def test_save_and_load_round_trip(index):
+    assert index.save()
+    loaded = HouseSearchIndex(index.path)
+    assert loaded.load()
+    for keyword in KEYWORDS:
+        assert loaded.search(keyword) == index.search(keyword)
+
+
+def test_save_only_when_dirty(index):
+    assert index.save()
+    assert not index.save(only_dirty=True)
+    index.apply_changes([{'action': 'delete', 'id': 1, 'old': None, 'new': None}])
+    assert index.save(only_dirty=True)
+
+
+def test_load_ignores_corrupt_file(tmp_path):
+    path = tmp_path / 'search_index.pkl'
+    path.write_bytes(b'not a pickle')
+    assert not HouseSearchIndex(str(path)).load()
+
+
+@pytest.mark.parametrize('page', [1, 2, 4])
+def test_paginate_ids_by_page(page):
+    ids = set(random.Random(page).sample(range(1000), 35))
+    expected = sorted(ids)
+    assert search_index.paginate_ids(ids, page, 10) == (expected[(page - 1) * 10:page * 10], len(ids) > page * 10)
+
+
+def test_paginate_ids_by_cursor():
+    ids = set(range(0, 100, 3))
+    assert search_index.paginate_ids(ids, 1, 5, after_id=30) == ([33, 36, 39, 42, 45], True)
+    assert search_index.paginate_ids(ids, 1, 5, before_id=12) == ([0, 3, 6, 9], False)
+
+
+def test_incremental_saves_from_two_processes_merge(index):
+    index.save()
+    other = HouseSearchIndex(index.path)
+    assert other.load()
+    index.apply_changes([{'action': 'insert', 'id': 10, 'old': None, 'new': {'title': '新房源'}}])
+    other.apply_changes([{'action': 'insert', 'id': 11, 'old': None, 'new': {'title': '另一个'}},
+                         {'action': 'delete', 'id': 1, 'old': None, 'new': None}])
+    assert other.save(only_dirty=True)
+    # 保存前先合并另一个进程已保存的文件
+    assert index.save(only_dirty=True)
+    merged = HouseSearchIndex(index.path)
+    assert merged.load()
+    assert merged.search('新房源') == {10}
+    assert merged.search('另一个') == {11}
+    assert merged.search('朝阳') == {2}
+
+
+def test_reload_keeps_unsaved_changes(index):
+    index.save()
+    other = HouseSearchIndex(index.path)
+    assert other.load()
+    index.apply_changes([{'action': 'update', 'id': 2, 'old': None, 'new': {'title': '新房源', 'region': '朝阳'}}])
+    other.apply_changes([{'action': 'insert', 'id': 11, 'old': None, 'new': {'title': '另一个'}}])
+    other.save(only_dirty=True)
+    # 重新加载其他进程保存的文件后，本进程还没有保存的变更仍然有效
+    assert index.load()
+    assert index.search('新房源') == {2}
+    assert index.search('望京') == set()
+    assert index.search('另一个') == {11}
+    assert index.dirty
+
+
+def test_rebuild_drops_pending_changes(index):
+    index.apply_changes([{'action': 'delete', 'id': 1, 'old': None, 'new': None}])
+    index.build(ROWS)
+    assert index.pending == []
+    assert index.search('朝阳公园') == {1}
@@ -0,0 +1,87 @@
+import os
+import pytest
+
+np = pytest.importorskip('numpy')
+snapshot = pytest.importorskip('predict.snapshot')
+from predict.price_sketch import sketch_from_prices
+
+# (id, region, block, address, rooms, price, area, page_views, bedrooms, livingrooms)
+ROWS = [
+    (1, '浦东', '张江', 'A小区', '2室1厅', 5000, 60, 10, 2, 1),
+    (2, '徐汇', '徐家汇', 'B小区', '1室1厅', 6000, 40, 3, 1, 1),
+    (3, '浦东', '陆家嘴', 'C小区', '3室2厅', 12000, 110, 0, 3, 2),
+    (4, '浦东', '张江', 'A小区', '2室1厅', 5400, 65, 7, 2, 1),
+    (5, '浦东', '张江', 'D小区', '1室0厅', 3000, 30, None, 1, 0),
+    (6, '浦东', None, 'E小区', None, None, None, 1, -1, -1),
+    (7, None, None, None, None, 2000, 20, 0, 1, 0),
+]
+
+
+@pytest.fixture
+def house_snapshot(tmp_path):
+    house_snapshot = snapshot.HouseSnapshot(str(tmp_path))
+    assert house_snapshot.build(iter(ROWS))
+    return house_snapshot
+
+
+def _expected_ids(region, block=None):
+    return sorted(row[0] for row in ROWS if row[1] == region and (block is None or row[2] == block))
+
+
+@pytest.mark.parametrize('region, block', [
+    ('浦东', None), ('浦东', '张江'), ('浦东', '陆家嘴'), ('徐汇', None), ('徐汇', '徐家汇'),
+])
+def test_location_rows(house_snapshot, region, block):
+    view = house_snapshot.location(region, block)
+    assert sorted(view['id'].tolist()) == _expected_ids(region, block)
+
+
+def test_location_missing(house_snapshot):
+    assert house_snapshot.location('静安') is None
+    assert house_snapshot.location('浦东', '徐家汇') is None
+    assert house_snapshot.location('') is None
+
+
+def test_location_unavailable(tmp_path):
+    assert snapshot.HouseSnapshot(str(tmp_path)).location('浦东') is None
+
+
+def test_reload_from_directory(house_snapshot):
+    reloaded = snapshot.HouseSnapshot(house_snapshot.directory)
+    assert reloaded.load()
+    assert reloaded.location('浦东', '张江')['id'].tolist() == house_snapshot.location('浦东', '张江')['id'].tolist()
+
+
+def test_area_price_skips_missing(house_snapshot):
+    areas, prices = snapshot.HouseSnapshot.area_price(house_snapshot.location('浦东'))
+    assert sorted(zip(areas.tolist(), prices.tolist())) == [(30, 3000), (60, 5000), (65, 5400), (110, 12000)]
+
+
+def test_layout_price_stats(house_snapshot):
+    stats = snapshot.HouseSnapshot.layout_price_stats(house_snapshot.location('浦东'))
+    assert stats == {
+        (2, 1): {'count': 2, 'sum': 10400.0, 'min': 5000.0, 'max': 5400.0},
+        (3, 2): {'count': 1, 'sum': 12000.0, 'min': 12000.0, 'max': 12000.0},
+        (1, 0): {'count': 1, 'sum': 3000.0, 'min': 3000.0, 'max': 3000.0},
+    }
+
+
+def test_analytics(house_snapshot):
+    analytics = house_snapshot.analytics(house_snapshot.location('浦东'), community_limit=1)
+    assert analytics['layouts'] == {'2室1厅': 2, '3室2厅': 1, '1室0厅': 1}
+    assert analytics['communities'] == [('A小区', 2)]
+    assert analytics['sketches'] == {
+        (2, 1): sketch_from_prices([5000, 5400]),
+        (3, 2): sketch_from_prices([12000]),
+        (1, 0): sketch_from_prices([3000]),
+    }
+
+
+def test_rebuild_keeps_recent_versions(house_snapshot, monkeypatch):
+    times = iter(range(2000000000, 2000000010))
+    monkeypatch.setattr(snapshot.time, 'time', lambda: next(times))
+    for _ in range(snapshot.KEEP_SNAPSHOTS + 1):
+        assert house_snapshot.build(ROWS[:2])
+    versions = [name for name in os.listdir(house_snapshot.directory) if name.isdigit()]
+    assert len(versions) == snapshot.KEEP_SNAPSHOTS
+    assert house_snapshot.location('徐汇')['id'].tolist() == [2]
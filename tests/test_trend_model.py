@@ -0,0 +1,67 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+trend_model = pytest.importorskip('predict.trend_model')
+
+
+def _sample(n, seed=0):
+    rng = np.random.default_rng(seed)
+    areas = rng.uniform(15, 200, n)
+    prices = 800 + 40 * areas + 0.05 * areas ** 2 + rng.normal(0, 300, n)
+    return areas, prices
+
+
+def test_fit_trend_matches_polyfit():
+    areas, prices = _sample(500)
+    coef = trend_model.fit_trend(trend_model.trend_stats_from_arrays(areas, prices))
+    expected = np.polyfit(areas / trend_model.AREA_SCALE, prices, 2)[::-1]
+    assert np.allclose(coef, expected, rtol=1e-6)
+
+
+def test_fit_trend_requires_min_points():
+    areas, prices = _sample(trend_model.MIN_TREND_POINTS - 1)
+    assert trend_model.fit_trend(trend_model.trend_stats_from_arrays(areas, prices)) is None
+    assert trend_model.fit_trend(None) is None
+    assert trend_model.fit_trend_model(areas[:0], prices[:0]) is None
+
+
+def test_trend_terms_sum_to_stats():
+    areas, prices = _sample(20)
+    stats = trend_model.trend_stats_from_arrays(areas, prices)
+    for name in trend_model.TREND_SUM_FIELDS:
+        total = sum(trend_model.trend_terms(area, price)[name] for area, price in zip(areas, prices))
+        assert total == pytest.approx(stats[name])
+
+
+def test_merge_trend_stats_equals_combined():
+    areas, prices = _sample(300)
+    first = trend_model.trend_stats_from_arrays(areas[:120], prices[:120])
+    second = trend_model.trend_stats_from_arrays(areas[120:], prices[120:])
+    merged = trend_model.merge_trend_stats(first, second)
+    combined = trend_model.trend_stats_from_arrays(areas, prices)
+    for name in trend_model.TREND_SUM_FIELDS + trend_model.TREND_RANGE_FIELDS:
+        assert merged[name] == pytest.approx(combined[name])
+
+
+def test_merge_trend_stats_with_empty():
+    areas, prices = _sample(10)
+    stats = trend_model.trend_stats_from_arrays(areas, prices)
+    assert trend_model.merge_trend_stats(None, stats) == stats
+    assert trend_model.merge_trend_stats(None, stats) is not stats
+    assert trend_model.merge_trend_stats(stats, None) is stats
+    assert trend_model.merge_trend_stats(None, None) is None
+
+
+def test_trend_predict_clips_to_range():
+    coef = np.array([100.0, 200.0, 50.0])
+    clipped = trend_model.trend_predict(coef, [10, 50, 300], min_x=20, max_x=150)
+    assert np.allclose(clipped, trend_model.trend_predict(coef, [20, 50, 150]))
+
+
+def test_solve_trend_curve():
+    areas, prices = _sample(100)
+    curve = trend_model.solve_trend(trend_model.trend_stats_from_arrays(areas, prices), points=10)
+    assert len(curve['x']) == len(curve['y']) == 10
+    assert curve['x'][0] == pytest.approx(areas.min())
+    assert curve['x'][-1] == pytest.approx(areas.max())
+    assert trend_model.solve_trend(None) == {'x': [], 'y': []}
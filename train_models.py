@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+import sys
+import time
+import logging
+import numpy as np
+from joblib import Parallel, delayed
+from settings import app, db, MODEL_TRAINING_JOBS
+from models import House
+from predict.trend_model import fit_trend_model
+from predict.model_registry import model_registry, model_location
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('train_models')
+
+# 读取房源面积和价格时每批的行数
+FETCH_BATCH_SIZE = 5000
+
+
+def load_location_points():
+    """
+    按区域、板块读取房源的面积和价格
+
+    返回 {位置键: (面积数组, 价格数组)}，包括每个区域和每个区域/板块
+    """
+    points = {}
+    rows = db.session.query(House.region, House.block, House.area_sqm, House.price_num).filter(
+        House.region.isnot(None), House.area_sqm.isnot(None), House.price_num.isnot(None)
+    ).yield_per(FETCH_BATCH_SIZE)
+    for region, block, area, price in rows:
+        for location in ((region, None), (region, block)) if block else ((region, None),):
+            areas, prices = points.setdefault(model_location(*location), ([], []))
+            areas.append(area)
+            prices.append(price)
+    return {location: (np.array(areas, dtype=np.float64), np.array(prices, dtype=np.float64))
+            for location, (areas, prices) in points.items()}
+
+
+def train_models(n_jobs=MODEL_TRAINING_JOBS):
+    """并行训练所有区域、区域/板块的价格走势模型，发布到模型注册表"""
+    started = time.time()
+    with app.app_context():
+        points = load_location_points()
+    logger.info(f"已读取 {len(points)} 个位置的房源数据，耗时 {time.time() - started:.1f} 秒")
+
+    locations = list(points)
+    # 各位置的数组较大时由 joblib 自动内存映射给子进程，不逐个复制
+    results = Parallel(n_jobs=n_jobs)(delayed(fit_trend_model)(*points[location]) for location in locations)
+    models = dict(zip(locations, results))
+
+    version = model_registry.publish(models, {'training_seconds': round(time.time() - started, 1)})
+    skipped = sum(1 for model in results if model is None)
+    logger.info(f"价格走势模型训练完成: 版本 {version}, {len(locations) - skipped} 个位置, "
+                f"样本不足跳过 {skipped} 个, 总耗时 {time.time() - started:.1f} 秒")
+    return version
+
+
+def show_help():
+    """显示帮助信息"""
+    print("""
+价格走势模型离线训练工具使用说明:
+
+命令行参数:
+   --jobs N      并行训练的进程数，-1 表示使用全部CPU核（默认读取 MODEL_TRAINING_JOBS）
+   --help        显示此帮助信息
+
+示例:
+   python train_models.py           # 训练所有区域、区域/板块的模型并发布新版本
+   python train_models.py --jobs 4  # 使用4个进程训练
+""")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--help":
+        show_help()
+    elif len(sys.argv) > 2 and sys.argv[1] == "--jobs":
+        train_models(int(sys.argv[2]))
+    elif len(sys.argv) > 1:
+        logger.error(f"未知参数: {' '.join(sys.argv[1:])}")
+        show_help()
+    else:
+        train_models()
@@ -2,8 +2,18 @@ import threading
 import time
 import logging
 import queue
-from models import db, House, User, Recommend
+from sqlalchemy import case, event, inspect
+from sqlalchemy.exc import IntegrityError
+from models import db, House, User, Recommend, PageViewsFlush
+from settings import PAGE_VIEWS_FLUSH_INTERVAL, PAGE_VIEWS_FLUSH_BATCH_SIZE, SEARCH_INDEX_SAVE_INTERVAL
 from utils import redis_utils
+from utils.search_index import house_search_index, house_suggest_index
+from utils.locations import resolve_location
+from utils.house_fields import parse_area, parse_price
+from predict.price_prediction import house_snapshot
+from predict.trend_model import trend_stats_columns, trend_stats_from_row, merge_trend_stats
+from predict.price_sketch import sketch_bucket_column
+from predict.price_rollup import add_rollup, unit_price, replace_rollups, apply_rollup_deltas
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -20,6 +30,33 @@ TASK_UPDATE_USER_COLLECTION = 'update_user_collection'
 TASK_UPDATE_USER_RECOMMEND = 'update_user_recommend'
 TASK_UPDATE_HOUSE_DETAIL = 'update_house_detail'
 TASK_UPDATE_HOUSE_PAGE_VIEWS = 'update_house_page_views'
+TASK_UPDATE_SIMILAR_HOUSE_POOLS = 'update_similar_house_pools'
+TASK_UPDATE_HOUSE_COUNTS = 'update_house_counts'
+TASK_UPDATE_SEARCH_INDEX = 'update_search_index'
+TASK_SAVE_SEARCH_INDEX = 'save_search_index'
+TASK_UPDATE_SUGGEST_INDEX = 'update_suggest_index'
+TASK_UPDATE_ANALYTICS_CUBE = 'update_analytics_cube'
+TASK_UPDATE_ANALYTICS_SNAPSHOT = 'update_analytics_snapshot'
+TASK_UPDATE_PRICE_ROLLUPS = 'update_price_rollups'
+TASK_HANDLE_HOUSE_CHANGES = 'handle_house_changes'
+
+# Redis不可用时的进程内浏览量增量（房源ID -> 增量），随下一轮落库一起写入MySQL
+_page_views_buffer = {}
+_page_views_lock = threading.Lock()
+
+# 单价时间汇总重建锁的过期时间（秒）：重建成功后锁保留到过期，各进程每小时的调度只有一个会重建
+PRICE_ROLLUP_LOCK_EXPIRE = 3000
+# 搜索索引重建锁的过期时间（秒）：同上，只有一个进程从MySQL重建，其他进程重新加载保存的文件
+SEARCH_INDEX_LOCK_EXPIRE = 3000
+
+# 浏览量落库记录的保留时间（秒），远大于落库锁的过期时间，之后不会再有同一批增量重试
+PAGE_VIEWS_FLUSH_RECORD_EXPIRE = 86400
+
+# 浏览量排行榜对账时缓存摘要的房源数量
+HIGH_VIEW_SUMMARY_SIZE = 100
+
+# 房源变更时需要记录新旧值的字段
+HOUSE_TRACKED_FIELDS = ('title', 'rooms', 'area', 'price', 'region', 'block', 'address', 'traffic', 'publish_time')
 
 # 任务处理线程
 class TaskWorker(threading.Thread):
@@ -41,13 +78,21 @@ class TaskWorker(threading.Thread):
                 
                 # 处理任务
                 with self.app.app_context():
-                    self.process_task(task)
+                    try:
+                        self.process_task(task)
+                    finally:
+                        if task.get('pending_guard'):
+                            redis_utils.clear_task_pending(task.get('type'))
                 
                 # 标记任务完成
                 task_queue.task_done()
             except Exception as e:
                 logger.error(f"处理任务时出错: {str(e)}")
         
+        # 退出前把缓冲的浏览量落库，减少丢失
+        with self.app.app_context():
+            self.update_house_page_views()
+        
         logger.info("异步任务处理线程已停止")
     
     def process_task(self, task):
@@ -67,7 +112,25 @@ class TaskWorker(threading.Thread):
         elif task_type == TASK_UPDATE_HOUSE_DETAIL:
             self.update_house_detail(task.get('house_id'))
         elif task_type == TASK_UPDATE_HOUSE_PAGE_VIEWS:
-            self.update_house_page_views(task.get('house_id'), task.get('views'))
+            self.update_house_page_views()
+        elif task_type == TASK_UPDATE_SIMILAR_HOUSE_POOLS:
+            self.update_similar_house_pools()
+        elif task_type == TASK_UPDATE_HOUSE_COUNTS:
+            self.update_house_counts()
+        elif task_type == TASK_UPDATE_SEARCH_INDEX:
+            self.update_search_index()
+        elif task_type == TASK_SAVE_SEARCH_INDEX:
+            self.save_search_index()
+        elif task_type == TASK_UPDATE_SUGGEST_INDEX:
+            self.update_suggest_index()
+        elif task_type == TASK_UPDATE_ANALYTICS_CUBE:
+            self.update_analytics_cube()
+        elif task_type == TASK_UPDATE_ANALYTICS_SNAPSHOT:
+            self.update_analytics_snapshot()
+        elif task_type == TASK_UPDATE_PRICE_ROLLUPS:
+            self.update_price_rollups()
+        elif task_type == TASK_HANDLE_HOUSE_CHANGES:
+            self.handle_house_changes(task.get('changes'))
     
     def update_hot_houses(self):
         """更新热点房源"""
@@ -81,12 +144,21 @@ class TaskWorker(threading.Thread):
             logger.error(f"更新热点房源时出错: {str(e)}")
     
     def update_high_view_houses(self):
-        """更新高浏览量房源"""
+        """用MySQL中的浏览量对账浏览量排行榜"""
         try:
-            # 获取高浏览量房源（按照浏览量降序排序，取前10个）
-            high_view_houses = House.query.order_by(House.page_views.desc()).limit(10).all()
-            # 缓存到Redis
-            redis_utils.cache_high_view_houses(high_view_houses)
+            # 只查询ID和浏览量两列，加上尚未落库的增量
+            scores = {house_id: page_views or 0
+                      for house_id, page_views in db.session.query(House.id, House.page_views).all()}
+            pending = redis_utils.get_pending_house_page_views() or {}
+            for house_id, delta in pending.items():
+                if house_id in scores:
+                    scores[house_id] += delta
+            
+            # 排名靠前的房源缓存摘要，首页不必再查询MySQL
+            top_ids = sorted(scores, key=scores.get, reverse=True)[:HIGH_VIEW_SUMMARY_SIZE]
+            top_houses = House.query.filter(House.id.in_(top_ids)).all() if top_ids else []
+            
+            redis_utils.cache_high_view_rank(scores, top_houses)
             logger.info("已更新高浏览量房源")
         except Exception as e:
             logger.error(f"更新高浏览量房源时出错: {str(e)}")
@@ -223,27 +295,307 @@ class TaskWorker(threading.Thread):
         except Exception as e:
             logger.error(f"更新房源详情时出错: {str(e)}")
     
-    def update_house_page_views(self, house_id, views):
-        """更新房源浏览量"""
+    def update_house_page_views(self):
+        """把累积的浏览量增量批量写入MySQL"""
+        # Redis中的增量（其他进程正在落库时没有令牌）和进程内缓冲的增量
+        flush = redis_utils.pop_house_page_views_deltas()
+        token, flush_id, redis_deltas = flush if flush is not None else (None, None, {})
+        local_deltas = _drain_page_views_buffer()
+        
         try:
-            if not house_id:
-                return
+            if redis_deltas:
+                # 与浏览量在同一个事务中记录这批增量的ID：上次已提交但没来得及删除Redis中的增量时主键冲突，
+                # 另一个进程正在提交同一批增量时等它提交后冲突，都不再重复累加
+                now = int(time.time())
+                PageViewsFlush.query.filter(
+                    PageViewsFlush.flushed_at < now - PAGE_VIEWS_FLUSH_RECORD_EXPIRE
+                ).delete(synchronize_session=False)
+                db.session.add(PageViewsFlush(flush_id=flush_id, flushed_at=now))
+                db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            logger.warning(f"这批浏览量增量已经落库，不再重复累加: {flush_id}")
+            redis_deltas = {}
+        except Exception as e:
+            db.session.rollback()
+            if token is not None:
+                redis_utils.finish_house_page_views_flush(token, False)
+            _restore_page_views_buffer(local_deltas)
+            logger.error(f"记录浏览量落库批次时出错: {str(e)}")
+            return
+        
+        deltas = dict(redis_deltas)
+        for house_id, delta in local_deltas.items():
+            deltas[house_id] = deltas.get(house_id, 0) + delta
+        
+        if not deltas:
+            if token is not None:
+                redis_utils.finish_house_page_views_flush(token, True)
+            return
+        
+        try:
+            # 按ID排序后分批，用 CASE id WHEN ... 一条语句更新多行
+            items = sorted(deltas.items())
+            for i in range(0, len(items), PAGE_VIEWS_FLUSH_BATCH_SIZE):
+                batch = dict(items[i:i + PAGE_VIEWS_FLUSH_BATCH_SIZE])
+                House.query.filter(House.id.in_(list(batch.keys()))).update(
+                    {House.page_views: db.func.coalesce(House.page_views, 0) + case(batch, value=House.id, else_=0)},
+                    synchronize_session=False
+                )
+                # 每写完一批为落库锁续期，避免落库较慢时锁过期、其他进程同时落库同一批增量
+                if token is not None:
+                    redis_utils.refresh_house_page_views_flush_lock(token)
+            db.session.commit()
             
-            # 获取房源信息
-            house = House.query.get(house_id)
-            if not house:
+            if token is not None:
+                redis_utils.finish_house_page_views_flush(token, True)
+            logger.info(f"已批量更新 {len(deltas)} 个房源的浏览量")
+        except Exception as e:
+            db.session.rollback()
+            # Redis中的增量保留到下一轮，进程内的增量放回缓冲
+            if token is not None:
+                redis_utils.finish_house_page_views_flush(token, False)
+            _restore_page_views_buffer(local_deltas)
+            logger.error(f"批量更新房源浏览量时出错: {str(e)}")
+    
+    def update_similar_house_pools(self):
+        """重建所有区域/板块的相似房源ID池"""
+        try:
+            # 只查询ID和位置两列
+            rows = db.session.query(House.id, House.region, House.block).all()
+            pools = {}
+            for house_id, region, block in rows:
+                pools.setdefault((region, block), []).append(house_id)
+            
+            redis_utils.cache_similar_house_pools(pools)
+            logger.info(f"已更新相似房源ID池: {len(pools)} 个板块")
+        except Exception as e:
+            logger.error(f"更新相似房源ID池时出错: {str(e)}")
+    
+    def update_house_counts(self):
+        """重新统计房源总数及各区域、板块的房源数量"""
+        try:
+            rows = db.session.query(House.region, House.block, db.func.count(House.id)).group_by(
+                House.region, House.block).all()
+            redis_utils.cache_house_counts({(region, block): count for region, block, count in rows})
+            logger.info("已更新房源数量")
+        except Exception as e:
+            logger.error(f"更新房源数量时出错: {str(e)}")
+    
+    def update_search_index(self):
+        """从MySQL重建房源搜索索引并保存到磁盘"""
+        # 每个进程每小时都会调度重建，用Redis锁保证同一周期只有一个进程全量重建
+        token = redis_utils.acquire_task_lock(TASK_UPDATE_SEARCH_INDEX, SEARCH_INDEX_LOCK_EXPIRE)
+        if token is None:
+            logger.info("其他进程正在或刚刚重建房源搜索索引，跳过")
+            # 本进程还没有索引时直接加载其他进程保存的文件
+            if not house_search_index.loaded:
+                house_search_index.load()
+            return
+        try:
+            rows = db.session.query(House.id, House.title, House.region, House.block,
+                                    House.address, House.traffic).yield_per(5000)
+            house_search_index.build(rows)
+            house_search_index.save()
+            logger.info("已更新房源搜索索引")
+        except Exception as e:
+            # 重建失败时释放锁，让其他进程的下一次调度重试
+            redis_utils.release_task_lock(TASK_UPDATE_SEARCH_INDEX, token)
+            logger.error(f"更新房源搜索索引时出错: {str(e)}")
+    
+    def save_search_index(self):
+        """把增量更新过的房源搜索索引保存到磁盘，供其他进程重新加载"""
+        try:
+            house_search_index.save(only_dirty=True)
+        except Exception as e:
+            logger.error(f"保存房源搜索索引时出错: {str(e)}")
+    
+    def update_suggest_index(self):
+        """重建搜索框关键词提示索引：区域、板块按房源数量加权，标题按浏览量加权"""
+        try:
+            region_weights, block_weights = {}, {}
+            rows = db.session.query(House.region, House.block, db.func.count(House.id)).group_by(
+                House.region, House.block).all()
+            for region, block, count in rows:
+                region_weights[region] = region_weights.get(region, 0) + count
+                block_weights[block] = block_weights.get(block, 0) + count
+            
+            titles = db.session.query(House.title, db.func.sum(House.page_views)).group_by(House.title).all()
+            
+            house_suggest_index.build({
+                'region': list(region_weights.items()),
+                'block': list(block_weights.items()),
+                'title': [(title, int(views or 0)) for title, views in titles],
+            })
+            house_suggest_index.save()
+            logger.info("已更新关键词提示索引")
+        except Exception as e:
+            logger.error(f"更新关键词提示索引时出错: {str(e)}")
+    
+    def update_analytics_cube(self):
+        """按区域、板块重新统计户型分布、小区房源数、各户型价格、价格分布草图和价格走势统计量，物化到Redis"""
+        try:
+            cube = {}
+            
+            def location_data(region, block):
+                return cube.setdefault((region, block), {'layouts': {}, 'communities': {}, 'prices': {}, 'trend': None,
+                                                         'sketches': {}})
+            
+            def add_count(counts, key, count):
+                counts[key] = counts.get(key, 0) + count
+            
+            rows = db.session.query(House.region, House.block, House.rooms, db.func.count(House.id)).filter(
+                House.rooms.isnot(None)).group_by(House.region, House.block, House.rooms).all()
+            for region, block, rooms, count in rows:
+                for location in ((region, None), (region, block)):
+                    add_count(location_data(*location)['layouts'], rooms, count)
+            
+            rows = db.session.query(House.region, House.block, House.address, db.func.count(House.id)).filter(
+                House.address.isnot(None)).group_by(House.region, House.block, House.address).all()
+            for region, block, address, count in rows:
+                for location in ((region, None), (region, block)):
+                    add_count(location_data(*location)['communities'], address, count)
+            
+            rows = db.session.query(
+                House.region, House.block, House.bedrooms, House.livingrooms, db.func.count(House.id),
+                db.func.sum(House.price_num), db.func.min(House.price_num), db.func.max(House.price_num)
+            ).filter(
+                House.bedrooms.isnot(None), House.livingrooms.isnot(None), House.price_num.isnot(None)
+            ).group_by(House.region, House.block, House.bedrooms, House.livingrooms).all()
+            for region, block, bedrooms, livingrooms, count, total, low, high in rows:
+                for location in ((region, None), (region, block)):
+                    prices = location_data(*location)['prices']
+                    stats = prices.get((bedrooms, livingrooms))
+                    if stats is None:
+                        prices[(bedrooms, livingrooms)] = {'count': count, 'sum': total, 'min': low, 'max': high}
+                    else:
+                        stats['count'] += count
+                        stats['sum'] += total
+                        stats['min'] = min(stats['min'], low)
+                        stats['max'] = max(stats['max'], high)
+            
+            # 价格分布草图在数据库中按桶计数，板块的草图逐桶相加得到区域的草图
+            bucket = sketch_bucket_column(House.price_num)
+            rows = db.session.query(
+                House.region, House.block, House.bedrooms, House.livingrooms, bucket, db.func.count(House.id)
+            ).filter(
+                House.bedrooms.isnot(None), House.livingrooms.isnot(None), House.price_num > 0
+            ).group_by(House.region, House.block, House.bedrooms, House.livingrooms, bucket).all()
+            for region, block, bedrooms, livingrooms, bucket_id, count in rows:
+                for location in ((region, None), (region, block)):
+                    sketch = location_data(*location)['sketches'].setdefault((bedrooms, livingrooms), {})
+                    add_count(sketch, int(bucket_id), count)
+            
+            rows = db.session.query(
+                House.region, House.block, *trend_stats_columns(House.area_sqm, House.price_num)
+            ).filter(
+                House.area_sqm.isnot(None), House.price_num.isnot(None)
+            ).group_by(House.region, House.block).all()
+            for region, block, *values in rows:
+                trend = trend_stats_from_row(values)
+                for location in ((region, None), (region, block)):
+                    data = location_data(*location)
+                    data['trend'] = merge_trend_stats(data['trend'], trend)
+            
+            redis_utils.cache_analytics_cube(cube)
+            logger.info(f"已更新区域/板块统计数据: {len(cube)} 个位置")
+        except Exception as e:
+            logger.error(f"更新区域/板块统计数据时出错: {str(e)}")
+    
+    def update_analytics_snapshot(self):
+        """从MySQL导出房源列式快照，供各进程内存映射做统计"""
+        try:
+            rows = db.session.query(
+                House.id, House.region, House.block, House.address, House.rooms, House.price_num,
+                House.area_sqm, db.func.coalesce(House.page_views, 0), House.bedrooms, House.livingrooms
+            ).yield_per(5000)
+            house_snapshot.build(rows)
+            logger.info("已更新房源列式快照")
+        except Exception as e:
+            logger.error(f"更新房源列式快照时出错: {str(e)}")
+    
+    def update_price_rollups(self):
+        """按发布时间重新统计各区域/板块分月、分周的单价汇总"""
+        # 每个进程每小时都会调度重建，用Redis锁保证同一时间、同一周期只有一个进程整表替换
+        token = redis_utils.acquire_task_lock(TASK_UPDATE_PRICE_ROLLUPS, PRICE_ROLLUP_LOCK_EXPIRE)
+        if token is None:
+            logger.info("其他进程正在或刚刚重建单价时间汇总，跳过")
+            return
+        try:
+            rollups = {}
+            rows = db.session.query(
+                House.region_id, House.block_id, House.publish_time, House.price_num, House.area_sqm
+            ).filter(
+                House.publish_time.isnot(None), House.price_num.isnot(None), House.area_sqm > 0
+            ).yield_per(5000)
+            for region_id, block_id, publish_time, price, area in rows:
+                add_rollup(rollups, (region_id, block_id), publish_time, unit_price(price, area))
+            replace_rollups(rollups)
+            logger.info(f"已更新单价时间汇总: {len(rollups)} 个时间段")
+        except Exception as e:
+            db.session.rollback()
+            # 重建失败时释放锁，让其他进程的下一次调度重试
+            redis_utils.release_task_lock(TASK_UPDATE_PRICE_ROLLUPS, token)
+            logger.error(f"更新单价时间汇总时出错: {str(e)}")
+    
+    def update_price_rollup_changes(self, changes):
+        """根据房源变更增量维护单价时间汇总"""
+        try:
+            rollups = {}
+            for change in changes:
+                for values, delta in ((change['old'], -1), (change['new'], 1)):
+                    if not values:
+                        continue
+                    location_ids = resolve_location(values['region'], values['block'])
+                    if location_ids is None:
+                        continue
+                    add_rollup(rollups, location_ids, values['publish_time'],
+                               unit_price(parse_price(values['price']), parse_area(values['area'])), delta)
+            apply_rollup_deltas(rollups)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"增量更新单价时间汇总时出错: {str(e)}")
+    
+    def refresh_analytics_stats(self, locations):
+        """重新统计指定区域/板块的各户型价格和价格走势统计量（最低/最高值无法增量维护时调用）"""
+        for region, block in locations:
+            query = House.query.filter(House.region == region)
+            if block:
+                query = query.filter(House.block == block)
+            rows = query.filter(
+                House.bedrooms.isnot(None), House.livingrooms.isnot(None), House.price_num.isnot(None)
+            ).with_entities(
+                House.bedrooms, House.livingrooms, db.func.count(House.id),
+                db.func.sum(House.price_num), db.func.min(House.price_num), db.func.max(House.price_num)
+            ).group_by(House.bedrooms, House.livingrooms).all()
+            trend_row = query.filter(House.area_sqm.isnot(None), House.price_num.isnot(None)).with_entities(
+                *trend_stats_columns(House.area_sqm, House.price_num)).first()
+            redis_utils.cache_analytics_stats(region, block, {
+                (bedrooms, livingrooms): {'count': count, 'sum': total, 'min': low, 'max': high}
+                for bedrooms, livingrooms, count, total, low, high in rows
+            }, trend_stats_from_row(trend_row))
+    
+    def handle_house_changes(self, changes):
+        """房源新增/修改/删除后增量维护派生数据"""
+        try:
+            if not changes:
                 return
             
-            # 更新浏览量
-            house.page_views = views
-            db.session.commit()
+            redis_utils.update_similar_house_pools(changes)
+            redis_utils.update_house_counts(changes)
+            redis_utils.update_high_view_rank(changes)
+            redis_utils.invalidate_search_results()
+            stale_stats = redis_utils.update_analytics_cube(changes)
+            if stale_stats:
+                self.refresh_analytics_stats(stale_stats)
+            self.update_price_rollup_changes(changes)
             
-            # 更新Redis中的房源详情
-            self.update_house_detail(house_id)
+            # 只更新内存中的索引，由 schedule_search_index_save 定期保存
+            house_search_index.apply_changes(changes)
             
-            logger.info(f"已更新房源 {house_id} 的浏览量: {views}")
+            logger.info(f"已处理 {len(changes)} 条房源变更")
         except Exception as e:
-            logger.error(f"更新房源浏览量时出错: {str(e)}")
+            logger.error(f"处理房源变更时出错: {str(e)}")
     
     def stop(self):
         """停止线程"""
@@ -256,6 +608,15 @@ def add_task(task_type, **kwargs):
     task_queue.put(task)
     logger.debug(f"已添加任务: {task_type}")
 
+# 添加去重的重建任务到队列
+def add_task_once(task_type, **kwargs):
+    """同类任务已在某个进程排队或执行时不再添加，避免缓存未命中的每个请求都触发一次全表统计"""
+    if not redis_utils.mark_task_pending(task_type):
+        logger.debug(f"任务已在排队，跳过: {task_type}")
+        return False
+    add_task(task_type, pending_guard=True, **kwargs)
+    return True
+
 # 启动任务处理线程
 def start_task_worker(app):
     """启动任务处理线程"""
@@ -271,11 +632,8 @@ def cache_initial_data(app):
             # 获取热点房源
             hot_houses = House.query.order_by(db.func.random()).limit(6).all()
             
-            # 获取高浏览量房源
-            high_view_houses = House.query.order_by(House.page_views.desc()).limit(10).all()
-            
-            # 缓存到Redis
-            redis_utils.cache_initial_data(hot_houses, high_view_houses)
+            # 缓存到Redis（浏览量排行榜由定期对账任务建立）
+            redis_utils.cache_initial_data(hot_houses)
             
             logger.info("已缓存初始数据")
         except Exception as e:
@@ -296,21 +654,132 @@ def async_update_user_recommend(user_id, house_id):
     """异步更新用户推荐数据"""
     add_task(TASK_UPDATE_USER_RECOMMEND, user_id=user_id, house_id=house_id)
 
+# 异步对账浏览量排行榜
+def async_update_high_view_houses():
+    """异步对账浏览量排行榜，已有同类任务排队时不重复添加"""
+    add_task_once(TASK_UPDATE_HIGH_VIEW_HOUSES)
+
+# 异步重新统计房源数量
+def async_update_house_counts():
+    """异步重新统计房源数量，已有同类任务排队时不重复添加"""
+    add_task_once(TASK_UPDATE_HOUSE_COUNTS)
+
+# 异步重建房源搜索索引
+def async_update_search_index():
+    """异步重建房源搜索索引"""
+    add_task(TASK_UPDATE_SEARCH_INDEX)
+
 # 异步更新房源详情
 def async_update_house_detail(house_id):
     """异步更新房源详情"""
     add_task(TASK_UPDATE_HOUSE_DETAIL, house_id=house_id)
 
-# 异步更新房源浏览量
-def async_update_house_page_views(house_id, views):
-    """异步更新房源浏览量"""
-    add_task(TASK_UPDATE_HOUSE_PAGE_VIEWS, house_id=house_id, views=views)
+# 记录房源浏览（写后缓冲）
+def record_house_page_view(house_id):
+    """记录一次房源浏览，增量先写Redis，由后台任务定期批量落库"""
+    if redis_utils.increment_house_page_views(house_id):
+        return
+    # Redis不可用时先记在进程内，最多丢失一个落库周期的浏览量
+    with _page_views_lock:
+        _page_views_buffer[house_id] = _page_views_buffer.get(house_id, 0) + 1
+
+def _drain_page_views_buffer():
+    """取出并清空进程内的浏览量增量"""
+    global _page_views_buffer
+    with _page_views_lock:
+        deltas, _page_views_buffer = _page_views_buffer, {}
+    return deltas
+
+def _restore_page_views_buffer(deltas):
+    """落库失败时把增量放回进程内缓冲"""
+    with _page_views_lock:
+        for house_id, delta in deltas.items():
+            _page_views_buffer[house_id] = _page_views_buffer.get(house_id, 0) + delta
 
-# 定期更新热点房源和高浏览量房源
+# 异步落库房源浏览量
+def async_update_house_page_views():
+    """异步落库房源浏览量"""
+    add_task(TASK_UPDATE_HOUSE_PAGE_VIEWS)
+
+# 定期更新热点房源、高浏览量房源等派生数据
 def schedule_periodic_updates():
-    """定期更新热点房源和高浏览量房源"""
+    """定期更新热点房源、高浏览量房源、相似房源ID池、房源数量、搜索索引、关键词提示索引、区域统计数据、列式快照和单价时间汇总"""
     add_task(TASK_UPDATE_HOT_HOUSES)
     add_task(TASK_UPDATE_HIGH_VIEW_HOUSES)
+    add_task(TASK_UPDATE_SIMILAR_HOUSE_POOLS)
+    add_task(TASK_UPDATE_HOUSE_COUNTS)
+    add_task(TASK_UPDATE_SEARCH_INDEX)
+    add_task(TASK_UPDATE_SUGGEST_INDEX)
+    add_task(TASK_UPDATE_ANALYTICS_CUBE)
+    add_task(TASK_UPDATE_ANALYTICS_SNAPSHOT)
+    add_task(TASK_UPDATE_PRICE_ROLLUPS)
     
     # 每小时调度一次
-    threading.Timer(3600, schedule_periodic_updates).start() 
\ No newline at end of file
+    threading.Timer(3600, schedule_periodic_updates).start()
+
+# 定期落库房源浏览量
+def schedule_page_views_flush():
+    """按 PAGE_VIEWS_FLUSH_INTERVAL 定期落库房源浏览量"""
+    async_update_house_page_views()
+    
+    timer = threading.Timer(PAGE_VIEWS_FLUSH_INTERVAL, schedule_page_views_flush)
+    timer.daemon = True
+    timer.start()
+
+# 定期保存增量更新过的搜索索引
+def schedule_search_index_save():
+    """按 SEARCH_INDEX_SAVE_INTERVAL 定期保存增量更新过的房源搜索索引"""
+    add_task(TASK_SAVE_SEARCH_INDEX)
+    
+    timer = threading.Timer(SEARCH_INDEX_SAVE_INTERVAL, schedule_search_index_save)
+    timer.daemon = True
+    timer.start()
+
+# 房源变更监听
+def _house_field_values(house, old=False):
+    """获取房源跟踪字段的值，old=True 时返回本次修改前的值"""
+    if not old:
+        return {name: getattr(house, name) for name in HOUSE_TRACKED_FIELDS}
+    values = {}
+    state = inspect(house)
+    for name in HOUSE_TRACKED_FIELDS:
+        history = state.attrs[name].history
+        if history.deleted:
+            values[name] = history.deleted[0]
+        elif history.unchanged:
+            values[name] = history.unchanged[0]
+        else:
+            values[name] = None
+    return values
+
+def _collect_house_changes(session, flush_context):
+    """flush后记录本次新增/修改/删除的房源，提交后再统一处理"""
+    changes = session.info.setdefault('house_changes', [])
+    for house in session.new:
+        if isinstance(house, House):
+            changes.append({'action': 'insert', 'id': house.id, 'old': None,
+                            'new': _house_field_values(house)})
+    for house in session.dirty:
+        if isinstance(house, House) and session.is_modified(house, include_collections=False):
+            changes.append({'action': 'update', 'id': house.id, 'old': _house_field_values(house, old=True),
+                            'new': _house_field_values(house)})
+    for house in session.deleted:
+        if isinstance(house, House):
+            changes.append({'action': 'delete', 'id': house.id, 'old': _house_field_values(house, old=True),
+                            'new': None})
+
+def _discard_house_changes(session, *args):
+    """回滚时丢弃记录的房源变更"""
+    session.info.pop('house_changes', None)
+
+def _dispatch_house_changes(session):
+    """事务提交后让房源相关缓存失效"""
+    changes = session.info.pop('house_changes', None)
+    if not changes:
+        return
+    redis_utils.invalidate_house_details(sorted({change['id'] for change in changes}))
+    add_task(TASK_HANDLE_HOUSE_CHANGES, changes=changes)
+
+event.listen(db.session, 'after_flush', _collect_house_changes)
+event.listen(db.session, 'after_commit', _dispatch_house_changes)
+event.listen(db.session, 'after_rollback', _discard_house_changes)
@@ -0,0 +1,95 @@
+import re
+
+# 面积字段的单位写法，例如 "45平方米"、"45㎡"
+AREA_UNITS = ('平方米', '㎡', 'm²')
+
+_NUMBER_RE = re.compile(r'^[0-9]+(\.[0-9]+)?$')
+
+
+def parse_price(value):
+    """把价格字符串（如 "2500"）解析为数值，无法解析时返回 None"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return float(value) if _NUMBER_RE.match(value) else None
+
+
+def parse_area(value):
+    """把面积字符串（如 "45平方米"）解析为平方米数，无法解析时返回 None"""
+    if value is None:
+        return None
+    value = str(value)
+    for unit in AREA_UNITS:
+        value = value.replace(unit, '')
+    value = value.strip()
+    return float(value) if _NUMBER_RE.match(value) else None
+
+
+# 中文数字（个位）到数值的映射，十按位置单独处理
+CN_DIGITS = {
+    '一': 1, '二': 2, '两': 2, '三': 3, '四': 4, '五': 5,
+    '六': 6, '七': 7, '八': 8, '九': 9
+}
+
+# 连续的中文数字：一到九十九（十、十一、二十、二十一），或逐位书写的个位数字
+_CN_NUMBER_RE = re.compile(r'[一二两三四五六七八九]?十[一二两三四五六七八九]?|[一二两三四五六七八九]+')
+
+_ROOMS_RE = re.compile(r'^(\d+)室(?:(\d+)厅)?')
+_ROOMS_QUERY_RE = re.compile(r'^(?:(\d+)室)?(?:(\d+)厅)?(以上|及以上|\+)?$')
+
+
+def _cn_number(match):
+    text = match.group()
+    if '十' not in text:
+        return ''.join(str(CN_DIGITS[char]) for char in text)
+    tens, _, units = text.partition('十')
+    # 十 -> 10，十一 -> 11，二十 -> 20，二十一 -> 21
+    return str(CN_DIGITS.get(tens, 1) * 10 + CN_DIGITS.get(units, 0))
+
+
+def cn_numerals_to_arabic(text):
+    """把文本中的中文数字替换为阿拉伯数字，十按位置解析（"十一室" -> "11室"，"二十" -> "20"）"""
+    return _CN_NUMBER_RE.sub(_cn_number, text)
+
+
+def parse_rooms(value):
+    """把户型字符串（如 "2室1厅"）解析为 (卧室数, 客厅数)，无法解析的部分为 None"""
+    if not value:
+        return None, None
+    match = _ROOMS_RE.match(cn_numerals_to_arabic(str(value).strip()))
+    if not match:
+        return None, None
+    bedrooms, livingrooms = match.groups()
+    return int(bedrooms), int(livingrooms) if livingrooms is not None else None
+
+
+def parse_rooms_query(keyword):
+    """
+    解析户型搜索词，如 "两室"、"2室1厅"、"3室以上"、"一厅"
+
+    返回 {'bedrooms': 卧室数或None, 'livingrooms': 客厅数或None, 'at_least': 是否为"以上"}，
+    无法解析时返回 None
+    """
+    keyword = cn_numerals_to_arabic(keyword.strip().replace(' ', '').replace('居', '室'))
+    match = _ROOMS_QUERY_RE.match(keyword)
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    bedrooms, livingrooms, at_least = match.groups()
+    return {
+        'bedrooms': int(bedrooms) if bedrooms else None,
+        'livingrooms': int(livingrooms) if livingrooms else None,
+        'at_least': bool(at_least),
+    }
+
+
+def canonicalize_keyword(keyword, search_type='region'):
+    """
+    规范化搜索关键词，作为搜索结果缓存的键
+
+    去掉首尾空白、合并连续空白、统一大小写；户型搜索再把中文数字转换为阿拉伯数字，
+    这样 "二室" 和 "2室" 共用同一份缓存（两者的搜索结果本来就相同）
+    """
+    keyword = ' '.join(keyword.split()).casefold()
+    if search_type == 'rooms':
+        keyword = cn_numerals_to_arabic(keyword)
+    return keyword
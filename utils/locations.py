@@ -0,0 +1,42 @@
+import threading
+from models import db, Location
+
+# 进程内缓存：(区域, 板块) -> (区域ID, 板块ID)。位置字典只增不改，只缓存解析成功的结果
+_location_cache = {}
+_location_cache_lock = threading.Lock()
+
+
+def parse_location(location):
+    """把路径中的 "区域-板块" 拆分为 (区域, 板块或None)"""
+    parts = location.split('-')
+    region = parts[0] if len(parts) > 0 else ''
+    block = parts[1] if len(parts) > 1 and parts[1] else None
+    return region, block
+
+
+def resolve_location(region, block=None):
+    """
+    把区域、板块名称解析为位置ID
+
+    返回 (区域ID, 板块ID或None)；名称不在位置字典中时返回 None
+    """
+    if not region:
+        return None
+    key = (region, block or None)
+    with _location_cache_lock:
+        if key in _location_cache:
+            return _location_cache[key]
+
+    region_id = db.session.query(Location.id).filter(Location.parent_id == 0, Location.name == region).scalar()
+    if region_id is None:
+        return None
+    block_id = None
+    if block:
+        block_id = db.session.query(Location.id).filter(
+            Location.parent_id == region_id, Location.name == block).scalar()
+        if block_id is None:
+            return None
+
+    with _location_cache_lock:
+        _location_cache[key] = (region_id, block_id)
+    return region_id, block_id
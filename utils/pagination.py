@@ -0,0 +1,58 @@
+import base64
+import binascii
+
+# 页码翻页最多允许的页数，更深的页只能通过游标翻页，避免OFFSET扫描大量被丢弃的行
+MAX_OFFSET_PAGES = 50
+
+
+def encode_cursor(direction, item_id):
+    """生成翻页游标，direction 为 'next'（向后取ID更大的记录）或 'prev'（向前取ID更小的记录）"""
+    raw = f"{direction[0]}:{item_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析翻页游标，返回 (direction, item_id)，游标无效时返回 None"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        flag, item_id = base64.urlsafe_b64decode(padded).decode().split(':')
+        return {'n': 'next', 'p': 'prev'}[flag], int(item_id)
+    except (ValueError, KeyError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def paginate_by_id(query, id_column, cursor, per_page):
+    """
+    按ID做键集分页
+
+    参数:
+    query: 已经加好筛选条件的查询
+    id_column: 排序用的ID列
+    cursor: 上一页返回的游标，为空时返回第一页
+    per_page: 每页记录数
+
+    返回:
+    (当前页记录, 下一页游标, 上一页游标)，没有下一页/上一页时游标为 None
+    """
+    decoded = decode_cursor(cursor) if cursor else None
+    id_name = id_column.key
+
+    if decoded and decoded[0] == 'prev':
+        # 向前翻页：倒序取比游标小的记录，再翻转回正序
+        items = query.filter(id_column < decoded[1]).order_by(id_column.desc()).limit(per_page + 1).all()
+        has_more = len(items) > per_page
+        items = list(reversed(items[:per_page]))
+        next_cursor = encode_cursor('next', getattr(items[-1], id_name)) if items else None
+        prev_cursor = encode_cursor('prev', getattr(items[0], id_name)) if has_more else None
+    else:
+        after_id = decoded[1] if decoded else None
+        if after_id is not None:
+            query = query.filter(id_column > after_id)
+        # 多取一条判断是否还有下一页
+        items = query.order_by(id_column).limit(per_page + 1).all()
+        has_more = len(items) > per_page
+        items = items[:per_page]
+        next_cursor = encode_cursor('next', getattr(items[-1], id_name)) if has_more else None
+        prev_cursor = encode_cursor('prev', getattr(items[0], id_name)) if after_id is not None and items else None
+
+    return items, next_cursor, prev_cursor
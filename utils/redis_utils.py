@@ -1,9 +1,14 @@
 import redis
 import json
+import hashlib
+import uuid
 from functools import wraps
 import time
 import logging
-from settings import get_redis_master, get_redis_slave
+from settings import get_redis_master, get_redis_slave, reset_redis_clients
+from utils.house_fields import parse_area, parse_price, parse_rooms
+from predict.trend_model import trend_terms, TREND_SUM_FIELDS
+from predict.price_sketch import sketch_bucket
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -13,17 +18,165 @@ logger = logging.getLogger('redis_utils')
 KEY_PREFIX = 'rental_house:'
 # 过期时间（秒）
 EXPIRE_TIME = 3600 * 24  # 1天
+QUERY_COUNT_EXPIRE_TIME = 600  # 查询结果总数只需近似值，10分钟
+SEARCH_RESULT_EXPIRE_TIME = 600  # 搜索结果，10分钟
+
+# 搜索结果超过该数量时不缓存
+SEARCH_RESULT_MAX_IDS = 20000
+# 搜索结果有序集合中的占位成员（分值为0），使空结果也能被缓存
+SEARCH_RESULT_PLACEHOLDER = 'placeholder'
 
 # 键名定义
 HOT_HOUSES_KEY = f"{KEY_PREFIX}hot_houses"              # 热点房源
-HIGH_VIEW_HOUSES_KEY = f"{KEY_PREFIX}high_view_houses"  # 高浏览量房源
+HIGH_VIEW_RANK_KEY = f"{KEY_PREFIX}high_view_rank"      # 浏览量排行榜（有序集合：房源ID -> 浏览量）
+HOUSE_SUMMARY_KEY = f"{KEY_PREFIX}house_summary"        # 排行榜房源摘要（哈希：房源ID -> JSON）
 USER_HISTORY_KEY = f"{KEY_PREFIX}user_history:"         # 用户浏览历史，后面加用户ID
 USER_COLLECTION_KEY = f"{KEY_PREFIX}user_collection:"   # 用户收藏，后面加用户ID
 RECOMMEND_KEY = f"{KEY_PREFIX}recommend:"               # 推荐数据，后面加用户ID
 HOUSE_DETAIL_KEY = f"{KEY_PREFIX}house_detail:"         # 房源详情，后面加房源ID
+HOUSE_DETAIL_VERSION_KEY = f"{KEY_PREFIX}house_detail_version:"  # 房源详情版本号，后面加房源ID
+SIMILAR_POOL_KEY = f"{KEY_PREFIX}similar_pool:"         # 同区域同板块房源ID池（集合），后面加 区域:板块
+HOUSE_COUNT_KEY = f"{KEY_PREFIX}house_count"            # 房源数量（哈希：total / region:区域 / block:区域:板块）
+QUERY_COUNT_KEY = f"{KEY_PREFIX}query_count:"           # 列表/搜索结果总数，后面加查询条件的摘要
+SEARCH_RESULT_KEY = f"{KEY_PREFIX}search_result:"       # 搜索结果ID（有序集合，分值为房源ID），后面加 搜索类型:关键词摘要
+SEARCH_RESULT_KEYS_KEY = f"{KEY_PREFIX}search_result_keys"  # 所有搜索结果缓存键（集合），房源变更时统一失效
+ANALYTICS_LAYOUT_KEY = f"{KEY_PREFIX}analytics_layout:"        # 户型分布（哈希：户型 -> 房源数），后面加 region:区域 或 block:区域:板块
+ANALYTICS_COMMUNITY_KEY = f"{KEY_PREFIX}analytics_community:"  # 小区房源数（有序集合：小区 -> 房源数），后缀同上
+ANALYTICS_PRICE_KEY = f"{KEY_PREFIX}analytics_price:"          # 各户型价格统计（哈希：卧室数:客厅数:count/sum/min/max），后缀同上
+ANALYTICS_TREND_KEY = f"{KEY_PREFIX}analytics_trend:"          # 价格走势的充分统计量（哈希：n/sx/.../min_x/max_x），后缀同上
+ANALYTICS_SKETCH_KEY = f"{KEY_PREFIX}analytics_sketch:"        # 各户型价格分布草图（哈希：卧室数:客厅数:桶号 -> 房源数），后缀同上
+ANALYTICS_LOCATIONS_KEY = f"{KEY_PREFIX}analytics_locations"   # 已物化统计数据的位置（集合）
+PAGE_VIEWS_DELTA_KEY = f"{KEY_PREFIX}page_views_delta"  # 待落库的浏览量增量（哈希：房源ID -> 增量）
+PAGE_VIEWS_FLUSHING_KEY = f"{KEY_PREFIX}page_views_flushing"      # 正在落库的浏览量增量
+PAGE_VIEWS_FLUSHING_ID_KEY = f"{KEY_PREFIX}page_views_flushing_id"  # 正在落库的这批增量的ID，落库时写入MySQL防止重复累加
+PAGE_VIEWS_FLUSH_LOCK_KEY = f"{KEY_PREFIX}page_views_flush_lock"  # 浏览量落库锁，保证多进程只有一个落库者
+TASK_PENDING_KEY = f"{KEY_PREFIX}task_pending:"         # 已排队的重建任务标记，后面加任务类型
+TASK_LOCK_KEY = f"{KEY_PREFIX}task_lock:"               # 跨进程的任务锁（值为持有者的令牌），后面加任务类型
+
+# 浏览量落库锁的过期时间（秒），防止落库进程崩溃后锁无法释放；落库期间每写完一批就续期
+PAGE_VIEWS_FLUSH_LOCK_EXPIRE = 60
+# 重建任务标记的过期时间（秒），任务所在进程崩溃时到期后允许重新排队
+TASK_PENDING_EXPIRE = 600
+
+# 没有正在落库的增量时把当前增量整体换出并生成这批增量的ID，返回正在落库的这批增量的ID（没有增量时为空）；
+# 换出和写入ID在一个脚本中完成，进程崩溃时不会留下没有ID的增量
+SWAP_PAGE_VIEWS_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return false
+    end
+    redis.call('RENAME', KEYS[1], KEYS[2])
+    redis.call('SET', KEYS[3], ARGV[1])
+end
+local flush_id = redis.call('GET', KEYS[3])
+if not flush_id then
+    redis.call('SET', KEYS[3], ARGV[1])
+    flush_id = ARGV[1]
+end
+return flush_id
+"""
+
+# 把一个房源计入或移出某个位置的物化统计数据，返回该位置的价格统计是否需要重新统计（1/0）
+# KEYS: 已物化位置集合, 户型分布, 小区房源数, 户型价格统计, 走势统计量, 价格分布草图
+# ARGV: 位置, delta, 户型, 小区, 户型前缀(卧室数:客厅数), 价格, 价格总和的增量, 草图字段, 面积,
+#       各幂和的增量（顺序同 TREND_SUM_FIELDS）；
+#       不适用的参数为空字符串
+# 计数类字段用 HINCRBY/HINCRBYFLOAT 原子增减；最低/最高值在脚本内读取比较后写入。
+# 删除的价格（面积）恰好是最低或最高值时无法增量维护，返回1由调用方重新统计
+UPDATE_ANALYTICS_SCRIPT = """
+local delta = tonumber(ARGV[2])
+local stale = 0
+redis.call('SADD', KEYS[1], ARGV[1])
+if ARGV[3] ~= '' then
+    redis.call('HINCRBY', KEYS[2], ARGV[3], delta)
+end
+if ARGV[4] ~= '' then
+    redis.call('ZINCRBY', KEYS[3], delta, ARGV[4])
+    if delta < 0 then
+        redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', 0)
+    end
+end
+
+local function update_range(key, min_field, max_field, value)
+    local low = redis.call('HGET', key, min_field)
+    local high = redis.call('HGET', key, max_field)
+    if delta > 0 then
+        if not low or tonumber(value) < tonumber(low) then
+            redis.call('HSET', key, min_field, value)
+        end
+        if not high or tonumber(value) > tonumber(high) then
+            redis.call('HSET', key, max_field, value)
+        end
+    elseif not low or not high or tonumber(value) <= tonumber(low) or tonumber(value) >= tonumber(high) then
+        stale = 1
+    end
+end
+
+if ARGV[5] ~= '' then
+    local prefix = ARGV[5]
+    if redis.call('HINCRBY', KEYS[4], prefix .. ':count', delta) <= 0 then
+        redis.call('HDEL', KEYS[4], prefix .. ':count', prefix .. ':sum', prefix .. ':min', prefix .. ':max')
+    else
+        redis.call('HINCRBYFLOAT', KEYS[4], prefix .. ':sum', ARGV[7])
+        update_range(KEYS[4], prefix .. ':min', prefix .. ':max', ARGV[6])
+    end
+end
+if ARGV[8] ~= '' then
+    if redis.call('HINCRBY', KEYS[6], ARGV[8], delta) <= 0 then
+        redis.call('HDEL', KEYS[6], ARGV[8])
+    end
+end
+if ARGV[9] ~= '' then
+    if tonumber(redis.call('HINCRBYFLOAT', KEYS[5], 'n', ARGV[10])) <= 0 then
+        redis.call('DEL', KEYS[5])
+    else
+        local names = {'sx', 'sx2', 'sx3', 'sx4', 'sy', 'sxy', 'sx2y'}
+        for i, name in ipairs(names) do
+            redis.call('HINCRBYFLOAT', KEYS[5], name, ARGV[10 + i])
+        end
+        update_range(KEYS[5], 'min_x', 'max_x', ARGV[9])
+    end
+end
+return stale
+"""
+
+# 只有锁的值仍是自己的令牌时才续期
+REFRESH_FLUSH_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# 只有锁的值仍是自己的令牌时才删除正在落库的增量及其ID（成功时）并释放锁，
+# 避免锁过期后误删其他进程的锁和它刚换出的增量
+RELEASE_FLUSH_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+if ARGV[2] == '1' then
+    redis.call('DEL', KEYS[2], KEYS[3])
+end
+redis.call('DEL', KEYS[1])
+return 1
+"""
+
+# 只有锁的值仍是自己的令牌时才释放任务锁
+RELEASE_TASK_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
 
 def redis_operation(read_only=False):
-    """Redis操作装饰器，处理连接和异常"""
+    """
+    Redis操作装饰器，处理连接和异常
+
+    主从节点的客户端由 settings 在进程内共享，连接取自连接池；
+    不再每次操作前 PING，空闲连接由连接池按 REDIS_HEALTH_CHECK_INTERVAL 检查。
+    出现 ReadOnlyError（主从已切换）或连接错误时重建连接池，写操作被只读节点拒绝时在新的主节点上重试一次
+    """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
@@ -37,32 +190,26 @@ def redis_operation(read_only=False):
                     redis_conn = get_redis_master()
                     logger.debug(f"使用Redis主节点: {func.__name__}")
                 
-                # 测试连接
-                try:
-                    redis_conn.ping()
-                except Exception as e:
-                    logger.error(f"Redis连接测试失败: {str(e)}")
-                    return None
-                
                 result = func(redis_conn, *args, **kwargs)
                 end_time = time.time()
                 logger.debug(f"Redis操作成功: {func.__name__} - 耗时: {(end_time - start_time)*1000:.2f}ms")
                 return result
             except redis.RedisError as e:
                 logger.error(f"Redis操作错误: {func.__name__} - {str(e)}")
+                if isinstance(e, (redis.ReadOnlyError, redis.ConnectionError)) and reset_redis_clients():
+                    logger.warning(f"Redis节点可能已主从切换，已重建连接池: {func.__name__}")
+                # 写操作被只读节点拒绝时没有执行，可以在新的主节点上安全重试
+                if isinstance(e, redis.ReadOnlyError) and not read_only:
+                    try:
+                        return func(get_redis_master(), *args, **kwargs)
+                    except Exception as e2:
+                        logger.error(f"Redis主节点重试也失败: {func.__name__} - {str(e2)}")
+                        return None
                 # 如果是从节点操作失败，尝试使用主节点
                 if read_only:
                     try:
                         logger.warning(f"从节点操作失败，尝试使用主节点: {func.__name__}")
-                        redis_conn = get_redis_master()
-                        # 测试连接
-                        try:
-                            redis_conn.ping()
-                        except Exception as e2:
-                            logger.error(f"Redis主节点连接测试失败: {str(e2)}")
-                            return None
-                        
-                        result = func(redis_conn, *args, **kwargs)
+                        result = func(get_redis_master(), *args, **kwargs)
                         end_time = time.time()
                         logger.debug(f"Redis主节点操作成功: {func.__name__} - 耗时: {(end_time - start_time)*1000:.2f}ms")
                         return result
@@ -100,28 +247,97 @@ def get_hot_houses(redis_conn):
     return None
 
 # 高浏览量房源相关操作
+HOUSE_SUMMARY_FIELDS = ('title', 'price', 'area', 'rooms', 'region', 'block', 'address')
+
+def _house_summary(house):
+    return {'id': house.id, **{name: getattr(house, name) for name in HOUSE_SUMMARY_FIELDS}}
+
 @redis_operation(read_only=False)
-def cache_high_view_houses(redis_conn, houses, expire=EXPIRE_TIME):
-    """缓存高浏览量房源"""
-    house_list = [{'id': house.id, 'title': house.title, 'price': house.price, 
-                  'area': house.area, 'rooms': house.rooms, 'region': house.region,
-                  'block': house.block, 'address': house.address, 'page_views': house.page_views} 
-                 for house in houses]
-    redis_conn.set(HIGH_VIEW_HOUSES_KEY, json.dumps(house_list))
-    redis_conn.expire(HIGH_VIEW_HOUSES_KEY, expire)
-    logger.info(f"已缓存 {len(house_list)} 个高浏览量房源, 过期时间: {expire}秒")
+def cache_high_view_rank(redis_conn, scores, houses):
+    """
+    用MySQL中的浏览量重建浏览量排行榜
+
+    scores: {房源ID: 浏览量}，houses: 需要缓存摘要的排名靠前的房源
+    """
+    tmp_key = f"{HIGH_VIEW_RANK_KEY}:tmp"
+    redis_conn.delete(tmp_key)
+    items = list(scores.items())
+    for i in range(0, len(items), 5000):
+        redis_conn.zadd(tmp_key, dict(items[i:i + 5000]))
+    pipe = redis_conn.pipeline()
+    if items:
+        pipe.rename(tmp_key, HIGH_VIEW_RANK_KEY)
+    pipe.delete(HOUSE_SUMMARY_KEY)
+    if houses:
+        pipe.hset(HOUSE_SUMMARY_KEY, mapping={house.id: json.dumps(_house_summary(house)) for house in houses})
+    pipe.execute()
+    logger.info(f"已重建浏览量排行榜: {len(items)} 个房源, 缓存摘要 {len(houses)} 个")
+    return True
+
+@redis_operation(read_only=False)
+def cache_high_view_summaries(redis_conn, houses):
+    """补充缓存排行榜房源摘要"""
+    if houses:
+        redis_conn.hset(HOUSE_SUMMARY_KEY, mapping={house.id: json.dumps(_house_summary(house)) for house in houses})
     return True
 
 @redis_operation(read_only=True)
-def get_high_view_houses(redis_conn):
-    """获取高浏览量房源"""
-    data = redis_conn.get(HIGH_VIEW_HOUSES_KEY)
-    if data:
-        houses = json.loads(data)
-        logger.debug(f"从Redis获取高浏览量房源: {len(houses)}个")
-        return houses
-    logger.debug("Redis中没有高浏览量房源数据")
-    return None
+def get_high_view_houses(redis_conn, count=10, load_houses=None):
+    """
+    从排行榜获取实时的高浏览量房源，排行榜不存在时返回None
+
+    多取一倍的候选；还没有摘要的房源用 load_houses(房源ID列表) 从MySQL读取并补充缓存，
+    不传 load_houses 或房源已删除时跳过
+    """
+    pipe = redis_conn.pipeline(transaction=False)
+    pipe.exists(HIGH_VIEW_RANK_KEY)
+    pipe.zrevrange(HIGH_VIEW_RANK_KEY, 0, count * 2 - 1, withscores=True)
+    exists, ranked = pipe.execute()
+    if not exists:
+        logger.debug("Redis中没有浏览量排行榜")
+        return None
+    summaries = redis_conn.hmget(HOUSE_SUMMARY_KEY, [house_id for house_id, _ in ranked]) if ranked else []
+    missing = [int(house_id) for (house_id, _), summary in zip(ranked, summaries) if summary is None]
+    if missing and load_houses is not None:
+        loaded = {str(house.id): house for house in load_houses(missing)}
+        cache_high_view_summaries(list(loaded.values()))
+        summaries = [summary if summary is not None or house_id not in loaded
+                     else json.dumps(_house_summary(loaded[house_id]))
+                     for (house_id, _), summary in zip(ranked, summaries)]
+    houses = []
+    for (house_id, score), summary in zip(ranked, summaries):
+        if summary is None:
+            continue
+        house = json.loads(summary)
+        house['page_views'] = int(score)
+        houses.append(house)
+        if len(houses) == count:
+            break
+    logger.debug(f"从Redis获取高浏览量房源: {len(houses)}个")
+    return houses
+
+@redis_operation(read_only=False)
+def update_high_view_rank(redis_conn, changes):
+    """根据房源变更维护排行榜：新房源加入、删除的房源移出，已缓存摘要的房源用修改后的值刷新摘要"""
+    if not redis_conn.exists(HIGH_VIEW_RANK_KEY):
+        return True
+    updated = [change for change in changes if change['action'] == 'update']
+    cached = redis_conn.hmget(HOUSE_SUMMARY_KEY, [change['id'] for change in updated]) if updated else []
+    pipe = redis_conn.pipeline()
+    for change in changes:
+        if change['action'] == 'insert':
+            pipe.zadd(HIGH_VIEW_RANK_KEY, {change['id']: 0}, nx=True)
+        elif change['action'] == 'delete':
+            pipe.zrem(HIGH_VIEW_RANK_KEY, change['id'])
+            pipe.hdel(HOUSE_SUMMARY_KEY, change['id'])
+    # 只刷新已有的摘要，没有摘要的房源进入前列时由 get_high_view_houses 补充
+    deleted = {change['id'] for change in changes if change['action'] == 'delete'}
+    for change, summary in zip(updated, cached):
+        if summary is not None and change['id'] not in deleted:
+            values = {'id': change['id'], **{name: change['new'][name] for name in HOUSE_SUMMARY_FIELDS}}
+            pipe.hset(HOUSE_SUMMARY_KEY, change['id'], json.dumps(values))
+    pipe.execute()
+    return True
 
 # 用户浏览历史相关操作
 @redis_operation(read_only=False)
@@ -269,11 +485,9 @@ def update_user_recommend(redis_conn, user_id, house_id, title, address, block,
     return True
 
 # 房源详情相关操作
-@redis_operation(read_only=False)
-def cache_house_detail(redis_conn, house, expire=EXPIRE_TIME):
-    """缓存房源详情"""
-    key = f"{HOUSE_DETAIL_KEY}{house.id}"
-    house_data = {
+def house_detail_dict(house):
+    """把房源对象转换为详情缓存使用的字典"""
+    return {
         'id': house.id,
         'title': house.title,
         'price': house.price,
@@ -295,47 +509,563 @@ def cache_house_detail(redis_conn, house, expire=EXPIRE_TIME):
         'phone_num': house.phone_num,
         'house_num': house.house_num
     }
-    redis_conn.set(key, json.dumps(house_data))
-    redis_conn.expire(key, expire)
-    logger.info(f"已缓存房源详情: {house.id}, 过期时间: {expire}秒")
+
+@redis_operation(read_only=False)
+def get_house_detail_version(redis_conn, house_id):
+    """获取房源详情的当前版本号（从未修改过的房源为0），从主节点读取，不受复制延迟影响"""
+    version = redis_conn.get(f"{HOUSE_DETAIL_VERSION_KEY}{house_id}")
+    return int(version) if version else 0
+
+@redis_operation(read_only=False)
+def cache_house_detail(redis_conn, house, version=None, expire=EXPIRE_TIME):
+    """
+    缓存房源详情
+
+    version 应在读取MySQL之前通过 get_house_detail_version 获取，
+    这样读取期间发生的修改会使本次写入的缓存直接失效，不会把旧数据写回缓存。
+    """
+    key = f"{HOUSE_DETAIL_KEY}{house.id}"
+    if version is None:
+        version = redis_conn.get(f"{HOUSE_DETAIL_VERSION_KEY}{house.id}")
+        version = int(version) if version else 0
+    house_data = house_detail_dict(house)
+    house_data['_version'] = version
+    redis_conn.set(key, json.dumps(house_data), ex=expire)
+    logger.info(f"已缓存房源详情: {house.id}, 版本: {version}, 过期时间: {expire}秒")
     return True
 
 @redis_operation(read_only=True)
 def get_house_detail(redis_conn, house_id):
-    """获取房源详情"""
+    """
+    获取房源详情（缓存版本与当前版本不一致时视为未命中）
+
+    详情从从节点读取，版本号从主节点读取：从节点复制延迟时可能还留着修改前的详情和版本号，
+    与主节点上已递增的版本号比较即可发现
+    """
     key = f"{HOUSE_DETAIL_KEY}{house_id}"
     data = redis_conn.get(key)
     if data:
         house_data = json.loads(data)
-        logger.debug(f"从Redis获取房源详情: {house_id}")
-        return house_data
+        version = get_house_detail_version(house_id)
+        if version is not None and house_data.pop('_version', 0) == version:
+            logger.debug(f"从Redis获取房源详情: {house_id}")
+            return house_data
+        logger.debug(f"Redis中房源 {house_id} 的详情已过期")
+        return None
     logger.debug(f"Redis中没有房源 {house_id} 的详情数据")
     return None
 
 @redis_operation(read_only=False)
-def increment_house_page_views(redis_conn, house_id):
-    """增加房源浏览量"""
-    key = f"{HOUSE_DETAIL_KEY}{house_id}"
-    data = redis_conn.get(key)
-    if data:
-        house_data = json.loads(data)
-        house_data['page_views'] += 1
-        redis_conn.set(key, json.dumps(house_data))
-        logger.info(f"已增加房源 {house_id} 的浏览量, 当前浏览量: {house_data['page_views']}")
+def invalidate_house_details(redis_conn, house_ids):
+    """房源修改后递增版本号并删除详情缓存"""
+    if not house_ids:
+        return True
+    pipe = redis_conn.pipeline(transaction=False)
+    for house_id in house_ids:
+        pipe.incr(f"{HOUSE_DETAIL_VERSION_KEY}{house_id}")
+        pipe.delete(f"{HOUSE_DETAIL_KEY}{house_id}")
+    pipe.execute()
+    logger.info(f"已失效 {len(house_ids)} 个房源的详情缓存")
+    return True
+
+@redis_operation(read_only=False)
+def increment_house_page_views(redis_conn, house_id, amount=1):
+    """增加房源浏览量（累加到增量哈希由后台任务批量落库，同时实时更新排行榜）"""
+    pipe = redis_conn.pipeline(transaction=False)
+    pipe.hincrby(PAGE_VIEWS_DELTA_KEY, str(house_id), amount)
+    # XX: 排行榜尚未建立时不创建只有部分房源的排行榜
+    pipe.zadd(HIGH_VIEW_RANK_KEY, {str(house_id): amount}, xx=True, incr=True)
+    pipe.execute()
+    logger.debug(f"已累加房源 {house_id} 的浏览量增量: {amount}")
+    return True
+
+@redis_operation(read_only=True)
+def get_pending_house_page_views(redis_conn):
+    """获取尚未落库的浏览量增量"""
+    pending = {}
+    for key in (PAGE_VIEWS_FLUSHING_KEY, PAGE_VIEWS_DELTA_KEY):
+        for house_id, delta in redis_conn.hgetall(key).items():
+            pending[int(house_id)] = pending.get(int(house_id), 0) + int(delta)
+    return pending
+
+@redis_operation(read_only=False)
+def pop_house_page_views_deltas(redis_conn):
+    """
+    取出待落库的浏览量增量
+
+    返回 (锁令牌, 这批增量的ID, {房源ID: 增量})，Redis中没有增量时为 (锁令牌, None, {})；
+    其他进程正在落库或Redis不可用时返回 None。
+    拿到令牌后落库锁一直保留到调用 finish_house_page_views_flush(令牌, ...)，落库期间用
+    refresh_house_page_views_flush_lock(令牌) 续期。取出的增量在 finish_house_page_views_flush(令牌, True)
+    之前一直保留在Redis中，落库失败或进程崩溃时会在下一轮以同一个ID重新落库；
+    调用方把ID与增量在同一个事务中写入MySQL，已经写入过的ID不再重复累加。
+    """
+    token = uuid.uuid4().hex
+    if not redis_conn.set(PAGE_VIEWS_FLUSH_LOCK_KEY, token, nx=True, ex=PAGE_VIEWS_FLUSH_LOCK_EXPIRE):
+        logger.debug("其他进程正在落库浏览量增量")
+        return None
+
+    # 上一轮落库未完成时先处理遗留的增量（沿用它的ID），否则把当前增量整体换出
+    flush_id = redis_conn.eval(SWAP_PAGE_VIEWS_SCRIPT, 3, PAGE_VIEWS_DELTA_KEY, PAGE_VIEWS_FLUSHING_KEY,
+                               PAGE_VIEWS_FLUSHING_ID_KEY, uuid.uuid4().hex)
+    if flush_id is None:
+        # 没有新的增量，锁仍由调用方在 finish 时释放
+        return token, None, {}
+
+    data = redis_conn.hgetall(PAGE_VIEWS_FLUSHING_KEY)
+    deltas = {int(house_id): int(delta) for house_id, delta in data.items() if int(delta)}
+    logger.debug(f"取出 {len(deltas)} 个房源的浏览量增量: {flush_id}")
+    return token, flush_id, deltas
+
+@redis_operation(read_only=False)
+def refresh_house_page_views_flush_lock(redis_conn, token):
+    """落库耗时较长时为浏览量落库锁续期，锁已不属于本次落库时返回 False"""
+    return bool(redis_conn.eval(REFRESH_FLUSH_LOCK_SCRIPT, 1, PAGE_VIEWS_FLUSH_LOCK_KEY,
+                                token, PAGE_VIEWS_FLUSH_LOCK_EXPIRE))
+
+@redis_operation(read_only=False)
+def finish_house_page_views_flush(redis_conn, token, success):
+    """结束一轮浏览量落库：成功时删除已落库的增量，失败时保留以便重试；锁已不属于本次落库时什么都不做"""
+    released = redis_conn.eval(RELEASE_FLUSH_LOCK_SCRIPT, 3, PAGE_VIEWS_FLUSH_LOCK_KEY, PAGE_VIEWS_FLUSHING_KEY,
+                               PAGE_VIEWS_FLUSHING_ID_KEY, token, '1' if success else '0')
+    if not released:
+        logger.warning("浏览量落库锁已过期或被其他进程持有，保留Redis中的增量")
+    return bool(released)
+
+# 相似房源ID池相关操作
+def _similar_pool_key(region, block):
+    return f"{SIMILAR_POOL_KEY}{region}:{block}"
+
+@redis_operation(read_only=False)
+def cache_similar_house_pools(redis_conn, pools, expire=EXPIRE_TIME):
+    """
+    缓存相似房源ID池
+
+    pools: {(区域, 板块): [房源ID, ...]}，每个池先写临时键再RENAME，读者不会看到半成品
+    """
+    pipe = redis_conn.pipeline(transaction=False)
+    for i, ((region, block), house_ids) in enumerate(pools.items(), 1):
+        key = _similar_pool_key(region, block)
+        tmp_key = f"{key}:tmp"
+        pipe.delete(tmp_key)
+        pipe.sadd(tmp_key, *house_ids)
+        pipe.rename(tmp_key, key)
+        pipe.expire(key, expire)
+        # 分批提交，避免单个管道过大
+        if i % 200 == 0:
+            pipe.execute()
+    pipe.execute()
+    logger.info(f"已缓存 {len(pools)} 个相似房源ID池, 过期时间: {expire}秒")
     return True
 
+@redis_operation(read_only=True)
+def get_similar_house_ids(redis_conn, region, block, exclude_id, count=4):
+    """从ID池随机抽取同区域同板块的房源ID，ID池不存在时返回None"""
+    key = _similar_pool_key(region, block)
+    pipe = redis_conn.pipeline(transaction=False)
+    pipe.exists(key)
+    # 多取一个，排除当前房源后仍够数
+    pipe.srandmember(key, count + 1)
+    exists, house_ids = pipe.execute()
+    if not exists:
+        logger.debug(f"Redis中没有 {region}-{block} 的相似房源ID池")
+        return None
+    house_ids = [int(house_id) for house_id in house_ids if int(house_id) != exclude_id]
+    return house_ids[:count]
+
+@redis_operation(read_only=False)
+def update_similar_house_pools(redis_conn, changes):
+    """根据房源变更增量维护相似房源ID池，只修改已存在的池，缺失的池等待定期重建"""
+    for change in changes:
+        old, new = change['old'], change['new']
+        old_key = _similar_pool_key(old['region'], old['block']) if old else None
+        new_key = _similar_pool_key(new['region'], new['block']) if new else None
+        if old_key == new_key:
+            continue
+        if old_key:
+            redis_conn.srem(old_key, change['id'])
+        if new_key and redis_conn.exists(new_key):
+            redis_conn.sadd(new_key, change['id'])
+    return True
+
+# 房源数量相关操作
+def _house_count_fields(region, block):
+    return ['total', f"region:{region}", f"block:{region}:{block}"]
+
+@redis_operation(read_only=False)
+def cache_house_counts(redis_conn, block_counts):
+    """
+    缓存房源总数及各区域、板块的房源数量
+
+    block_counts: {(区域, 板块): 数量}
+    """
+    counts = {'total': 0}
+    for (region, block), count in block_counts.items():
+        total_field, region_field, block_field = _house_count_fields(region, block)
+        counts[total_field] += count
+        counts[region_field] = counts.get(region_field, 0) + count
+        counts[block_field] = count
+    tmp_key = f"{HOUSE_COUNT_KEY}:tmp"
+    pipe = redis_conn.pipeline()
+    pipe.delete(tmp_key)
+    pipe.hset(tmp_key, mapping=counts)
+    pipe.rename(tmp_key, HOUSE_COUNT_KEY)
+    pipe.execute()
+    logger.info(f"已缓存房源数量: 共 {counts['total']} 个房源, {len(block_counts)} 个板块")
+    return True
+
+@redis_operation(read_only=True)
+def get_house_count(redis_conn, region=None, block=None):
+    """获取房源数量，不传区域时返回总数；没有缓存时返回None"""
+    if region is None:
+        field = 'total'
+    elif block is None:
+        field = f"region:{region}"
+    else:
+        field = f"block:{region}:{block}"
+    pipe = redis_conn.pipeline(transaction=False)
+    pipe.exists(HOUSE_COUNT_KEY)
+    pipe.hget(HOUSE_COUNT_KEY, field)
+    exists, count = pipe.execute()
+    if not exists:
+        logger.debug("Redis中没有房源数量数据")
+        return None
+    return int(count) if count else 0
+
+@redis_operation(read_only=False)
+def update_house_counts(redis_conn, changes):
+    """根据房源变更增量维护房源数量，数量缓存不存在时等待定期重建"""
+    if not redis_conn.exists(HOUSE_COUNT_KEY):
+        return True
+    pipe = redis_conn.pipeline()
+    for change in changes:
+        old, new = change['old'], change['new']
+        old_fields = _house_count_fields(old['region'], old['block']) if old else []
+        new_fields = _house_count_fields(new['region'], new['block']) if new else []
+        for field in old_fields:
+            if field not in new_fields:
+                pipe.hincrby(HOUSE_COUNT_KEY, field, -1)
+        for field in new_fields:
+            if field not in old_fields:
+                pipe.hincrby(HOUSE_COUNT_KEY, field, 1)
+    pipe.execute()
+    return True
+
+# 查询结果总数相关操作
+def _query_count_key(*params):
+    digest = hashlib.md5(json.dumps(params, ensure_ascii=False).encode('utf-8')).hexdigest()
+    return f"{QUERY_COUNT_KEY}{digest}"
+
+@redis_operation(read_only=False)
+def cache_query_count(redis_conn, params, count, expire=QUERY_COUNT_EXPIRE_TIME):
+    """缓存列表/搜索的结果总数，params 为能唯一确定查询的条件元组"""
+    redis_conn.set(_query_count_key(*params), count, ex=expire)
+    return True
+
+@redis_operation(read_only=True)
+def get_query_count(redis_conn, params):
+    """获取缓存的列表/搜索结果总数"""
+    count = redis_conn.get(_query_count_key(*params))
+    return int(count) if count is not None else None
+
+# 搜索结果相关操作
+def _search_result_key(search_type, keyword):
+    digest = hashlib.md5(keyword.encode('utf-8')).hexdigest()
+    return f"{SEARCH_RESULT_KEY}{search_type}:{digest}"
+
+@redis_operation(read_only=False)
+def cache_search_result(redis_conn, search_type, keyword, house_ids, expire=SEARCH_RESULT_EXPIRE_TIME):
+    """缓存搜索结果的房源ID，keyword 应为规范化后的关键词"""
+    if len(house_ids) > SEARCH_RESULT_MAX_IDS:
+        logger.debug(f"搜索结果过多，不缓存: {search_type} {keyword} {len(house_ids)}条")
+        return False
+    key = _search_result_key(search_type, keyword)
+    members = {SEARCH_RESULT_PLACEHOLDER: 0}
+    members.update({house_id: house_id for house_id in house_ids})
+    pipe = redis_conn.pipeline()
+    pipe.delete(key)
+    pipe.zadd(key, members)
+    pipe.expire(key, expire)
+    pipe.sadd(SEARCH_RESULT_KEYS_KEY, key)
+    pipe.expire(SEARCH_RESULT_KEYS_KEY, expire)
+    pipe.execute()
+    logger.info(f"已缓存搜索结果: {search_type} {keyword} {len(house_ids)}条, 过期时间: {expire}秒")
+    return True
+
+@redis_operation(read_only=True)
+def get_search_result_count(redis_conn, search_type, keyword):
+    """获取缓存的搜索结果数量，没有缓存时返回None"""
+    key = _search_result_key(search_type, keyword)
+    pipe = redis_conn.pipeline(transaction=False)
+    pipe.exists(key)
+    pipe.zcount(key, 1, '+inf')
+    exists, count = pipe.execute()
+    return count if exists else None
+
+@redis_operation(read_only=True)
+def get_search_result_ids(redis_conn, search_type, keyword, page, per_page, after_id=None, before_id=None):
+    """
+    按房源ID升序取缓存搜索结果的一页，参数和返回值与 search_index.paginate_ids 相同
+
+    返回 (当前页ID列表, 是否还有更多)
+    """
+    key = _search_result_key(search_type, keyword)
+    if before_id is not None:
+        ids = redis_conn.zrevrangebyscore(key, f"({before_id}", 1, start=0, num=per_page + 1)
+        ids = [int(house_id) for house_id in ids]
+        return sorted(ids[:per_page]), len(ids) > per_page
+    if after_id is not None:
+        ids = redis_conn.zrangebyscore(key, f"({after_id}", '+inf', start=0, num=per_page + 1)
+    else:
+        ids = redis_conn.zrangebyscore(key, 1, '+inf', start=(page - 1) * per_page, num=per_page + 1)
+    ids = [int(house_id) for house_id in ids]
+    return ids[:per_page], len(ids) > per_page
+
+@redis_operation(read_only=False)
+def invalidate_search_results(redis_conn):
+    """房源变更后删除所有缓存的搜索结果"""
+    keys = redis_conn.smembers(SEARCH_RESULT_KEYS_KEY)
+    if keys:
+        redis_conn.delete(*keys)
+    redis_conn.delete(SEARCH_RESULT_KEYS_KEY)
+    logger.info(f"已失效 {len(keys)} 条搜索结果缓存")
+    return True
+
+# 区域/板块统计数据相关操作
+def _analytics_location(region, block=None):
+    return f"block:{region}:{block}" if block else f"region:{region}"
+
+def _analytics_keys(location):
+    return (f"{ANALYTICS_LAYOUT_KEY}{location}", f"{ANALYTICS_COMMUNITY_KEY}{location}",
+            f"{ANALYTICS_PRICE_KEY}{location}", f"{ANALYTICS_TREND_KEY}{location}",
+            f"{ANALYTICS_SKETCH_KEY}{location}")
+
+def _price_stats_fields(prices):
+    fields = {}
+    for (bedrooms, livingrooms), stats in prices.items():
+        for name in ('count', 'sum', 'min', 'max'):
+            fields[f"{bedrooms}:{livingrooms}:{name}"] = stats[name]
+    return fields
+
+def _price_sketch_fields(sketches):
+    fields = {}
+    for (bedrooms, livingrooms), sketch in sketches.items():
+        for bucket, count in sketch.items():
+            fields[f"{bedrooms}:{livingrooms}:{bucket}"] = count
+    return fields
+
+def _write_analytics_stats(pipe, price_key, trend_key, prices, trend):
+    pipe.delete(price_key, trend_key)
+    if prices:
+        pipe.hset(price_key, mapping=_price_stats_fields(prices))
+    if trend:
+        pipe.hset(trend_key, mapping=trend)
+
+@redis_operation(read_only=False)
+def cache_analytics_cube(redis_conn, cube):
+    """
+    物化各区域、板块的户型分布、小区房源数、各户型价格统计和价格走势的充分统计量
+
+    cube: {(区域, 板块或None): {'layouts': {户型: 房源数}, 'communities': {小区: 房源数},
+                               'prices': {(卧室数, 客厅数): {'count', 'sum', 'min', 'max'}},
+                               'trend': 充分统计量字典（见 predict.trend_model）或None,
+                               'sketches': {(卧室数, 客厅数): 价格分布草图（见 predict.price_sketch）}}}
+    """
+    locations = {_analytics_location(region, block): data for (region, block), data in cube.items()}
+    stale = redis_conn.smembers(ANALYTICS_LOCATIONS_KEY) - set(locations)
+    for location, data in locations.items():
+        layout_key, community_key, price_key, trend_key, sketch_key = _analytics_keys(location)
+        # 每个位置在一个事务里整体替换，读取方不会看到写了一半的数据
+        pipe = redis_conn.pipeline()
+        pipe.delete(layout_key, community_key, sketch_key)
+        if data['layouts']:
+            pipe.hset(layout_key, mapping=data['layouts'])
+        if data['communities']:
+            pipe.zadd(community_key, data['communities'])
+        _write_analytics_stats(pipe, price_key, trend_key, data['prices'], data.get('trend'))
+        if data.get('sketches'):
+            pipe.hset(sketch_key, mapping=_price_sketch_fields(data['sketches']))
+        pipe.sadd(ANALYTICS_LOCATIONS_KEY, location)
+        pipe.execute()
+    if stale:
+        pipe = redis_conn.pipeline()
+        for location in stale:
+            pipe.delete(*_analytics_keys(location))
+        pipe.srem(ANALYTICS_LOCATIONS_KEY, *stale)
+        pipe.execute()
+    logger.info(f"已物化统计数据: {len(locations)} 个区域/板块, 删除 {len(stale)} 个过期位置")
+    return True
+
+@redis_operation(read_only=False)
+def cache_analytics_stats(redis_conn, region, block, prices, trend):
+    """重写某个区域/板块的各户型价格统计和价格走势统计量，格式同 cache_analytics_cube"""
+    location = _analytics_location(region, block)
+    if not redis_conn.sismember(ANALYTICS_LOCATIONS_KEY, location):
+        return False
+    _, _, price_key, trend_key, _ = _analytics_keys(location)
+    pipe = redis_conn.pipeline()
+    _write_analytics_stats(pipe, price_key, trend_key, prices, trend)
+    pipe.execute()
+    return True
+
+@redis_operation(read_only=True)
+def get_analytics_cube(redis_conn, region, block=None, community_limit=20):
+    """
+    读取某个区域/板块物化的统计数据，没有物化时返回None
+
+    返回 {'layouts': {户型: 房源数}, 'communities': [(小区, 房源数), ...],
+          'prices': {(卧室数, 客厅数): {'count', 'sum', 'min', 'max'}},
+          'trend': 价格走势的充分统计量或None,
+          'sketches': {(卧室数, 客厅数): 价格分布草图}}
+    """
+    location = _analytics_location(region, block)
+    layout_key, community_key, price_key, trend_key, sketch_key = _analytics_keys(location)
+    pipe = redis_conn.pipeline(transaction=False)
+    pipe.sismember(ANALYTICS_LOCATIONS_KEY, location)
+    pipe.hgetall(layout_key)
+    pipe.zrevrange(community_key, 0, community_limit - 1, withscores=True)
+    pipe.hgetall(price_key)
+    pipe.hgetall(trend_key)
+    pipe.hgetall(sketch_key)
+    materialized, layouts, communities, price_fields, trend, sketch_fields = pipe.execute()
+    if not materialized:
+        logger.debug(f"没有物化的统计数据: {location}")
+        return None
+    
+    sketches = {}
+    for field, count in sketch_fields.items():
+        bedrooms, livingrooms, bucket = field.split(':')
+        if int(count) > 0:
+            sketches.setdefault((int(bedrooms), int(livingrooms)), {})[int(bucket)] = int(count)
+    return {
+        'layouts': {rooms: int(count) for rooms, count in layouts.items() if int(count) > 0},
+        'communities': [(address, int(count)) for address, count in communities if count > 0],
+        'prices': _parse_price_stats(price_fields),
+        'trend': _parse_trend_stats(trend),
+        'sketches': sketches,
+    }
+
+@redis_operation(read_only=True)
+def get_analytics_stats(redis_conn, locations, with_prices=True):
+    """
+    在一次往返中读取多个区域/板块物化的价格走势统计量（和各户型价格统计）
+
+    locations: [(区域, 板块或None), ...]
+    返回 {(区域, 板块或None): {'trend': 充分统计量或None, 'prices': {(卧室数, 客厅数): {...}}}}，
+    没有物化的位置不在结果中；with_prices=False 时不读取户型价格统计，'prices' 为空
+    """
+    locations = list(locations)
+    pipe = redis_conn.pipeline(transaction=False)
+    for region, block in locations:
+        location = _analytics_location(region, block)
+        _, _, price_key, trend_key, _ = _analytics_keys(location)
+        pipe.sismember(ANALYTICS_LOCATIONS_KEY, location)
+        pipe.hgetall(trend_key)
+        if with_prices:
+            pipe.hgetall(price_key)
+    values = iter(pipe.execute())
+    stats = {}
+    for location in locations:
+        materialized, trend = next(values), next(values)
+        price_fields = next(values) if with_prices else {}
+        if materialized:
+            stats[location] = {'trend': _parse_trend_stats(trend), 'prices': _parse_price_stats(price_fields)}
+    return stats
+
+def _parse_price_stats(price_fields):
+    """各户型价格统计哈希转换为 {(卧室数, 客厅数): {'count', 'sum', 'min', 'max'}}"""
+    prices = {}
+    for field, value in price_fields.items():
+        bedrooms, livingrooms, name = field.split(':')
+        stats = prices.setdefault((int(bedrooms), int(livingrooms)), {})
+        stats[name] = int(value) if name == 'count' else float(value)
+    return {layout: stats for layout, stats in prices.items() if stats.get('count', 0) > 0}
+
+def _parse_trend_stats(trend):
+    """价格走势统计量哈希转换为充分统计量字典，没有样本时返回None"""
+    trend = {name: float(value) for name, value in trend.items()}
+    return trend if trend.get('n', 0) > 0 else None
+
+@redis_operation(read_only=False)
+def update_analytics_cube(redis_conn, changes):
+    """
+    根据房源变更增量维护物化的统计数据
+
+    数量、价格总和、幂和和价格分布草图直接增减；删除的价格（面积）恰好是最低或最高值时无法增量维护，
+    返回这些需要重新统计价格的 (区域, 板块或None) 集合。统计数据尚未物化时什么也不做。
+    """
+    if not redis_conn.exists(ANALYTICS_LOCATIONS_KEY):
+        return set()
+    stale_stats = set()
+    fields = ('region', 'block', 'rooms', 'address', 'area', 'price')
+    for change in changes:
+        old, new = change['old'], change['new']
+        if old and new and all(old[name] == new[name] for name in fields):
+            continue
+        for values, delta in ((old, -1), (new, 1)):
+            if not values:
+                continue
+            args = _analytics_delta_args(values, delta)
+            for region, block in ((values['region'], None), (values['region'], values['block'])):
+                location = _analytics_location(region, block)
+                # 一个位置的全部增减在一个脚本中完成，多个进程同时处理同一位置的变更不会互相覆盖
+                if redis_conn.eval(UPDATE_ANALYTICS_SCRIPT, 6, ANALYTICS_LOCATIONS_KEY, *_analytics_keys(location),
+                                   location, *args):
+                    stale_stats.add((region, block))
+    return stale_stats
+
+def _analytics_delta_args(values, delta):
+    """一个房源计入（delta=1）或移出（delta=-1）统计数据时 UPDATE_ANALYTICS_SCRIPT 的参数"""
+    layout = parse_rooms(values['rooms'])
+    area, price = parse_area(values['area']), parse_price(values['price'])
+    has_layout = price is not None and None not in layout
+    bucket = sketch_bucket(price) if has_layout else None
+    terms = trend_terms(area, price) if price is not None and area is not None else {}
+    args = [
+        delta, values['rooms'] or '', values['address'] or '',
+        f"{layout[0]}:{layout[1]}" if has_layout else '', repr(float(price)) if has_layout else '',
+        repr(delta * float(price)) if has_layout else '',
+        f"{layout[0]}:{layout[1]}:{bucket}" if bucket is not None else '',
+        repr(float(area)) if terms else '',
+    ]
+    for name in TREND_SUM_FIELDS:
+        args.append(repr(delta * float(terms[name])) if terms else '')
+    return args
+
+# 重建任务去重
+@redis_operation(read_only=False)
+def mark_task_pending(redis_conn, task_type, expire=TASK_PENDING_EXPIRE):
+    """标记某类重建任务已排队，其他进程或请求已标记时返回 False"""
+    return bool(redis_conn.set(f"{TASK_PENDING_KEY}{task_type}", '1', nx=True, ex=expire))
+
+@redis_operation(read_only=False)
+def clear_task_pending(redis_conn, task_type):
+    """重建任务执行完后清除标记"""
+    redis_conn.delete(f"{TASK_PENDING_KEY}{task_type}")
+    return True
+
+# 跨进程的任务锁
+@redis_operation(read_only=False)
+def acquire_task_lock(redis_conn, task_type, expire):
+    """获取某类任务的跨进程锁，成功时返回令牌，其他进程持有时返回 None"""
+    token = uuid.uuid4().hex
+    if not redis_conn.set(f"{TASK_LOCK_KEY}{task_type}", token, nx=True, ex=expire):
+        return None
+    return token
+
+@redis_operation(read_only=False)
+def release_task_lock(redis_conn, task_type, token):
+    """释放任务锁，锁已过期或被其他进程持有时不做任何事"""
+    return bool(redis_conn.eval(RELEASE_TASK_LOCK_SCRIPT, 1, f"{TASK_LOCK_KEY}{task_type}", token))
+
 # 批量操作
 @redis_operation(read_only=False)
-def cache_initial_data(redis_conn, hot_houses, high_view_houses, expire=EXPIRE_TIME):
+def cache_initial_data(redis_conn, hot_houses, expire=EXPIRE_TIME):
     """缓存初始数据（应用启动时调用）"""
     # 缓存热点房源
     if hot_houses:
         cache_hot_houses(hot_houses, expire)
     
-    # 缓存高浏览量房源
-    if high_view_houses:
-        cache_high_view_houses(high_view_houses, expire)
-    
     logger.info("已完成初始数据缓存")
     return True
 
@@ -0,0 +1,347 @@
+import os
+import time
+import fcntl
+import heapq
+import bisect
+import pickle
+import logging
+import threading
+from settings import SEARCH_INDEX_PATH, SUGGEST_INDEX_PATH
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('search_index')
+
+# 参与关键词搜索的房源字段
+SEARCH_FIELDS = ('title', 'region', 'block', 'address', 'traffic')
+
+# 索引文件格式版本，格式变化时旧文件会被忽略并重建
+INDEX_FORMAT_VERSION = 2
+
+# 其他进程检查索引文件是否更新的间隔（秒）
+RELOAD_CHECK_INTERVAL = 30
+
+# 字段之间的分隔符，保证关键词不会跨字段匹配
+FIELD_SEPARATOR = '\x00'
+
+# 关键词提示：预先算好前N个字的前缀对应的候选，更长的前缀在有序数组上二分查找
+SUGGEST_HOT_PREFIX_LENGTH = 2
+SUGGEST_HOT_TOP_K = 10
+# 长前缀最多扫描的候选数，保证查询耗时有上界
+SUGGEST_MAX_SCAN = 2000
+
+
+def _grams(text):
+    """单字和相邻两字组成的n-gram，适合没有分词的中文文本"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def _file_version(stat):
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class PersistentIndex:
+    """
+    持久化到磁盘的进程内索引基类
+
+    子类实现 _snapshot()/_restore(data)，由后台任务构建后保存，
+    其他进程在查询时发现文件更新就在后台线程重新加载，加载完成前继续使用旧索引。
+    各进程只知道自己处理的增量变更：保存前先合并磁盘上其他进程保存的文件，
+    重新加载时再把本进程还没有保存的增量变更应用到新索引上，避免互相覆盖。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.loaded = False
+        self.dirty = False    # 是否有增量变更还没有保存到磁盘
+        self.pending = []     # 上次保存后应用到内存的增量变更，重新加载文件后需要重新应用
+        self.lock = threading.RLock()
+        self.io_lock = threading.RLock()    # 串行化本进程的加载和保存
+        self._file_version = None    # 最近一次加载或保存的文件的 (inode, 修改时间, 大小)
+        self._last_reload_check = 0
+        self._reload_thread = None
+
+    def _snapshot(self):
+        """返回需要持久化的数据（在锁内调用）"""
+        raise NotImplementedError
+
+    def _restore(self, data):
+        """用持久化的数据恢复索引"""
+        raise NotImplementedError
+
+    def save(self, only_dirty=False):
+        """
+        把索引持久化到磁盘
+
+        only_dirty=True 时保存增量变更：没有未保存的变更时不保存；磁盘上的文件被其他进程更新过时
+        先加载它（同时重新应用本进程的增量变更）再保存，读取和写入之间持有文件锁。
+        only_dirty=False 用于全量重建后保存，直接覆盖磁盘上的文件。
+        """
+        with self.lock:
+            if not self.loaded or (only_dirty and not self.dirty):
+                return False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.io_lock, open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if only_dirty and self._disk_version() not in (None, self._file_version):
+                self.load()
+            with self.lock:
+                data = self._snapshot()
+                self.dirty = False
+                self.pending = []
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': INDEX_FORMAT_VERSION, 'data': data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self._file_version = self._disk_version()
+        logger.info(f"已保存索引文件: {self.path}")
+        return True
+
+    def _disk_version(self):
+        """磁盘上索引文件的 (inode, 修改时间, 大小)，每次保存都替换为新文件，不依赖修改时间的精度"""
+        try:
+            return _file_version(os.stat(self.path))
+        except OSError:
+            return None
+
+    def load(self):
+        """从磁盘加载索引，文件不存在或格式不符时返回 False"""
+        with self.io_lock:
+            return self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                version = _file_version(os.fstat(f.fileno()))
+                data = pickle.load(f)
+        except Exception as e:
+            # 文件不存在、写到一半或内容损坏时都等待重建，不影响查询
+            logger.info(f"没有可用的索引文件: {str(e)}")
+            return False
+        if not isinstance(data, dict) or data.get('version') != INDEX_FORMAT_VERSION:
+            logger.info(f"索引文件版本不符，等待重建: {self.path}")
+            return False
+        try:
+            self._restore(data['data'])
+        except Exception as e:
+            logger.error(f"加载索引文件时出错: {str(e)}")
+            return False
+        self._file_version = version
+        logger.info(f"已加载索引文件: {self.path}")
+        return True
+
+    def _maybe_reload(self):
+        """其他进程更新了索引文件时启动后台线程重新加载，不阻塞当前查询"""
+        now = time.time()
+        if now - self._last_reload_check < RELOAD_CHECK_INTERVAL:
+            return
+        self._last_reload_check = now
+        version = self._disk_version()
+        if version is None or version == self._file_version:
+            return
+        with self.lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return
+            self._reload_thread = threading.Thread(target=self.load, name=f"reload-{os.path.basename(self.path)}",
+                                                   daemon=True)
+            self._reload_thread.start()
+
+
+class HouseSearchIndex(PersistentIndex):
+    """
+    房源关键词倒排索引
+
+    对 title/region/block/address/traffic 建立单字+双字的倒排表，
+    查询时求关键词各n-gram倒排表的交集，再用原文校验，结果与 LIKE '%关键词%' 一致。
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.docs = {}        # 房源ID -> 各字段小写后用分隔符拼接的文本
+        self.postings = {}    # n-gram -> 房源ID集合
+
+    def _index_doc(self, house_id, text):
+        self.docs[house_id] = text
+        for field_text in text.split(FIELD_SEPARATOR):
+            for gram in _grams(field_text):
+                self.postings.setdefault(gram, set()).add(house_id)
+
+    def _unindex_doc(self, house_id):
+        text = self.docs.pop(house_id, None)
+        if text is None:
+            return
+        for field_text in text.split(FIELD_SEPARATOR):
+            for gram in _grams(field_text):
+                posting = self.postings.get(gram)
+                if posting is not None:
+                    posting.discard(house_id)
+                    if not posting:
+                        del self.postings[gram]
+
+    @staticmethod
+    def doc_text(fields):
+        """把房源字段字典转换为索引文本"""
+        return FIELD_SEPARATOR.join((fields.get(name) or '').lower() for name in SEARCH_FIELDS)
+
+    def build(self, rows):
+        """
+        用全量房源重建索引
+
+        rows: 可迭代的 (房源ID, title, region, block, address, traffic)
+        """
+        docs = {row[0]: FIELD_SEPARATOR.join((value or '').lower() for value in row[1:]) for row in rows}
+        # 从MySQL全量重建的结果已包含之前的增量变更
+        self._replace_docs(docs, keep_pending=False)
+        logger.info(f"已重建房源搜索索引: {len(docs)} 个房源, {len(self.postings)} 个n-gram")
+
+    def _replace_docs(self, docs, keep_pending=True):
+        # 在锁外建好新的倒排表再整体替换，重建期间查询不受影响
+        fresh = HouseSearchIndex(self.path)
+        for house_id, text in docs.items():
+            fresh._index_doc(house_id, text)
+        with self.lock:
+            self.docs, self.postings = fresh.docs, fresh.postings
+            if keep_pending:
+                # 加载的是其他进程保存的文件，不含本进程还没有保存的增量变更
+                self._apply(self.pending)
+            else:
+                self.pending = []
+            self.loaded = True
+
+    def _apply(self, changes):
+        for change in changes:
+            self._unindex_doc(change['id'])
+            if change['new'] is not None:
+                self._index_doc(change['id'], self.doc_text(change['new']))
+
+    def apply_changes(self, changes):
+        """根据房源变更增量更新内存中的索引，由定时任务统一保存到磁盘"""
+        with self.lock:
+            if not self.loaded:
+                return
+            self._apply(changes)
+            self.pending.extend(changes)
+            self.dirty = True
+
+    def search(self, keyword):
+        """返回匹配关键词的房源ID集合，索引不可用时返回 None"""
+        self._maybe_reload()
+        keyword = keyword.strip().lower()
+        with self.lock:
+            if not self.loaded:
+                return None
+            if not keyword:
+                return set()
+            grams = [keyword] if len(keyword) == 1 else [keyword[i:i + 2] for i in range(len(keyword) - 1)]
+            postings = [self.postings.get(gram) for gram in set(grams)]
+            if not all(postings):
+                return set()
+            # 从最短的倒排表开始求交集
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates &= posting
+                if not candidates:
+                    return set()
+            if len(keyword) <= 2:
+                return candidates
+            # 三个字以上的关键词，n-gram都出现不代表连续出现，用原文校验
+            return {house_id for house_id in candidates if keyword in self.docs[house_id]}
+
+    def _snapshot(self):
+        # 只保存文档，倒排表在加载时重建
+        return {'docs': dict(self.docs)}
+
+    def _restore(self, data):
+        self._replace_docs(data['docs'])
+
+
+class HouseSuggestIndex(PersistentIndex):
+    """
+    搜索框关键词提示索引
+
+    区域、板块、房源标题各自按小写文本排成有序数组，按前缀二分查找，
+    候选按权重（房源数量或浏览量）取前几名；一两个字的短前缀预先算好结果。
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.entries = {}     # 类型 -> (有序的小写文本, 原文, 权重)
+        self.hot = {}         # 类型 -> {短前缀: [原文, ...]}
+
+    def build(self, entries_by_type):
+        """
+        重建提示索引
+
+        entries_by_type: {'region'/'block'/'title': [(名称, 权重), ...]}
+        """
+        entries, hot = {}, {}
+        for kind, items in entries_by_type.items():
+            items = sorted(((name.lower(), name, weight or 0) for name, weight in items if name),
+                           key=lambda item: item[0])
+            entries[kind] = ([item[0] for item in items], [item[1] for item in items], [item[2] for item in items])
+            
+            prefixes = {}
+            for key, name, weight in items:
+                for length in range(1, min(len(key), SUGGEST_HOT_PREFIX_LENGTH) + 1):
+                    prefixes.setdefault(key[:length], []).append((weight, name))
+            hot[kind] = {prefix: [name for _, name in heapq.nlargest(SUGGEST_HOT_TOP_K, candidates)]
+                         for prefix, candidates in prefixes.items()}
+        with self.lock:
+            self.entries, self.hot = entries, hot
+            self.loaded = True
+        logger.info(f"已重建关键词提示索引: {', '.join(f'{kind} {len(v[0])}' for kind, v in entries.items())}")
+
+    def suggest(self, keyword, kinds=('region', 'block', 'title'), limit=5):
+        """返回 [{'name': 名称, 'type': 类型}, ...]，索引不可用时返回 None"""
+        self._maybe_reload()
+        prefix = keyword.strip().lower()
+        with self.lock:
+            if not self.loaded:
+                return None
+            results = []
+            for kind in kinds:
+                for name in self._top_for_prefix(kind, prefix, limit):
+                    results.append({'name': name, 'type': kind})
+            return results
+
+    def _top_for_prefix(self, kind, prefix, limit):
+        if not prefix or kind not in self.entries:
+            return []
+        if len(prefix) <= SUGGEST_HOT_PREFIX_LENGTH and limit <= SUGGEST_HOT_TOP_K:
+            return self.hot[kind].get(prefix, [])[:limit]
+        keys, names, weights = self.entries[kind]
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + '\uffff', lo)
+        best = heapq.nlargest(limit, range(lo, min(hi, lo + SUGGEST_MAX_SCAN)), key=weights.__getitem__)
+        return [names[i] for i in best]
+
+    def _snapshot(self):
+        return {'entries_by_type': {kind: list(zip(names, weights))
+                                    for kind, (_, names, weights) in self.entries.items()}}
+
+    def _restore(self, data):
+        self.build(data['entries_by_type'])
+
+
+def paginate_ids(house_ids, page, per_page, after_id=None, before_id=None):
+    """
+    对匹配的房源ID按ID升序分页，用堆只取出当前页需要的ID
+
+    返回 (当前页ID列表, 是否还有更多)
+    """
+    if before_id is not None:
+        ids = heapq.nlargest(per_page + 1, (house_id for house_id in house_ids if house_id < before_id))
+        return sorted(ids[:per_page]), len(ids) > per_page
+    if after_id is not None:
+        ids = heapq.nsmallest(per_page + 1, (house_id for house_id in house_ids if house_id > after_id))
+        return ids[:per_page], len(ids) > per_page
+    ids = heapq.nsmallest(page * per_page + 1, house_ids)
+    return ids[(page - 1) * per_page:page * per_page], len(ids) > page * per_page
+
+
+# 进程内共享的房源搜索索引和关键词提示索引
+house_search_index = HouseSearchIndex(SEARCH_INDEX_PATH)
+house_suggest_index = HouseSuggestIndex(SUGGEST_INDEX_PATH)